@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Minimal in-process client for the ADB server's host protocol.
+
+Talks to the adb server over its local TCP socket (127.0.0.1:5037 unless
+ANDROID_ADB_SERVER_PORT says otherwise) instead of spawning the adb
+executable for every operation. Only the services setupRTMP6.py needs are
+implemented: host:version, host:devices-l, host:track-devices-l, shell: and
+reverse:forward / list-forward / killforward.
+
+Wire format: each request is a 4-digit hex length followed by the service
+name. The server answers "OKAY" or "FAIL" + a hex-length-prefixed message.
+"""
+
+import os
+import socket
+from typing import Iterator, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5037
+
+
+class AdbError(Exception):
+    """The adb server or device answered FAIL, or the stream broke mid-request."""
+
+
+class AdbServerUnavailable(AdbError):
+    """No adb server is listening; callers should fall back to the adb executable."""
+
+
+class AdbClient:
+    """Speaks the ADB host protocol to a running adb server.
+
+    The server closes a socket once a host service has been answered, and a
+    `host:transport:` socket is consumed by the single device service opened
+    on it, so every call opens a short-lived loopback connection. One client
+    instance is shared for the whole run (see `get_adb_client` in
+    setupRTMP6.py) and is safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: Optional[int] = None,
+        timeout: float = 5.0,
+    ):
+        self.host = host
+        self.port = port or int(os.environ.get("ANDROID_ADB_SERVER_PORT", DEFAULT_PORT))
+        self.timeout = timeout
+
+    # --- Framing ---
+    def _connect(self, timeout: Optional[float] = None) -> socket.socket:
+        try:
+            sock = socket.create_connection(
+                (self.host, self.port), timeout=min(self.timeout, 1.0)
+            )
+        except OSError as e:
+            raise AdbServerUnavailable(
+                f"adb server not reachable on {self.host}:{self.port}: {e}"
+            ) from e
+        sock.settimeout(timeout or self.timeout)
+        return sock
+
+    @staticmethod
+    def _send(sock: socket.socket, service: str):
+        data = service.encode("utf-8")
+        sock.sendall(f"{len(data):04x}".encode("ascii") + data)
+
+    @staticmethod
+    def _read_exact(sock: socket.socket, n: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < n:
+            chunk = sock.recv(n - len(buf))
+            if not chunk:
+                raise AdbError(f"connection closed after {len(buf)}/{n} bytes")
+            buf += chunk
+        return bytes(buf)
+
+    @classmethod
+    def _read_length_prefixed(cls, sock: socket.socket) -> str:
+        length = int(cls._read_exact(sock, 4), 16)
+        return cls._read_exact(sock, length).decode("utf-8", errors="replace")
+
+    @classmethod
+    def _read_status(cls, sock: socket.socket):
+        status = cls._read_exact(sock, 4)
+        if status == b"OKAY":
+            return
+        if status == b"FAIL":
+            raise AdbError(cls._read_length_prefixed(sock))
+        raise AdbError(f"unexpected adb status {status!r}")
+
+    @staticmethod
+    def _read_all(sock: socket.socket) -> str:
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+        return b"".join(chunks).decode("utf-8", errors="replace")
+
+    def _open(
+        self, service: str, serial: Optional[str] = None, timeout=None
+    ) -> socket.socket:
+        """Opens `service`, switching to the device transport first if given."""
+        sock = self._connect(timeout)
+        try:
+            if serial:
+                self._send(sock, f"host:transport:{serial}")
+                self._read_status(sock)
+            self._send(sock, service)
+            self._read_status(sock)
+            return sock
+        except BaseException:
+            sock.close()
+            raise
+
+    def _query(self, service: str) -> str:
+        with self._open(service) as sock:
+            return self._read_length_prefixed(sock)
+
+    # --- Host services ---
+    def version(self) -> int:
+        """Returns the server's protocol version (e.g. 41 for adb 1.0.41)."""
+        return int(self._query("host:version"), 16)
+
+    def devices(self) -> str:
+        """Returns the `adb devices -l` listing, without its header line."""
+        return self._query("host:devices-l")
+
+    def track_devices(self) -> Iterator[str]:
+        """Yields the `devices -l` listing now and again after every change.
+
+        The server keeps this socket open and pushes a fresh listing whenever
+        a device appears, disappears or changes state, so iterating blocks
+        until the next event. Raises AdbError when the server goes away.
+        """
+        with self._open("host:track-devices-l") as sock:
+            sock.settimeout(None)
+            while True:
+                yield self._read_length_prefixed(sock)
+
+    # --- Device services ---
+    def shell(self, serial: str, command: str, timeout: Optional[float] = None) -> str:
+        """Runs `command` through the legacy shell: service and returns its output."""
+        with self._open(f"shell:{command}", serial, timeout) as sock:
+            return self._read_all(sock)
+
+    def reverse(self, serial: str, remote: str, local: str):
+        """Equivalent of `adb -s serial reverse remote local`."""
+        with self._open(f"reverse:forward:{remote};{local}", serial) as sock:
+            self._read_status(sock)
+
+    def reverse_list(self, serial: str) -> str:
+        """Equivalent of `adb -s serial reverse --list`.
+
+        One "<transport> <remote> <local>" line per mapping on the device.
+        Unlike forward/killforward, there is no second status: the OKAY that
+        opened the service is followed directly by the listing.
+        """
+        with self._open("reverse:list-forward", serial) as sock:
+            return self._read_length_prefixed(sock)
+
+    def reverse_remove(self, serial: str, remote: str):
+        """Equivalent of `adb -s serial reverse --remove remote`."""
+        with self._open(f"reverse:killforward:{remote}", serial) as sock:
+            self._read_status(sock)
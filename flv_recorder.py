@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""Records an RTMP stream to FLV, with a keyframe index for instant seeking.
+
+setupRTMP6.py starts one recorder per device port when `Record = true`:
+
+    python flv_recorder.py rtmp://127.0.0.1:1935/live/KEY --out rec.flv
+
+The recorder plays the stream like any other player and appends each tag to
+the file through one fixed write buffer, so disk writes are few and large
+(one per WRITE_BUFFER_SIZE or FLUSH_INTERVAL) rather than one per tag. Every
+video keyframe adds a fixed-size (timestamp, byte offset) record to the
+sidecar `rec.flv.idx`, written along with the data it points into; finding
+the keyframe before any time is a binary search over that file:
+
+    python flv_recorder.py --seek 3600 rec.flv
+
+Memory stays constant however long the recording runs: the write buffer,
+the pending index records and the RTMP reassembly buffers are all bounded.
+If the server goes away the recorder reconnects and keeps appending to the
+same file, with timestamps continuing where they stopped. It stops, after
+flushing, on SIGTERM or Ctrl+C, or once the `--stop-file` exists: that is
+how setupRTMP6.py --stop-recording stops it on Windows, where terminating
+a process cannot be caught.
+"""
+
+import argparse
+import logging
+import signal
+import socket
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from rtmp import (
+    AUDIO,
+    DATA_AMF0,
+    VIDEO,
+    RtmpClient,
+    RtmpError,
+    amf0_decode,
+    amf0_encode,
+    parse_rtmp_url,
+    video_frame_kind,
+)
+
+log = logging.getLogger("flv_recorder")
+
+FLV_HEADER = b"FLV\x01\x05\x00\x00\x00\x09\x00\x00\x00\x00"  # audio+video, tag size 0
+SCRIPT_DATA = 18
+WRITE_BUFFER_SIZE = 1024 * 1024
+FLUSH_INTERVAL = 2.0  # seconds of stream a crash may lose at most
+INDEX_MAGIC = b"FLVKIDX1"
+INDEX_RECORD = struct.Struct(">QQ")  # keyframe timestamp (ms), tag byte offset
+TAG_HEADER = struct.Struct(">II3x")  # type+size, timestamp+extension, stream id
+TAG_TRAILER = struct.Struct(">I")  # previous tag size
+RECONNECT_DELAY = 2.0
+READ_TIMEOUT = 30.0
+STOP_POLL = 0.5  # How often --stop-file is checked, seconds
+MAX_REWIND = 1000  # ms a timestamp may step back (A/V interleave) before rebasing
+
+
+def index_path(flv_path: Path) -> Path:
+    return flv_path.with_name(flv_path.name + ".idx")
+
+
+class FlvWriter:
+    """Appends FLV tags through one fixed buffer and indexes keyframes.
+
+    The file is opened unbuffered: the only write calls are flush()es of
+    the buffer, plus a direct write for a tag that alone exceeds it.
+    """
+
+    def __init__(self, path: Path, buffer_size: int = WRITE_BUFFER_SIZE):
+        self.path = Path(path)
+        self._file = open(self.path, "wb", buffering=0)
+        self._index = open(index_path(self.path), "wb", buffering=0)
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+        self._used = 0
+        self._index.write(INDEX_MAGIC)
+        self._pending_index = bytearray()
+        self._flushed_at = time.monotonic()
+        self.offset = 0  # file size once everything is flushed
+        self.tags = self.keyframes = self.writes = 0
+        self._put(FLV_HEADER)
+
+    def write_tag(
+        self, tag_type: int, timestamp: int, payload: bytes, keyframe: bool = False
+    ):
+        size = len(payload)
+        total = TAG_HEADER.size + size + TAG_TRAILER.size
+        timestamp &= 0xFFFFFFFF
+        if self._used + total > len(self._buf):
+            self.flush()
+        if keyframe:  # Queued after that flush, so it follows the tag to disk
+            self._pending_index += INDEX_RECORD.pack(timestamp, self.offset)
+            self.keyframes += 1
+        header = (tag_type << 24 | size, (timestamp & 0xFFFFFF) << 8 | timestamp >> 24)
+        if total > len(self._buf):  # Bigger than the whole buffer: write through
+            self._write(TAG_HEADER.pack(*header) + bytes(payload))
+            self._write(TAG_TRAILER.pack(total - TAG_TRAILER.size))
+        else:
+            pos = self._used
+            TAG_HEADER.pack_into(self._buf, pos, *header)
+            pos += TAG_HEADER.size
+            self._view[pos : pos + size] = payload
+            TAG_TRAILER.pack_into(self._buf, pos + size, total - TAG_TRAILER.size)
+            self._used = pos + size + TAG_TRAILER.size
+        self.offset += total
+        self.tags += 1
+        if time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Writes out buffered tags, then the index records that point at them."""
+        if self._used:
+            self._write(self._view[: self._used])
+            self._used = 0
+        if self._pending_index:
+            self._index.write(self._pending_index)
+            self._pending_index.clear()
+        self._flushed_at = time.monotonic()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._file.close()
+            self._index.close()
+
+    def __enter__(self) -> "FlvWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _put(self, data: bytes):
+        self._view[self._used : self._used + len(data)] = data
+        self._used += len(data)
+        self.offset += len(data)
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[self._file.write(view) :]
+        self.writes += 1
+
+
+def keyframe_offset(flv_path: Path, timestamp_ms: int) -> Tuple[int, int]:
+    """(timestamp, byte offset) of the last keyframe at or before `timestamp_ms`.
+
+    Binary search over the fixed-size records of the sidecar index, so the
+    cost is O(log n) small reads whatever the recording length. Falls back
+    to the first tag (offset len(FLV_HEADER)) when nothing is indexed yet.
+    """
+    with open(index_path(Path(flv_path)), "rb") as f:
+        if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError(f"{flv_path}: not an FLV keyframe index")
+        f.seek(0, 2)
+        count = (f.tell() - len(INDEX_MAGIC)) // INDEX_RECORD.size
+
+        def record(i: int) -> Tuple[int, int]:
+            f.seek(len(INDEX_MAGIC) + i * INDEX_RECORD.size)
+            return INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+
+        lo, hi, best = 0, count - 1, (0, len(FLV_HEADER))
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            ts, offset = record(mid)
+            if ts <= timestamp_ms:
+                best, lo = (ts, offset), mid + 1
+            else:
+                hi = mid - 1
+        return best
+
+
+def read_tags(flv_path: Path) -> Iterator[Tuple[int, int, bytes]]:
+    """(tag type, timestamp ms, payload) of each tag in an FLV file.
+
+    Reads the whole file at once, so it is meant for short clips such as
+    the ones tools/rtmp_loadgen.py replays; a truncated last tag is dropped.
+    """
+    data = Path(flv_path).read_bytes()
+    if data[:3] != b"FLV":
+        raise ValueError(f"{flv_path}: not an FLV file")
+    pos = int.from_bytes(data[5:9], "big") + TAG_TRAILER.size
+    while pos + TAG_HEADER.size <= len(data):
+        type_size, ts_field = TAG_HEADER.unpack_from(data, pos)
+        size = type_size & 0xFFFFFF
+        start = pos + TAG_HEADER.size
+        if start + size > len(data):
+            break
+        timestamp = ts_field >> 8 | (ts_field & 0xFF) << 24
+        yield type_size >> 24 & 0x1F, timestamp, data[start : start + size]
+        pos = start + size + TAG_TRAILER.size
+
+
+def _metadata_payload(payload: bytes) -> Optional[bytes]:
+    """The onMetaData script payload of a data message, or None."""
+    values = amf0_decode(payload)
+    if values and values[0] == "@setDataFrame":
+        values = values[1:]
+    if values and values[0] == "onMetaData":
+        return amf0_encode(*values)
+    return None
+
+
+def record(
+    url: str,
+    out: Path,
+    retry: float = RECONNECT_DELAY,
+    stop: Optional[threading.Event] = None,
+):
+    """Plays `url` into `out` until interrupted or `stop` is set,
+    reconnecting as needed."""
+    host, port, app, name = parse_rtmp_url(url)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    last_ts: Optional[int] = None
+    stop = stop or threading.Event()
+    current: List[RtmpClient] = []
+
+    def cut_on_stop():  # Wakes a read blocked for up to READ_TIMEOUT
+        stop.wait()
+        for client in list(current):
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    threading.Thread(target=cut_on_stop, daemon=True).start()
+    with FlvWriter(out) as writer:
+        log.info("recording %s to %s", url, out)
+        while not stop.is_set():
+            shift = None
+            try:
+                with RtmpClient(host, port, READ_TIMEOUT) as client:
+                    current[:] = [client]
+                    if stop.is_set():
+                        break
+                    client.connect(app, f"rtmp://{host}:{port}/{app}")
+                    info = client.play(name)
+                    log.info("%s: %s", url, info.get("code", "?"))
+                    while True:
+                        msg = client.read_message()
+                        if msg.type_id == DATA_AMF0:
+                            meta = _metadata_payload(msg.payload)
+                            if meta is not None:
+                                writer.write_tag(SCRIPT_DATA, last_ts or 0, meta)
+                            continue
+                        if msg.type_id not in (AUDIO, VIDEO):
+                            continue
+                        ts = msg.timestamp + (shift or 0)
+                        if shift is None or (last_ts and ts < last_ts - MAX_REWIND):
+                            # New connection or republished stream: continue
+                            # the file's timeline instead of starting over.
+                            start = 0 if last_ts is None else last_ts + 1
+                            shift = start - msg.timestamp
+                            ts = start
+                        last_ts = ts & 0xFFFFFFFF
+                        key = msg.type_id == VIDEO and video_frame_kind(msg.payload)[1]
+                        writer.write_tag(msg.type_id, last_ts, msg.payload, key)
+            except (OSError, RtmpError, ValueError) as e:
+                if stop.is_set():
+                    break
+                if not isinstance(e, socket.timeout):
+                    log.warning("%s: %s; reconnecting in %gs", url, e, retry)
+                writer.flush()
+                stop.wait(retry)
+        log.info("stopped recording %s", url)
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _watch_stop_file(path: Path, stop: threading.Event):
+    while not stop.wait(STOP_POLL):
+        if path.exists():
+            stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="rtmp:// URL to record, or FLV file for --seek")
+    parser.add_argument("--out", type=Path, help="FLV file to write")
+    parser.add_argument(
+        "--seek", type=float, metavar="SECONDS", help="print the keyframe offset"
+    )
+    parser.add_argument(
+        "--stop-file", type=Path, help="flush and exit once this file exists"
+    )
+    parser.add_argument("--quiet", action="store_true", help="log warnings only")
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.WARNING if args.quiet else logging.INFO,
+        format="%(asctime)s flv_recorder: %(message)s",
+        datefmt="%H:%M:%S",
+    )
+    if args.seek is not None:
+        ts, offset = keyframe_offset(Path(args.source), int(args.seek * 1000))
+        print(f"{offset} {ts / 1000:.3f}")
+        return
+    if args.out is None:
+        parser.error("--out is required when recording")
+    stop = threading.Event()
+    if args.stop_file:
+        watcher = threading.Thread(
+            target=_watch_stop_file, args=(args.stop_file, stop), daemon=True
+        )
+        watcher.start()
+    signal.signal(signal.SIGTERM, _raise_interrupt)  # Flush and close on kill
+    try:
+        record(args.source, args.out, stop=stop)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""MonaServer.ini generated from named tuning profiles.
+
+The shipped MonaServer_Win64/MonaServer.ini carries hand-tuned socket
+buffers, RTMP BufferLength and SRT latency. Here those values are the
+"default" profile, and the others change only the keys they are about:
+
+    low-latency    small buffers, 50 ms RTMP BufferLength, 20 ms SRT latency
+    high-bitrate   large buffers and a longer idle timeout, for 10+ Mbps phones
+    many-streams   medium buffers, so dozens of connections stay cheap on RAM
+
+render_ini() always takes the RTMP port from the caller (config.ini's
+RtmpPort), so the two cannot drift apart. With `rtmp_only` every other
+protocol is switched off, for extra instances that each serve one more RTMP
+port next to the main one. tools/validate_mona_profiles.py runs the same
+synthetic load against each profile to pick one from data.
+"""
+
+import os
+import re
+import shutil
+from typing import Dict, List, Mapping, Optional, Tuple
+
+HEADER = "; Generated by setupRTMP6.py from the '{profile}' MonaServer profile."
+
+Sections = List[Tuple[str, Dict[str, str]]]
+
+
+def _buffers(size: int) -> Dict[str, str]:
+    return {k: str(size) for k in ("bufferSize", "recvBufferSize", "sendBufferSize")}
+
+
+# The shipped ini, in file order; "" holds the keys before the first section
+BASE: Sections = [
+    (
+        "",
+        {
+            "description": "MonaServer",
+            "cores": "0",
+            "poolBuffers": "true",
+            "wwwDir": '"www"',
+            "dataDir": '"data"',
+        },
+    ),
+    ("logs", {"directory": "MonaServer.log", "maxSize": "1000000", "rotation": "10"}),
+    ("TLS", {"certificat": "cert.pem", "key": "key.pem"}),
+    ("net", _buffers(32768)),
+    (
+        "publication",
+        {"server": "mona", "segments": "0", "duration": "0", "append": "false"},
+    ),
+    (
+        "HTTP",
+        {
+            "port": "80",
+            "host": "0.0.0.0",
+            "publicPort": "80",
+            "publicHost": "127.0.0.1",
+            **_buffers(32768),
+            "timeout": "10",
+            "index": "true",
+            "rendezVous": "false",
+            "crossOriginIsolated": "true",
+        },
+    ),
+    (
+        "HTTPS",
+        {
+            "port": "443",
+            "host": "0.0.0.0",
+            "publicPort": "443",
+            "publicHost": "127.0.0.1",
+            **_buffers(32768),
+            "timeout": "10",
+            "index": "true",
+            "rendezVous": "false",
+            "crossOriginIsolated": "true",
+        },
+    ),
+    ("WS", {**_buffers(32768), "timeout": "30"}),
+    ("WSS", {**_buffers(32768), "timeout": "30"}),
+    (
+        "STUN=false",
+        {
+            "port": "3478",
+            "host": "0.0.0.0",
+            "publicPort": "3478",
+            "publicHost": "127.0.0.1",
+            **_buffers(32768),
+        },
+    ),
+    (
+        "SRT",
+        {
+            "port": "9710",
+            "host": "0.0.0.0",
+            "publicPort": "9710",
+            "publicHost": "127.0.0.1",
+            **_buffers(32768),
+            "pktdrop": "true",
+            "encryption": "0",
+            "latency": "50",
+            "peerlatency": "0",
+            "mss": "1500",
+            "overheadbw": "25",
+            "maxbw": "-1",
+        },
+    ),
+    (
+        "RTMP",
+        {
+            "port": "1935",
+            "host": "127.0.0.1",
+            "publicPort": "1935",
+            "publicHost": "127.0.0.1",
+            **_buffers(65536),
+            "timeout": "10",
+            "BufferLength": "100",
+        },
+    ),
+    (
+        "RTMPS",
+        {
+            "port": "8443",
+            "host": "127.0.0.1",
+            "publicPort": "8443",
+            "publicHost": "127.0.0.1",
+            **_buffers(32768),
+            "timeout": "30",
+        },
+    ),
+    (
+        "RTMFP",
+        {
+            "port": "1940",
+            "host": "0.0.0.0",
+            "publicPort": "1940",
+            "publicHost": "127.0.0.1",
+            **_buffers(32768),
+            "keepalivePeer": "5",
+            "addresses": "",
+        },
+    ),
+]
+
+# Per-profile overrides of BASE: section -> key -> value
+PROFILES: Dict[str, Dict[str, Dict[str, str]]] = {
+    "default": {},
+    "low-latency": {
+        "net": _buffers(16384),
+        "RTMP": {**_buffers(16384), "BufferLength": "50"},
+        "SRT": {"latency": "20"},
+    },
+    "high-bitrate": {
+        "net": _buffers(131072),
+        "RTMP": {**_buffers(262144), "BufferLength": "200", "timeout": "20"},
+        "SRT": {"latency": "120"},
+    },
+    "many-streams": {
+        "RTMP": {**_buffers(32768), "BufferLength": "100", "timeout": "30"},
+    },
+}
+
+# Sections holding settings rather than a protocol's listener
+_SETTINGS = {"", "logs", "TLS", "net", "publication"}
+
+_SECTION_RE = re.compile(r"^\[([^\]]+)\]")
+_HEADER_RE = re.compile(re.escape(HEADER).replace(re.escape("{profile}"), "(.+)"))
+
+
+def sections(
+    profile: str,
+    rtmp_port: int,
+    extra: Optional[Mapping[str, Mapping[str, str]]] = None,
+    rtmp_only: bool = False,
+) -> Sections:
+    """BASE with the profile's overrides, the RTMP port and `extra` applied.
+
+    `rtmp_only` renames every other protocol's section to "NAME=false".
+    """
+    if profile not in PROFILES:
+        choices = ", ".join(PROFILES)
+        raise ValueError(f"unknown MonaServer profile '{profile}' (one of {choices})")
+    port = str(rtmp_port)
+    overrides = [PROFILES[profile], {"RTMP": {"port": port, "publicPort": port}}]
+    result = []
+    for name, keys in BASE:
+        keys = dict(keys)
+        for layer in overrides + [extra or {}]:
+            keys.update(layer.get(name, {}))
+        protocol = name.split("=", 1)[0]
+        if rtmp_only and protocol not in _SETTINGS and protocol != "RTMP":
+            name = f"{protocol}=false"
+        result.append((name, keys))
+    return result
+
+
+def render_ini(
+    profile: str,
+    rtmp_port: int,
+    extra: Optional[Mapping[str, Mapping[str, str]]] = None,
+    rtmp_only: bool = False,
+) -> str:
+    """The MonaServer.ini text for `profile`, listening for RTMP on `rtmp_port`.
+
+    `extra` overrides further keys, e.g. absolute wwwDir/dataDir paths for an
+    ini written outside the MonaServer folder.
+    """
+    lines = [
+        HEADER.format(profile=profile),
+        "; Edits are overwritten; leave MonaProfile empty in config.ini to keep them.",
+    ]
+    for name, keys in sections(profile, rtmp_port, extra, rtmp_only):
+        lines.append("")
+        if name:
+            lines.append(f"[{name}]")
+        lines.extend(f"{k}={v}" for k, v in keys.items())
+    return "\n".join(lines) + "\n"
+
+
+def ini_rtmp_port(text: str) -> Optional[int]:
+    """The RTMP port an ini configures: 1935 unless set, None if RTMP is off."""
+    section = ""
+    enabled, port = True, 1935
+    for raw in text.splitlines():
+        line = raw.split(";", 1)[0].strip()
+        if match := _SECTION_RE.match(line):
+            section = match.group(1).strip()
+            if section.split("=", 1)[0].strip().upper() == "RTMP":
+                enabled = not section.lower().endswith("=false")
+            continue
+        if section.split("=", 1)[0].strip().upper() != "RTMP" or "=" not in line:
+            continue
+        key, value = (part.strip() for part in line.split("=", 1))
+        if key.lower() == "port" and value.isdigit():
+            port = int(value)
+    return port if enabled else None
+
+
+def profile_of(text: str) -> Optional[str]:
+    """The profile an ini was generated from, or None for a hand-written one."""
+    match = _HEADER_RE.match(text.split("\n", 1)[0])
+    return match.group(1) if match else None
+
+
+def write_ini(
+    path: str,
+    profile: str,
+    rtmp_port: int,
+    extra: Optional[Mapping[str, Mapping[str, str]]] = None,
+    rtmp_only: bool = False,
+) -> bool:
+    """Writes the profile's ini to `path`; True if the file changed.
+
+    A hand-written ini is kept once as `<path>.orig` before it is replaced,
+    and the new file is swapped in whole so MonaServer never reads half of it.
+    """
+    text = render_ini(profile, rtmp_port, extra, rtmp_only)
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            current: Optional[str] = f.read()
+    except OSError:
+        current = None
+    if current == text:
+        return False
+    if current is not None and profile_of(current) is None:
+        backup = path + ".orig"
+        if not os.path.exists(backup):
+            shutil.copy2(path, backup)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return True
@@ -0,0 +1,954 @@
+# -*- coding: utf-8 -*-
+"""Minimal RTMP protocol pieces: handshake, chunk stream, AMF0 and clients.
+
+Just enough of RTMP for setupRTMP6.py to talk to the ingest server it
+starts: play a stream and measure it (probe_stream) without ever decoding
+media, publish synthetic streams for the benchmarks, and back the built-in
+server in rtmp_server.py. Chunks are reassembled by a push parser (ChunkParser) so the same
+code works behind a blocking socket or an asyncio stream; with
+`keep_media=False` it keeps only the first bytes of audio/video payloads,
+which is all the FLV tag headers need.
+
+Wire format: a 1+1536+1536 byte handshake, then messages split into chunks
+of `chunk_size` bytes, each chunk prefixed by a basic header (format +
+chunk stream id) and a 0/3/7/11 byte message header. Commands are AMF0.
+"""
+
+import os
+import re
+import socket
+import struct
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_PORT = 1935
+DEFAULT_CHUNK_SIZE = 128
+HANDSHAKE_SIZE = 1536
+RTMP_VERSION = 3
+
+# Message type ids
+SET_CHUNK_SIZE = 1
+ABORT = 2
+ACK = 3
+USER_CONTROL = 4
+WINDOW_ACK_SIZE = 5
+SET_PEER_BANDWIDTH = 6
+AUDIO = 8
+VIDEO = 9
+DATA_AMF0 = 18
+COMMAND_AMF0 = 20
+
+# User control events
+STREAM_BEGIN = 0
+SET_BUFFER_LENGTH = 3
+PING_REQUEST = 6
+PING_RESPONSE = 7
+
+# Chunk stream ids used for what we send
+CSID_CONTROL = 2
+CSID_COMMAND = 3
+CSID_AUDIO = 4
+CSID_VIDEO = 6
+CSID_DATA = 5
+
+# Bytes of an audio/video payload kept when media is not retained: the FLV
+# tag header, including an enhanced-RTMP FourCC
+MEDIA_HEADER_BYTES = 5
+RECV_BUFFER_SIZE = 64 * 1024
+
+URL_RE = re.compile(r"^rtmp://([^/:]+)(?::(\d+))?/([^/]+)(?:/(.*))?$")
+
+
+class RtmpError(Exception):
+    """Malformed data, a rejected command, or a server that isn't RTMP."""
+
+
+# --- AMF0 ---
+def _amf0_value(v: Any) -> bytes:
+    if v is None:
+        return b"\x05"
+    if isinstance(v, bool):
+        return b"\x01" + (b"\x01" if v else b"\x00")
+    if isinstance(v, (int, float)):
+        return b"\x00" + struct.pack(">d", v)
+    if isinstance(v, str):
+        raw = v.encode("utf-8")
+        if len(raw) < 0x10000:
+            return b"\x02" + struct.pack(">H", len(raw)) + raw
+        return b"\x0c" + struct.pack(">I", len(raw)) + raw
+    if isinstance(v, dict):
+        return b"\x03" + _amf0_properties(v)
+    if isinstance(v, (list, tuple)):
+        return b"\x0a" + struct.pack(">I", len(v)) + b"".join(map(_amf0_value, v))
+    raise TypeError(f"cannot AMF0-encode {type(v).__name__}")
+
+
+def _amf0_properties(obj: Dict[str, Any]) -> bytes:
+    parts = []
+    for key, value in obj.items():
+        raw = key.encode("utf-8")
+        parts.append(struct.pack(">H", len(raw)) + raw + _amf0_value(value))
+    return b"".join(parts) + b"\x00\x00\x09"
+
+
+def amf0_encode(*values: Any) -> bytes:
+    return b"".join(map(_amf0_value, values))
+
+
+def _amf0_read(data: bytes, pos: int) -> Tuple[Any, int]:
+    marker = data[pos]
+    pos += 1
+    if marker == 0x00:
+        return struct.unpack_from(">d", data, pos)[0], pos + 8
+    if marker == 0x01:
+        return data[pos] != 0, pos + 1
+    if marker == 0x02:
+        (n,) = struct.unpack_from(">H", data, pos)
+        return data[pos + 2 : pos + 2 + n].decode("utf-8", "replace"), pos + 2 + n
+    if marker == 0x0C:
+        (n,) = struct.unpack_from(">I", data, pos)
+        return data[pos + 4 : pos + 4 + n].decode("utf-8", "replace"), pos + 4 + n
+    if marker in (0x03, 0x08):  # Object, ECMA array (count is only a hint)
+        if marker == 0x08:
+            pos += 4
+        obj: Dict[str, Any] = {}
+        while True:
+            (n,) = struct.unpack_from(">H", data, pos)
+            key = data[pos + 2 : pos + 2 + n].decode("utf-8", "replace")
+            pos += 2 + n
+            if data[pos] == 0x09:
+                return obj, pos + 1
+            obj[key], pos = _amf0_read(data, pos)
+    if marker == 0x0A:
+        (n,) = struct.unpack_from(">I", data, pos)
+        pos += 4
+        items = []
+        for _ in range(n):
+            item, pos = _amf0_read(data, pos)
+            items.append(item)
+        return items, pos
+    if marker == 0x0B:  # Date: ms since epoch + timezone
+        return struct.unpack_from(">d", data, pos)[0], pos + 10
+    if marker in (0x05, 0x06):  # Null, undefined
+        return None, pos
+    raise RtmpError(f"unsupported AMF0 marker 0x{marker:02x}")
+
+
+def amf0_decode(data: bytes) -> List[Any]:
+    """Decodes every AMF0 value in `data` (a command or data message)."""
+    values, pos = [], 0
+    try:
+        while pos < len(data):
+            value, pos = _amf0_read(data, pos)
+            values.append(value)
+    except (IndexError, struct.error) as e:
+        raise RtmpError(f"truncated AMF0 data: {e}") from e
+    return values
+
+
+# --- Chunk stream ---
+@dataclass
+class Message:
+    """One reassembled RTMP message.
+
+    `length` is the full message length; `payload` may be cut down to the
+    parser's `media_head` bytes for audio/video when it doesn't keep media,
+    and is a borrowed memoryview when it comes from ChunkParser.parse().
+    """
+
+    type_id: int
+    stream_id: int
+    timestamp: int
+    payload: bytes
+    length: int
+    csid: int = 0
+
+
+class _ChunkStream:
+    __slots__ = (
+        "timestamp",
+        "delta",
+        "length",
+        "type_id",
+        "stream_id",
+        "ext",
+        "buf",
+        "kept",
+        "received",
+    )
+
+    def __init__(self):
+        self.timestamp = self.delta = self.length = self.type_id = 0
+        self.stream_id = 0
+        self.ext = False
+        self.buf = bytearray()  # Sized for the largest message, then reused
+        self.kept = 0  # payload bytes held in buf
+        self.received = 0
+
+
+class ChunkParser:
+    """Reassembles messages from RTMP chunks fed in arbitrary pieces.
+
+    Set Chunk Size and Abort are applied as soon as they are parsed, since
+    they change how the very next chunk is read; they are returned too.
+
+    Bytes land once in a reusable receive buffer, either copied in by
+    `feed()` or received straight into it through `recv_buffer()` and
+    `commit()` (recv_into / asyncio.BufferedProtocol). Chunk payloads are
+    then copied once into a per-chunk-stream reassembly buffer that is kept
+    across messages, so steady-state parsing allocates no payload memory.
+    """
+
+    def __init__(self, keep_media: bool = True):
+        self.keep_media = keep_media
+        self.media_head = MEDIA_HEADER_BYTES  # Bytes kept when keep_media is off
+        self.chunk_size = DEFAULT_CHUNK_SIZE
+        self.bytes_received = 0
+        self._buf = bytearray(RECV_BUFFER_SIZE)
+        self._start = self._end = 0
+        self._streams: Dict[int, _ChunkStream] = {}
+
+    def feed(self, data: bytes) -> List[Message]:
+        """Adds received bytes; returns the messages they complete."""
+        self.recv_buffer(len(data))[: len(data)] = data
+        self.commit(len(data))
+        messages = []
+        for msg in self.parse():
+            msg.payload = bytes(msg.payload)
+            messages.append(msg)
+        return messages
+
+    def recv_buffer(self, min_size: int = 1) -> memoryview:
+        """Free space after the unparsed bytes, at least `min_size` long."""
+        min_size = max(min_size, 1)
+        if len(self._buf) - self._end < min_size:
+            pending = self._end - self._start
+            if pending + min_size > len(self._buf):
+                grown = bytearray(max(2 * len(self._buf), pending + min_size))
+                grown[:pending] = self._buf[self._start : self._end]
+                self._buf = grown
+            else:
+                self._buf[:pending] = self._buf[self._start : self._end]
+            self._start, self._end = 0, pending
+        return memoryview(self._buf)[self._end :]
+
+    def commit(self, n: int):
+        """Marks `n` bytes written into the last recv_buffer() as received."""
+        self._end += n
+        self.bytes_received += n
+
+    def take(self, n: int) -> Optional[bytes]:
+        """Consumes `n` raw bytes (the handshake), or None until they arrive."""
+        if self._end - self._start < n:
+            return None
+        data = bytes(self._buf[self._start : self._start + n])
+        self._start += n
+        return data
+
+    def parse(self) -> Iterator[Message]:
+        """Yields the messages completed by the bytes received so far.
+
+        Payloads are memoryviews of the reassembly buffer and are only valid
+        until the generator is resumed: copy whatever must outlive that.
+        """
+        while (csid := self._parse_chunk()) >= 0:
+            if not csid:
+                continue
+            cs = self._streams[csid]
+            msg = Message(
+                cs.type_id,
+                cs.stream_id,
+                cs.timestamp,
+                memoryview(cs.buf)[: cs.kept],
+                cs.length,
+                csid,
+            )
+            cs.received = cs.kept = 0
+            self._control(msg)
+            yield msg
+
+    def _parse_chunk(self) -> int:
+        """Consumes one chunk: -1 if incomplete, else the chunk stream id of
+        the message it completes, or 0."""
+        buf, pos, end = self._buf, self._start, self._end
+        avail = end - pos
+        if avail < 1:
+            return -1
+        fmt, csid = buf[pos] >> 6, buf[pos] & 0x3F
+        pos += 1
+        if csid == 0:
+            if avail < 2:
+                return -1
+            csid, pos = 64 + buf[pos], pos + 1
+        elif csid == 1:
+            if avail < 3:
+                return -1
+            csid, pos = 64 + buf[pos] + (buf[pos + 1] << 8), pos + 2
+        hlen = (11, 7, 3, 0)[fmt]
+        if end - pos < hlen:
+            return -1
+        cs = self._streams.get(csid)
+        if cs is None:
+            if fmt != 0:
+                raise RtmpError(f"chunk stream {csid} starts without a type-0 header")
+            cs = self._streams[csid] = _ChunkStream()
+
+        ts_field = 0
+        if fmt < 3:
+            ts_field = int.from_bytes(buf[pos : pos + 3], "big")
+        if fmt < 2:
+            length = int.from_bytes(buf[pos + 3 : pos + 6], "big")
+            type_id = buf[pos + 6]
+        ext = cs.ext if fmt == 3 else ts_field == 0xFFFFFF
+        hend = pos + hlen + (4 if ext else 0)
+        if end < hend:
+            return -1
+        if ext:
+            ts_field = int.from_bytes(buf[pos + hlen : hend], "big")
+
+        starting = cs.received == 0
+        size = min(self.chunk_size, (length if fmt < 2 else cs.length) - cs.received)
+        if end - hend < size:
+            return -1
+
+        # Header and payload are both complete: commit the chunk.
+        cs.ext = ext
+        if fmt == 0:
+            cs.timestamp, cs.delta = ts_field, 0
+            cs.length, cs.type_id = length, type_id
+            cs.stream_id = int.from_bytes(buf[pos + 7 : pos + 11], "little")
+        elif fmt == 1:
+            cs.delta, cs.length, cs.type_id = ts_field, length, type_id
+        elif fmt == 2:
+            cs.delta = ts_field
+        if starting and fmt != 0:
+            cs.timestamp = (cs.timestamp + cs.delta) & 0xFFFFFFFF
+
+        keep = size
+        if not self.keep_media and cs.type_id in (AUDIO, VIDEO):
+            keep = max(0, min(size, self.media_head - cs.kept))
+        if keep:
+            if len(cs.buf) < cs.kept + keep:
+                # Grow to the whole message up front; never resized in place,
+                # so views handed out by parse() stay valid memory.
+                grown = bytearray(max(cs.length, cs.kept + keep))
+                grown[: cs.kept] = cs.buf[: cs.kept]
+                cs.buf = grown
+            cs.buf[cs.kept : cs.kept + keep] = memoryview(buf)[hend : hend + keep]
+            cs.kept += keep
+        cs.received += size
+        self._start = hend + size
+        return csid if cs.received >= cs.length else 0
+
+    def _control(self, msg: Message):
+        if msg.type_id == SET_CHUNK_SIZE and len(msg.payload) >= 4:
+            self.chunk_size = max(
+                1, struct.unpack(">I", msg.payload[:4])[0] & 0x7FFFFFFF
+            )
+        elif msg.type_id == ABORT and len(msg.payload) >= 4:
+            cs = self._streams.get(struct.unpack(">I", msg.payload[:4])[0])
+            if cs:
+                cs.received = cs.kept = 0
+
+
+def _basic_header(fmt: int, csid: int) -> bytes:
+    if csid < 64:
+        return bytes([(fmt << 6) | csid])
+    if csid < 320:
+        return bytes([fmt << 6, csid - 64])
+    return bytes([(fmt << 6) | 1, (csid - 64) & 0xFF, (csid - 64) >> 8])
+
+
+def _message_headers(
+    csid: int, type_id: int, stream_id: int, timestamp: int, length: int
+) -> Tuple[bytes, bytes]:
+    """The type-0 header of a message and the type-3 header of its later chunks."""
+    timestamp &= 0xFFFFFFFF
+    ext = timestamp >= 0xFFFFFF
+    ext_ts = struct.pack(">I", timestamp) if ext else b""
+    header = (
+        _basic_header(0, csid)
+        + (0xFFFFFF if ext else timestamp).to_bytes(3, "big")
+        + length.to_bytes(3, "big")
+        + bytes([type_id])
+        + struct.pack("<I", stream_id)
+        + ext_ts
+    )
+    return header, _basic_header(3, csid) + ext_ts
+
+
+def encode_message(
+    csid: int,
+    type_id: int,
+    stream_id: int,
+    timestamp: int,
+    payload: bytes,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> bytes:
+    """Splits one message into chunks: a type-0 header, then type-3 headers."""
+    header, cont = _message_headers(csid, type_id, stream_id, timestamp, len(payload))
+    if len(payload) <= chunk_size:
+        return header + payload
+    view = memoryview(payload)
+    parts = [header, view[:chunk_size]]
+    for off in range(chunk_size, len(payload), chunk_size):
+        parts += [cont, view[off : off + chunk_size]]
+    return b"".join(parts)
+
+
+def encoded_size(
+    csid: int, timestamp: int, length: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """Bytes encode_message() produces for a `length`-byte payload."""
+    basic = 1 if csid < 64 else 2 if csid < 320 else 3
+    ext = 4 if timestamp & 0xFFFFFFFF >= 0xFFFFFF else 0
+    chunks = max(1, -(-length // chunk_size))
+    return basic + 11 + ext + length + (chunks - 1) * (basic + ext)
+
+
+def encode_message_into(
+    buf: memoryview,
+    offset: int,
+    csid: int,
+    type_id: int,
+    stream_id: int,
+    timestamp: int,
+    payload: bytes,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """encode_message() written into `buf` at `offset`; returns the end offset.
+
+    The payload is copied exactly once, straight into place, which is what
+    lets a relay encode a message into a shared buffer for all subscribers.
+    """
+    length = len(payload)
+    header, cont = _message_headers(csid, type_id, stream_id, timestamp, length)
+    end = offset + len(header)
+    buf[offset:end] = header
+    src = memoryview(payload)
+    for off in range(0, length, chunk_size):
+        if off:
+            buf[end : end + len(cont)] = cont
+            end += len(cont)
+        n = min(chunk_size, length - off)
+        buf[end : end + n] = src[off : off + n]
+        end += n
+    return end
+
+
+def control_message(type_id: int, value: int) -> bytes:
+    """Set Chunk Size / Acknowledgement / Window Ack Size (one uint32)."""
+    return encode_message(CSID_CONTROL, type_id, 0, 0, struct.pack(">I", value))
+
+
+def user_control(event: int, *values: int) -> bytes:
+    payload = struct.pack(">H", event) + b"".join(struct.pack(">I", v) for v in values)
+    return encode_message(CSID_CONTROL, USER_CONTROL, 0, 0, payload)
+
+
+# --- Handshake ---
+def handshake_c1() -> bytes:
+    """C1/S1: 4-byte time, 4 zero bytes, 1528 random bytes."""
+    return struct.pack(
+        ">II", int(time.monotonic() * 1000) & 0xFFFFFFFF, 0
+    ) + os.urandom(HANDSHAKE_SIZE - 8)
+
+
+def server_handshake_reply(c1: bytes) -> bytes:
+    """S0+S1+S2 for a client's C1 (S2 echoes C1)."""
+    return bytes([RTMP_VERSION]) + handshake_c1() + c1
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise RtmpError(f"connection closed after {len(buf)}/{n} bytes")
+        buf += chunk
+    return bytes(buf)
+
+
+def client_handshake(sock: socket.socket):
+    sock.sendall(bytes([RTMP_VERSION]) + handshake_c1())
+    s0s1 = _recv_exact(sock, 1 + HANDSHAKE_SIZE)
+    if s0s1[0] != RTMP_VERSION:
+        raise RtmpError(f"unsupported RTMP version {s0s1[0]}")
+    _recv_exact(sock, HANDSHAKE_SIZE)  # S2, our C1 echoed back
+    sock.sendall(s0s1[1:])  # C2 echoes S1
+
+
+def parse_rtmp_url(url: str) -> Tuple[str, int, str, str]:
+    """rtmp://host[:port]/app[/stream] -> (host, port, app, stream)."""
+    m = URL_RE.match(url)
+    if not m:
+        raise ValueError(f"not an rtmp:// URL: {url}")
+    return m.group(1), int(m.group(2) or DEFAULT_PORT), m.group(3), m.group(4) or ""
+
+
+# --- Clients ---
+_CONTROL_TYPES = (
+    SET_CHUNK_SIZE,
+    ABORT,
+    ACK,
+    USER_CONTROL,
+    WINDOW_ACK_SIZE,
+    SET_PEER_BANDWIDTH,
+)
+
+
+class _ClientCore:
+    """Protocol state shared by the blocking and the asyncio client.
+
+    Subclasses only move bytes: `_ingest` turns received data into queued
+    messages and returns whatever must be written back (acks, pongs).
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.parser = ChunkParser()
+        self.out_chunk_size = DEFAULT_CHUNK_SIZE
+        self.window_ack_size = 0
+        self.stream_id = 0
+        self._acked = 0
+        self._txn = 0
+        self._pending: Deque[Message] = deque()
+
+    def _ingest(self, data: bytes) -> bytes:
+        if not data:
+            raise RtmpError("connection closed by server")
+        replies = []
+        for msg in self.parser.feed(data):
+            if msg.type_id not in _CONTROL_TYPES:
+                self._pending.append(msg)
+            elif msg.type_id == WINDOW_ACK_SIZE and len(msg.payload) >= 4:
+                self.window_ack_size = struct.unpack(">I", msg.payload[:4])[0]
+            elif msg.type_id == USER_CONTROL and len(msg.payload) >= 6:
+                event, value = struct.unpack(">HI", msg.payload[:6])
+                if event == PING_REQUEST:
+                    replies.append(user_control(PING_RESPONSE, value))
+        received = self.parser.bytes_received
+        if self.window_ack_size and received - self._acked >= self.window_ack_size:
+            replies.append(control_message(ACK, received & 0xFFFFFFFF))
+            self._acked = received
+        return b"".join(replies)
+
+    def _encode(self, csid: int, type_id: int, payload: bytes, timestamp: int) -> bytes:
+        return encode_message(
+            csid, type_id, self.stream_id, timestamp, payload, self.out_chunk_size
+        )
+
+    def _command(
+        self, name: str, args: Tuple[Any, ...], csid: int
+    ) -> Tuple[int, bytes]:
+        self._txn += 1
+        payload = amf0_encode(name, self._txn, *args)
+        return self._txn, self._encode(csid, COMMAND_AMF0, payload, 0)
+
+    @staticmethod
+    def _result_of(msg: Message, txn: int) -> Optional[List[Any]]:
+        """The reply values if `msg` answers transaction `txn`, else None."""
+        if msg.type_id != COMMAND_AMF0:
+            return None
+        values = amf0_decode(msg.payload)
+        if (
+            len(values) < 2
+            or values[1] != txn
+            or values[0] not in ("_result", "_error")
+        ):
+            return None
+        if values[0] == "_error":
+            info = values[3] if len(values) > 3 else None
+            raise RtmpError(f"command {txn} rejected: {info}")
+        return values[2:]
+
+    @staticmethod
+    def _status_of(msg: Message) -> Optional[Dict[str, Any]]:
+        """The info object if `msg` is an onStatus, else None."""
+        if msg.type_id != COMMAND_AMF0:
+            return None
+        values = amf0_decode(msg.payload)
+        if values and values[0] == "onStatus" and len(values) > 3:
+            return values[3] if isinstance(values[3], dict) else {}
+        return None
+
+    def _connect_args(self, app: str, tc_url: Optional[str]) -> Dict[str, Any]:
+        return {
+            "app": app,
+            "type": "nonprivate",
+            "flashVer": "FMLE/3.0",
+            "tcUrl": tc_url or f"rtmp://{self.host}:{self.port}/{app}",
+        }
+
+
+class RtmpClient(_ClientCore):
+    """Blocking RTMP client for one connection: connect, then play or publish.
+
+    Protocol control (chunk size, acknowledgements, pings) is handled inside
+    read_message(), which only returns media, data and command messages.
+    """
+
+    def __init__(self, host: str, port: int = DEFAULT_PORT, timeout: float = 5.0):
+        super().__init__(host, port)
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+
+    def __enter__(self) -> "RtmpClient":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def send(self, csid: int, type_id: int, payload: bytes, timestamp: int = 0):
+        self.sock.sendall(self._encode(csid, type_id, payload, timestamp))
+
+    def set_chunk_size(self, size: int):
+        self.sock.sendall(control_message(SET_CHUNK_SIZE, size))
+        self.out_chunk_size = size
+
+    def read_message(self) -> Message:
+        while not self._pending:
+            if reply := self._ingest(self.sock.recv(65536)):
+                self.sock.sendall(reply)
+        return self._pending.popleft()
+
+    def command(self, name: str, *args: Any, csid: int = CSID_COMMAND) -> int:
+        """Sends an AMF0 command; returns its transaction id."""
+        txn, data = self._command(name, args, csid)
+        self.sock.sendall(data)
+        return txn
+
+    def _wait_result(self, txn: int) -> List[Any]:
+        while (result := self._result_of(self.read_message(), txn)) is None:
+            pass
+        return result
+
+    def _wait_status(self) -> Dict[str, Any]:
+        while (info := self._status_of(self.read_message())) is None:
+            pass
+        return info
+
+    def connect(self, app: str, tc_url: Optional[str] = None):
+        client_handshake(self.sock)
+        self._wait_result(self.command("connect", self._connect_args(app, tc_url)))
+
+    def create_stream(self) -> int:
+        result = self._wait_result(self.command("createStream", None))
+        self.stream_id = int(result[1]) if len(result) > 1 else 1
+        return self.stream_id
+
+    def play(self, name: str) -> Dict[str, Any]:
+        """Starts playback; returns the onStatus info (code NetStream.Play.*)."""
+        self.create_stream()
+        self.sock.sendall(user_control(SET_BUFFER_LENGTH, self.stream_id, 1000))
+        self.command("play", None, name, -2, csid=8)
+        while (info := self._wait_status()).get("code") == "NetStream.Play.Reset":
+            pass
+        return info
+
+    def publish(self, name: str, kind: str = "live") -> Dict[str, Any]:
+        """Starts publishing; returns the onStatus info (NetStream.Publish.*)."""
+        self.create_stream()
+        self.command("publish", None, name, kind, csid=8)
+        return self._wait_status()
+
+
+class AsyncRtmpClient(_ClientCore):
+    """asyncio counterpart of RtmpClient, for running many streams at once.
+
+    client = await AsyncRtmpClient.open("127.0.0.1", 1935)
+    await client.connect("live")
+    await client.publish("cam1")
+    """
+
+    def __init__(self, host: str, port: int, reader, writer):
+        super().__init__(host, port)
+        self.reader, self.writer = reader, writer
+
+    @classmethod
+    async def open(
+        cls, host: str, port: int = DEFAULT_PORT, timeout: float = 5.0
+    ) -> "AsyncRtmpClient":
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout
+        )
+        return cls(host, port, reader, writer)
+
+    def close(self):
+        self.writer.close()
+
+    def send(self, csid: int, type_id: int, payload: bytes, timestamp: int = 0):
+        """Queues a message; await drain() to apply backpressure."""
+        self.writer.write(self._encode(csid, type_id, payload, timestamp))
+
+    def send_encoded(self, data: bytes):
+        """Queues messages already chunked by encode_message(), e.g. several
+        joined together so they leave in one write."""
+        self.writer.write(data)
+
+    async def drain(self):
+        await self.writer.drain()
+
+    def set_chunk_size(self, size: int):
+        self.writer.write(control_message(SET_CHUNK_SIZE, size))
+        self.out_chunk_size = size
+
+    async def read_message(self) -> Message:
+        while not self._pending:
+            if reply := self._ingest(await self.reader.read(65536)):
+                self.writer.write(reply)
+        return self._pending.popleft()
+
+    def command(self, name: str, *args: Any, csid: int = CSID_COMMAND) -> int:
+        txn, data = self._command(name, args, csid)
+        self.writer.write(data)
+        return txn
+
+    async def _wait_result(self, txn: int) -> List[Any]:
+        while (result := self._result_of(await self.read_message(), txn)) is None:
+            pass
+        return result
+
+    async def _wait_status(self) -> Dict[str, Any]:
+        while (info := self._status_of(await self.read_message())) is None:
+            pass
+        return info
+
+    async def connect(self, app: str, tc_url: Optional[str] = None):
+        self.writer.write(bytes([RTMP_VERSION]) + handshake_c1())
+        s0s1 = await self.reader.readexactly(1 + HANDSHAKE_SIZE)
+        if s0s1[0] != RTMP_VERSION:
+            raise RtmpError(f"unsupported RTMP version {s0s1[0]}")
+        await self.reader.readexactly(HANDSHAKE_SIZE)
+        self.writer.write(s0s1[1:])
+        await self._wait_result(
+            self.command("connect", self._connect_args(app, tc_url))
+        )
+
+    async def create_stream(self) -> int:
+        result = await self._wait_result(self.command("createStream", None))
+        self.stream_id = int(result[1]) if len(result) > 1 else 1
+        return self.stream_id
+
+    async def play(self, name: str) -> Dict[str, Any]:
+        await self.create_stream()
+        self.writer.write(user_control(SET_BUFFER_LENGTH, self.stream_id, 1000))
+        self.command("play", None, name, -2, csid=8)
+        while (info := await self._wait_status()).get("code") == "NetStream.Play.Reset":
+            pass
+        return info
+
+    async def publish(self, name: str, kind: str = "live") -> Dict[str, Any]:
+        await self.create_stream()
+        self.command("publish", None, name, kind, csid=8)
+        return await self._wait_status()
+
+
+# --- Synthetic media ---
+AVC_SEQUENCE_HEADER = bytes([0x17, 0, 0, 0, 0]) + bytes(
+    [
+        1,
+        0x64,
+        0,
+        0x1F,
+        0xFF,
+        0xE1,
+        0,
+        4,
+        0x67,
+        0x64,
+        0,
+        0x1F,
+        1,
+        0,
+        4,
+        0x68,
+        0xEE,
+        0x3C,
+        0x80,
+    ]
+)
+AAC_SEQUENCE_HEADER = bytes([0xAF, 0, 0x12, 0x10])
+
+
+def synthetic_media(
+    bitrate_kbps: float, fps: float = 30.0, gop_seconds: float = 2.0
+) -> Iterator[Tuple[int, int, bytes]]:
+    """Endless (type_id, timestamp_ms, payload) tags at roughly `bitrate_kbps`.
+
+    Starts with AVC/AAC sequence headers, then H.264-shaped video (keyframes
+    4x the size of other frames, one per `gop_seconds`) plus ~128 kbps AAC.
+    Payloads are zero-filled and reused, so generating them costs nothing.
+    """
+    gop = max(1, round(fps * gop_seconds))
+    audio_bytes = 128_000 // 8 // 43  # 43 AAC frames/s
+    video_bytes = max(0, bitrate_kbps * 1000 / 8 - 128_000 / 8) / fps
+    inter = max(16, int(video_bytes * gop / (gop + 3)))
+    key_frame = bytes([0x17, 1, 0, 0, 0]) + bytes(inter * 4)
+    inter_frame = bytes([0x27, 1, 0, 0, 0]) + bytes(inter)
+    audio_frame = bytes([0xAF, 1]) + bytes(audio_bytes)
+    yield VIDEO, 0, AVC_SEQUENCE_HEADER
+    yield AUDIO, 0, AAC_SEQUENCE_HEADER
+    frame = 0
+    audio_ts = 0.0
+    while True:
+        ts = int(frame * 1000 / fps)
+        while audio_ts <= ts:
+            yield AUDIO, int(audio_ts), audio_frame
+            audio_ts += 1024 / 44.1
+        yield VIDEO, ts, key_frame if frame % gop == 0 else inter_frame
+        frame += 1
+
+
+# --- Stream probe ---
+def video_frame_kind(header: bytes) -> Tuple[bool, bool]:
+    """(is_frame, is_keyframe) from an FLV video tag header.
+
+    Sequence headers, end-of-sequence markers and command frames are not
+    frames. Handles enhanced RTMP (IsExHeader bit) as well as legacy tags.
+    """
+    if not header:
+        return False, False
+    b0 = header[0]
+    if b0 & 0x80:  # Enhanced RTMP: frame type in bits 4-6, packet type low nibble
+        frame_type, packet_type = (b0 >> 4) & 0x07, b0 & 0x0F
+        is_frame = packet_type in (1, 3, 6)  # CodedFrames, CodedFramesX, Multitrack
+    else:
+        frame_type, codec = b0 >> 4, b0 & 0x0F
+        is_frame = frame_type != 5 and not (
+            codec in (7, 12, 13) and len(header) > 1 and header[1] != 1
+        )
+    return is_frame, is_frame and frame_type == 1
+
+
+@dataclass
+class StreamStats:
+    """What probe_stream saw during its window. Rates use stream timestamps."""
+
+    url: str
+    ok: bool = False
+    error: Optional[str] = None
+    seconds: float = 0.0
+    bytes: int = 0
+    video_frames: int = 0
+    audio_frames: int = 0
+    keyframes: int = 0
+    bitrate_kbps: float = 0.0
+    fps: float = 0.0
+    keyframe_interval: Optional[float] = None
+    jitter_ms: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def describe(self) -> str:
+        if not self.ok:
+            return self.error or "no media"
+        gop = f"{self.keyframe_interval:.2f}s" if self.keyframe_interval else "n/a"
+        jitter = f"{self.jitter_ms:.1f}ms" if self.jitter_ms is not None else "n/a"
+        return (
+            f"{self.bitrate_kbps:.0f} kbps · {self.fps:.1f} fps · "
+            f"keyframe {gop} · jitter {jitter}"
+        )
+
+
+class _StreamMeter:
+    """Accumulates header-only statistics for one played stream."""
+
+    def __init__(self):
+        self.bytes = self.video = self.audio = 0
+        self.first_ts: Optional[int] = None
+        self.last_ts = 0
+        self.keyframe_ts: List[int] = []
+        self.video_first_ts: Optional[int] = None
+        self.video_last_ts = 0
+        self._prev: Optional[Tuple[float, int]] = None
+        self.jitter: Optional[float] = None
+
+    def add(self, msg: Message, arrival: float):
+        self.bytes += msg.length
+        if self.first_ts is None:
+            self.first_ts = msg.timestamp
+        self.last_ts = max(self.last_ts, msg.timestamp)
+        if msg.type_id == AUDIO:
+            self.audio += 1
+            return
+        is_frame, is_key = video_frame_kind(msg.payload)
+        if not is_frame:
+            return
+        self.video += 1
+        if self.video_first_ts is None:
+            self.video_first_ts = msg.timestamp
+        self.video_last_ts = msg.timestamp
+        if is_key:
+            self.keyframe_ts.append(msg.timestamp)
+        if self._prev is not None:
+            # RFC 3550-style smoothed jitter: arrival spacing vs. timestamp spacing
+            d = abs((arrival - self._prev[0]) * 1000 - (msg.timestamp - self._prev[1]))
+            self.jitter = (
+                d if self.jitter is None else self.jitter + (d - self.jitter) / 16
+            )
+        self._prev = (arrival, msg.timestamp)
+
+    def fill(self, stats: StreamStats):
+        stats.bytes, stats.video_frames = self.bytes, self.video
+        stats.audio_frames = self.audio
+        stats.keyframes = len(self.keyframe_ts)
+        span = (self.last_ts - (self.first_ts or 0)) / 1000
+        if span > 0:
+            stats.bitrate_kbps = round(self.bytes * 8 / span / 1000, 1)
+        video_span = (self.video_last_ts - (self.video_first_ts or 0)) / 1000
+        if self.video > 1 and video_span > 0:
+            stats.fps = round((self.video - 1) / video_span, 2)
+        if len(self.keyframe_ts) > 1:
+            gaps = len(self.keyframe_ts) - 1
+            stats.keyframe_interval = round(
+                (self.keyframe_ts[-1] - self.keyframe_ts[0]) / gaps / 1000, 3
+            )
+        if self.jitter is not None:
+            stats.jitter_ms = round(self.jitter, 2)
+        stats.ok = self.video + self.audio > 0
+
+
+def probe_stream(url: str, window: float = 5.0, timeout: float = 5.0) -> StreamStats:
+    """Plays `url` for `window` seconds and measures it from tag headers only.
+
+    Media payloads are dropped by the chunk parser, so probing costs little
+    more than reading the socket. Never raises; failures go in `error`.
+    """
+    stats = StreamStats(url)
+    start = time.perf_counter()
+    meter = _StreamMeter()
+    try:
+        host, port, app, name = parse_rtmp_url(url)
+        with RtmpClient(host, port, timeout) as client:
+            client.connect(app, f"rtmp://{host}:{port}/{app}")
+            client.parser.keep_media = False
+            info = client.play(name)
+            code = info.get("code", "")
+            if not code.startswith("NetStream.Play.Start"):
+                stats.error = code or "play rejected"
+                return stats
+            deadline = time.perf_counter() + window
+            while (remaining := deadline - time.perf_counter()) > 0:
+                client.sock.settimeout(remaining)
+                try:
+                    msg = client.read_message()
+                except (socket.timeout, TimeoutError):
+                    break
+                if msg.type_id in (AUDIO, VIDEO):
+                    meter.add(msg, time.perf_counter())
+        meter.fill(stats)
+        if not stats.ok:
+            stats.error = "no media received"
+    except (OSError, RtmpError, ValueError) as e:
+        stats.error = str(e) or type(e).__name__
+    finally:
+        stats.seconds = round(time.perf_counter() - start, 3)
+    return stats
@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""Synthetic RTMP publishers and players that measure latency and throughput.
+
+Publishers send synthetic_media() tags paced in real time. Each video frame
+carries a 16-byte stamp right after its 5-byte FLV/AVC tag header: a magic
+word, the wall-clock send time in ns and a per-stream sequence number.
+Players keep only that prefix of each message (ChunkParser.media_head), so
+the arrival time minus the stamp is the publish-to-play latency through
+the server, and gaps in the sequence are frames the server dropped. The
+stamp rides in the video payload because every server relays media, while
+data messages other than onMetaData are often not passed on; the
+publisher's onMetaData names it (`latencyStamp`) for anyone inspecting.
+
+    stats = asyncio.run(run_load("127.0.0.1", 1935, publishers=4, players=1))
+    print(stats.latency_ms(0.95), stats.relay_mbps())
+"""
+
+import asyncio
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import rtmp
+
+STAMP = struct.Struct(">4sQI")  # magic, send time (ns since the epoch), sequence
+STAMP_MAGIC = b"RLAT"
+STAMP_OFFSET = rtmp.MEDIA_HEADER_BYTES
+STAMP_END = STAMP_OFFSET + STAMP.size
+PLAY_GRACE = 0.5  # Players outlive publishers by this much to drain the server
+CONNECT_LIMIT = 64  # Handshakes in flight at once, to stay within listen backlogs
+PACING_TICK = 0.02  # Tags due this soon after one that is due ride in its write
+
+TagSource = Callable[[], Iterator[Tuple[int, int, bytes]]]
+
+
+def synthetic_source(bitrate_kbps: float) -> TagSource:
+    """Tags from rtmp.synthetic_media() at `bitrate_kbps`, for every publisher."""
+    return lambda: rtmp.synthetic_media(bitrate_kbps)
+
+
+def flv_source(path) -> TagSource:
+    """Audio/video tags of an FLV file, looped with continuous timestamps.
+
+    The file is read once and its payloads shared by every publisher. Its
+    own bitrate applies, and the stamps overwrite the first bytes of each
+    frame, so the replay is for loading a server, not for watching.
+    """
+    from flv_recorder import read_tags  # pylint: disable=import-outside-toplevel
+
+    tags = [t for t in read_tags(path) if t[0] in (rtmp.AUDIO, rtmp.VIDEO)]
+    if not tags:
+        raise ValueError(f"{path}: no audio or video tags")
+    first = tags[0][1]
+    loop_ms = max(1, tags[-1][1] - first + 33)  # Leave one frame between loops
+
+    def replay() -> Iterator[Tuple[int, int, bytes]]:
+        base = 0
+        while True:
+            for type_id, ts, payload in tags:
+                yield type_id, base + ts - first, payload
+            base += loop_ms
+
+    return replay
+
+
+def stamp_frame(buf: bytearray, seq: int, now_ns: Optional[int] = None):
+    """Writes a stamp into a video frame payload, in place."""
+    if now_ns is None:
+        now_ns = time.time_ns()
+    STAMP.pack_into(buf, STAMP_OFFSET, STAMP_MAGIC, now_ns, seq)
+
+
+def wall_ns(perf: float) -> int:
+    """A time.perf_counter() instant on the time.time_ns() clock of the stamps."""
+    return time.time_ns() + round((perf - time.perf_counter()) * 1e9)
+
+
+def read_stamp(payload) -> Optional[Tuple[int, int]]:
+    """(send time ns, sequence) from a stamped payload, else None."""
+    if len(payload) < STAMP_END:
+        return None
+    magic, sent_ns, seq = STAMP.unpack_from(payload, STAMP_OFFSET)
+    return (sent_ns, seq) if magic == STAMP_MAGIC else None
+
+
+def metadata() -> bytes:
+    """@setDataFrame onMetaData announcing the stream and where its stamps are."""
+    return rtmp.amf0_encode(
+        "@setDataFrame",
+        "onMetaData",
+        {
+            "videocodecid": 7,
+            "audiocodecid": 10,
+            "framerate": 30,
+            "latencyStamp": f"{STAMP_MAGIC.decode()}@{STAMP_OFFSET}",
+        },
+    )
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..1) of `values`, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+@dataclass
+class LoadStats:
+    """What one run_load() measured.
+
+    Byte counts cover the media sent during the measured window: each
+    message belongs to the latest stamped frame sent before it, on both
+    sides, so a frame that arrives late is still counted as received.
+    """
+
+    duration: float
+    publishers: int = 0
+    players: int = 0
+    # Publishers and players the server accepted (Publish/Play.Start)
+    publishers_connected: int = 0
+    players_connected: int = 0
+    errors: int = 0
+    published: int = 0
+    received: int = 0
+    frames: int = 0  # stamped frames played
+    lost_frames: int = 0  # sequence gaps seen by players
+    max_lag: float = 0.0  # how far behind schedule a publisher fell, seconds
+    loop_lag: float = 0.0  # worst event-loop delay: the generator's own limit
+    # (seconds since the measured window opened, latency ms) per played frame
+    samples: List[Tuple[float, float]] = field(default_factory=list)
+    error_messages: Dict[str, int] = field(default_factory=dict)
+
+    def error(self, exc: BaseException):
+        self.errors += 1
+        key = f"{type(exc).__name__}: {exc}"[:120]
+        self.error_messages[key] = self.error_messages.get(key, 0) + 1
+
+    def latency_ms(self, q: float) -> Optional[float]:
+        return percentile([ms for _, ms in self.samples], q)
+
+    def windows(self, width: float) -> List[Dict[str, Any]]:
+        """Latency percentiles per `width`-second slice of the measured window."""
+        slices: Dict[int, List[float]] = {}
+        for elapsed, ms in self.samples:
+            slices.setdefault(int(elapsed // width), []).append(ms)
+        return [
+            {
+                "start": round(index * width, 3),
+                "frames": len(values),
+                "p50": round(percentile(values, 0.5), 2),
+                "p95": round(percentile(values, 0.95), 2),
+                "p99": round(percentile(values, 0.99), 2),
+                "max": round(max(values), 2),
+            }
+            for index, values in sorted(slices.items())
+        ]
+
+    def dropped_bytes(self) -> int:
+        """Media published in the window that its players did not receive,
+        including any that arrived more than PLAY_GRACE after the window."""
+        per_stream = self.players / self.publishers if self.publishers else 0
+        return max(0, round(self.published * per_stream) - self.received)
+
+    def publish_mbps(self) -> float:
+        return self.published * 8 / self.duration / 1e6
+
+    def relay_mbps(self) -> float:
+        return self.received * 8 / self.duration / 1e6
+
+    def as_dict(self) -> Dict[str, Any]:
+        def ms(q):
+            value = self.latency_ms(q)
+            return None if value is None else round(value, 2)
+
+        return {
+            "duration": self.duration,
+            "publishers": self.publishers,
+            "players": self.players,
+            "publishers_connected": self.publishers_connected,
+            "players_connected": self.players_connected,
+            "errors": self.errors,
+            "error_messages": self.error_messages,
+            "publish_mbps": round(self.publish_mbps(), 3),
+            "relay_mbps": round(self.relay_mbps(), 3),
+            "dropped_bytes": self.dropped_bytes(),
+            "frames": self.frames,
+            "lost_frames": self.lost_frames,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "loop_lag_ms": round(self.loop_lag * 1000, 1),
+            "latency_ms": {"p50": ms(0.5), "p95": ms(0.95), "p99": ms(0.99)},
+        }
+
+
+async def publish(
+    host: str,
+    port: int,
+    app: str,
+    name: str,
+    source: TagSource,
+    stats: LoadStats,
+    measure_from: float,
+    stop: float,
+    gate: Optional[asyncio.Semaphore] = None,
+):
+    """Publishes `source`'s tags, stamped, in real time until `stop`
+    (perf_counter); `gate` bounds the handshakes in flight."""
+    client = None
+    try:
+        async with gate or asyncio.Semaphore():
+            client = await rtmp.AsyncRtmpClient.open(host, port)
+            await client.connect(app)
+            client.set_chunk_size(4096)
+            info = await client.publish(name)
+        if info.get("code") != "NetStream.Publish.Start":
+            raise rtmp.RtmpError(info.get("code") or "publish refused")
+        stats.publishers_connected += 1
+        client.send(rtmp.CSID_DATA, rtmp.DATA_AMF0, metadata(), 0)
+        scratch = bytearray(4096)  # Stamped copy of the current frame
+        batch: List[bytes] = []
+        seq = 0
+        measure_ns, measured = wall_ns(measure_from), False
+        start = now = time.perf_counter()
+        for type_id, ts, payload in source():
+            due = start + ts / 1000
+            if due >= stop:
+                break
+            if due > now + PACING_TICK:
+                client.send_encoded(b"".join(batch))
+                batch.clear()
+                await client.drain()
+                now = time.perf_counter()
+                if due > now:
+                    await asyncio.sleep(due - now)
+                    now = time.perf_counter()
+            if due < now:
+                stats.max_lag = max(stats.max_lag, now - due)
+            size = len(payload)
+            if type_id == rtmp.VIDEO and size >= STAMP_END and payload[1]:
+                if len(scratch) < size:
+                    scratch = bytearray(size)
+                scratch[:size] = payload
+                seq += 1
+                sent_ns = time.time_ns()
+                stamp_frame(scratch, seq, sent_ns)
+                measured = sent_ns >= measure_ns
+                payload = memoryview(scratch)[:size]  # Copied by encode_message
+            csid = rtmp.CSID_VIDEO if type_id == rtmp.VIDEO else rtmp.CSID_AUDIO
+            batch.append(
+                rtmp.encode_message(
+                    csid, type_id, client.stream_id, ts, payload, client.out_chunk_size
+                )
+            )
+            if measured:
+                stats.published += size
+        client.send_encoded(b"".join(batch))
+        await client.drain()
+    except (
+        OSError,
+        rtmp.RtmpError,
+        asyncio.IncompleteReadError,
+        asyncio.TimeoutError,
+    ) as e:
+        stats.error(e)
+    finally:
+        if client:
+            client.close()
+
+
+async def play(
+    host: str,
+    port: int,
+    app: str,
+    name: str,
+    stats: LoadStats,
+    measure_from: float,
+    stop: float,
+    gate: Optional[asyncio.Semaphore] = None,
+):
+    """Plays `name` until `stop`, recording each stamped frame's latency."""
+    client, playing = None, False
+    try:
+        async with gate or asyncio.Semaphore():
+            client = await rtmp.AsyncRtmpClient.open(host, port)
+            client.parser.keep_media = False
+            client.parser.media_head = STAMP_END
+            await client.connect(app)
+            info = await client.play(name)
+        if info.get("code") != "NetStream.Play.Start":
+            raise rtmp.RtmpError(info.get("code") or "play refused")
+        stats.players_connected += 1
+        playing = True
+        # One deadline for the whole loop: cheaper than a timeout per message
+        await asyncio.wait_for(
+            _receive(client, stats, measure_from),
+            stop - time.perf_counter(),
+        )
+    except asyncio.TimeoutError as e:
+        if not playing:  # Otherwise it is just the end of the window
+            stats.error(e)
+    except (OSError, rtmp.RtmpError, asyncio.IncompleteReadError) as e:
+        stats.error(e)
+    finally:
+        if client:
+            client.close()
+
+
+async def _receive(client: rtmp.AsyncRtmpClient, stats: LoadStats, measure_from: float):
+    """Counts media and stamped frames forever; bytes by when they were sent,
+    latency samples by when they arrive."""
+    last_seq = None
+    measure_ns, measured = wall_ns(measure_from), False
+    while True:
+        msg = await client.read_message()
+        if msg.type_id not in (rtmp.AUDIO, rtmp.VIDEO):
+            continue
+        now_ns, now = time.time_ns(), time.perf_counter()
+        stamp = read_stamp(msg.payload)
+        if stamp is not None:
+            sent_ns, seq = stamp
+            if last_seq is not None and seq > last_seq + 1:
+                stats.lost_frames += seq - last_seq - 1
+            last_seq = seq
+            measured = sent_ns >= measure_ns
+        if measured:
+            stats.received += msg.length
+        if now < measure_from:
+            continue
+        if stamp is not None:
+            stats.frames += 1
+            stats.samples.append((now - measure_from, (now_ns - sent_ns) / 1e6))
+
+
+async def _watch_loop(stats: LoadStats, interval: float = 0.05):
+    """Records how late the event loop wakes a sleeper: when the generator
+    itself runs out of CPU, lag shows up here rather than in the server."""
+    while True:
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        stats.loop_lag = max(stats.loop_lag, time.perf_counter() - before - interval)
+
+
+async def run_load(
+    host: str,
+    port: int,
+    publishers: int = 1,
+    players: int = 1,
+    bitrate_kbps: float = 6000,
+    duration: float = 10.0,
+    warmup: float = 1.0,
+    app: str = "live",
+    prefix: str = "load",
+    on_phase: Optional[Callable[[str], None]] = None,
+    source: Optional[TagSource] = None,
+) -> LoadStats:
+    """Runs `publishers` streams with `players` players each, then returns
+    what the players saw during the `duration` after `warmup`.
+
+    Every stream sends `source`'s tags (synthetic at `bitrate_kbps` unless
+    given). Players connect first so they see each stream from its first
+    frame. `on_phase` is called with "measure" when the measured window
+    opens and "done" when it closes, e.g. to sample the server's CPU time.
+    """
+    source = source or synthetic_source(bitrate_kbps)
+    stats = LoadStats(duration, publishers, players * publishers)
+    gate = asyncio.Semaphore(CONNECT_LIMIT)
+    connect_time = 1.0 + 0.005 * publishers * (players + 1)
+    measure_from = time.perf_counter() + connect_time + warmup
+    stop = measure_from + duration
+    names = [f"{prefix}{i}" for i in range(publishers)]
+    plays = [
+        asyncio.create_task(
+            play(host, port, app, n, stats, measure_from, stop + PLAY_GRACE, gate)
+        )
+        for n in names
+        for _ in range(players)
+    ]
+    if plays:
+        await asyncio.sleep(min(0.5, connect_time / 2))
+    pubs = [
+        asyncio.create_task(
+            publish(host, port, app, n, source, stats, measure_from, stop, gate)
+        )
+        for n in names
+    ]
+    await asyncio.sleep(max(0.0, measure_from - time.perf_counter()))
+    if on_phase:
+        on_phase("measure")
+    ticker = asyncio.create_task(_watch_loop(stats))
+    await asyncio.gather(*pubs)
+    ticker.cancel()
+    if on_phase:
+        on_phase("done")
+    await asyncio.gather(*plays)
+    stats.samples.sort()
+    return stats
@@ -0,0 +1,673 @@
+# -*- coding: utf-8 -*-
+"""Built-in asyncio RTMP ingest server, a cross-platform MonaServer stand-in.
+
+Selected with `RtmpServer = builtin` in config.ini; setupRTMP6.py then runs
+
+    python rtmp_server.py --port 1935
+
+instead of MonaServer. It accepts the handshake, connect, createStream,
+publish and play, honours Set Chunk Size in both directions, and relays each
+publisher's messages to the subscribers of the same app/stream name. Late
+subscribers first get the cached metadata, sequence headers and current GOP
+so they can start decoding at once. Media is never decoded.
+
+Fan-out is zero-copy past the pool: each message is encoded once into a
+pooled block and every subscriber queues a view of it. Queues are bounded;
+a subscriber that falls behind skips to the next keyframe rather than
+buffering, and is dropped if it keeps lagging
+(tools/bench_fanout.py measures this from 1 to 32 subscribers).
+"""
+
+import argparse
+import asyncio
+import logging
+import struct
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from rtmp import (
+    ACK,
+    AUDIO,
+    COMMAND_AMF0,
+    CSID_AUDIO,
+    CSID_COMMAND,
+    CSID_DATA,
+    CSID_VIDEO,
+    DATA_AMF0,
+    DEFAULT_PORT,
+    HANDSHAKE_SIZE,
+    RTMP_VERSION,
+    SET_CHUNK_SIZE,
+    SET_PEER_BANDWIDTH,
+    STREAM_BEGIN,
+    VIDEO,
+    WINDOW_ACK_SIZE,
+    ChunkParser,
+    Message,
+    RtmpError,
+    amf0_decode,
+    amf0_encode,
+    control_message,
+    encode_message,
+    encode_message_into,
+    encoded_size,
+    server_handshake_reply,
+    user_control,
+    video_frame_kind,
+)
+
+log = logging.getLogger("rtmp_server")
+
+COMMAND_AMF3 = 17
+DATA_AMF3 = 15
+SERVER_CHUNK_SIZE = 4096
+WINDOW_SIZE = 2_500_000
+GOP_CACHE_LIMIT = 8 * 1024 * 1024  # bytes of the current GOP kept for late joiners
+RELAY_STREAM_ID = 1  # stream id relayed messages are encoded for (players use 1)
+BLOCK_SIZE = 256 * 1024  # relayed messages are encoded into blocks this big
+POOL_BLOCKS = 64  # idle blocks kept for reuse, per server
+MAX_QUEUE_BYTES = 4 * 1024 * 1024  # per-subscriber backlog before skipping a GOP
+MAX_LAGGING_GOPS = 3  # consecutive GOPs skipped before a subscriber is dropped
+RECV_SIZE = 16 * 1024  # minimum free space offered to each socket read
+
+
+def _is_sequence_header(msg: Message) -> bool:
+    p = msg.payload
+    if len(p) < 2:
+        return False
+    if msg.type_id == AUDIO:
+        return p[0] >> 4 == 10 and p[1] == 0  # AAC sequence header
+    if p[0] & 0x80:  # Enhanced RTMP SequenceStart
+        return p[0] & 0x0F == 0
+    return p[0] & 0x0F in (7, 12, 13) and p[1] == 0
+
+
+class BufferPool:
+    """Fixed-size blocks that relayed messages are encoded into, recycled."""
+
+    def __init__(self, block_size: int = BLOCK_SIZE, keep: int = POOL_BLOCKS):
+        self.block_size, self.keep = block_size, keep
+        self.allocated = 0  # blocks ever created
+        self._free: List[bytearray] = []
+
+    def block(self, min_size: int) -> "Block":
+        if min_size <= self.block_size and self._free:
+            return Block(self, self._free.pop())
+        self.allocated += 1
+        return Block(self, bytearray(max(min_size, self.block_size)))
+
+    def _recycle(self, buf: bytearray):
+        if len(buf) == self.block_size and len(self._free) < self.keep:
+            self._free.append(buf)
+
+
+class Block:
+    """A pool block being filled by one relay and read by its subscribers.
+
+    `refs` counts the queued packets that still point into it; the block
+    goes back to the pool once it is sealed (full) and nothing does.
+    """
+
+    __slots__ = ("pool", "buf", "view", "used", "refs", "sealed")
+
+    def __init__(self, pool: BufferPool, buf: bytearray):
+        self.pool, self.buf, self.view = pool, buf, memoryview(buf)
+        self.used = self.refs = 0
+        self.sealed = False
+
+    def release(self):
+        self.refs -= 1
+        if not self.refs and self.sealed:
+            self.pool._recycle(self.buf)
+
+    def seal(self):
+        self.sealed = True
+        if not self.refs:
+            self.pool._recycle(self.buf)
+
+
+class Packet:
+    """One encoded message, shared by every subscriber it is queued for.
+
+    `data` is a memoryview slice of a pool block (or plain bytes for control
+    messages, `block` None). Media packets may be skipped by a lagging
+    subscriber; everything else is always delivered.
+    """
+
+    __slots__ = ("data", "block", "media", "keyframe")
+
+    def __init__(
+        self, data, block: Optional[Block] = None, media=False, keyframe=False
+    ):
+        self.data, self.block = data, block
+        self.media, self.keyframe = media, keyframe
+
+
+class Outbox:
+    """A subscriber's bounded queue of shared packets, written in order.
+
+    The transport gets one packet at a time and pauses as soon as it has
+    to buffer anything, so the backlog stays here as references into pool
+    blocks rather than as per-subscriber copies. When the backlog passes
+    `limit`, the queued media is dropped and delivery resumes at the next
+    keyframe, so a slow subscriber skips whole GOPs instead of growing
+    memory; after MAX_LAGGING_GOPS consecutive lagging GOPs it is dropped.
+    """
+
+    def __init__(self, transport: asyncio.Transport, limit: int = MAX_QUEUE_BYTES):
+        self.transport, self.limit = transport, limit
+        self.queue: Deque[Packet] = deque()
+        self.queued = 0
+        self.paused = False
+        self.skipping = False  # waiting for a keyframe
+        self.skipped_gops = 0
+        self._lagging = 0  # consecutive GOPs that overflowed
+        self._lagged = False  # the current GOP overflowed
+        self._written: List[Block] = []  # blocks the transport may still read
+        transport.set_write_buffer_limits(high=0)
+
+    def push(self, packet: Packet) -> bool:
+        """Queues a packet; False means the subscriber is hopelessly slow."""
+        if packet.keyframe:
+            self._lagging = self._lagging + 1 if self._lagged else 0
+            self._lagged = self.skipping = False
+        elif packet.media and self.skipping:
+            return True
+        if packet.media and self.queued + len(packet.data) > self.limit:
+            self._lagged = True
+            self.skipped_gops += 1
+            if self._lagging + 1 >= MAX_LAGGING_GOPS:
+                return False
+            self._drop_media()
+            if not packet.keyframe:
+                self.skipping = True
+                return True
+        if packet.block is not None:
+            packet.block.refs += 1
+        self.queue.append(packet)
+        self.queued += len(packet.data)
+        if not self.paused:
+            self.pump()
+        return True
+
+    def pump(self):
+        while self.queue and not self.paused:
+            packet = self.queue.popleft()
+            self.queued -= len(packet.data)
+            self.transport.write(packet.data)  # may call pause() right away
+            if packet.block is not None:
+                if self.paused:
+                    self._written.append(packet.block)
+                else:
+                    packet.block.release()
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        """The transport's buffer is empty again: nothing references blocks."""
+        self.paused = False
+        for block in self._written:
+            block.release()
+        self._written.clear()
+        self.pump()
+
+    def close(self) -> List[Block]:
+        """Drops the queue; returns the blocks the transport may still read.
+
+        Those were written while paused and must stay out of the pool until
+        the transport drains (resume_writing) or the connection is lost.
+        """
+        for packet in self.queue:
+            if packet.block is not None:
+                packet.block.release()
+        self.queue.clear()
+        self.queued = 0
+        written, self._written = self._written, []
+        self.transport.set_write_buffer_limits()
+        return written
+
+    def _drop_media(self):
+        kept: Deque[Packet] = deque()
+        for packet in self.queue:
+            if not packet.media:
+                kept.append(packet)
+            elif packet.block is not None:
+                packet.block.release()
+        self.queue = kept
+        self.queued = sum(len(p.data) for p in kept)
+
+
+class StreamRelay:
+    """One published stream: its publisher, subscribers and join cache.
+
+    Each message is encoded once, into a pool block, and the same packet is
+    queued for every subscriber: fanning out to more players costs a queue
+    append each, never another copy of the payload. Subscribers need
+    `play_stream_id`, an `outbox`, `write()` and `drop_slow()`.
+    """
+
+    def __init__(self, key: str, pool: Optional[BufferPool] = None):
+        self.key = key
+        self.pool = pool or BufferPool()
+        self.publisher: Optional["RtmpSession"] = None
+        self.subscribers: Set["RtmpSession"] = set()
+        self.metadata: Optional[bytes] = None  # onMetaData AMF0 payload
+        self.headers: Dict[int, Message] = {}  # type_id -> sequence header
+        self.gop: List[Packet] = []
+        self.gop_bytes = 0
+        self._block: Optional[Block] = None
+
+    def reset(self):
+        self.metadata = None
+        self.headers.clear()
+        self._clear_gop()
+        if self._block is not None:
+            self._block.seal()
+            self._block = None
+
+    def set_metadata(self, payload: bytes):
+        self.metadata = payload
+        msg = Message(DATA_AMF0, RELAY_STREAM_ID, 0, payload, len(payload))
+        self.broadcast(msg, self.pack(msg, RELAY_STREAM_ID))
+
+    def on_media(self, msg: Message):
+        """Relays one audio/video message; its payload may be borrowed."""
+        header = _is_sequence_header(msg)
+        if header:
+            self.headers[msg.type_id] = Message(
+                msg.type_id,
+                msg.stream_id,
+                msg.timestamp,
+                bytes(msg.payload),
+                msg.length,
+            )
+        key = not header and msg.type_id == VIDEO and video_frame_kind(msg.payload)[1]
+        packet = self.pack(msg, RELAY_STREAM_ID, media=not header, keyframe=key)
+        if key:
+            self._clear_gop()
+        if not header and (key or self.gop):
+            if self.gop_bytes + len(packet.data) <= GOP_CACHE_LIMIT:
+                packet.block.refs += 1
+                self.gop.append(packet)
+                self.gop_bytes += len(packet.data)
+            else:
+                self._clear_gop()  # Oversized GOP: wait for the next keyframe
+        self.broadcast(msg, packet)
+
+    def pack(self, msg: Message, sid: int, media=False, keyframe=False) -> Packet:
+        """Encodes `msg` for stream `sid` into the current pool block."""
+        csid = {AUDIO: CSID_AUDIO, VIDEO: CSID_VIDEO}.get(msg.type_id, CSID_DATA)
+        size = encoded_size(csid, msg.timestamp, len(msg.payload), SERVER_CHUNK_SIZE)
+        block = self._block
+        if block is None or block.used + size > len(block.buf):
+            if block is not None:
+                block.seal()
+            block = self._block = self.pool.block(size)
+        start = block.used
+        block.used = encode_message_into(
+            block.view,
+            start,
+            csid,
+            msg.type_id,
+            sid,
+            msg.timestamp,
+            msg.payload,
+            SERVER_CHUNK_SIZE,
+        )
+        return Packet(block.view[start : block.used], block, media, keyframe)
+
+    def broadcast(self, msg: Message, packet: Packet):
+        packets = {RELAY_STREAM_ID: packet}
+        for sub in list(self.subscribers):
+            sid = sub.play_stream_id
+            if sid not in packets:  # Rare: a player on another stream id
+                packets[sid] = self.pack(msg, sid, packet.media, packet.keyframe)
+            if not sub.outbox.push(packets[sid]):
+                sub.drop_slow()
+
+    def join(self, sub: "RtmpSession"):
+        """Sends the cached start of the stream, then relays live messages."""
+        sid = sub.play_stream_id
+        if self.metadata is not None:
+            sub.write(
+                encode_message(
+                    CSID_DATA, DATA_AMF0, sid, 0, self.metadata, SERVER_CHUNK_SIZE
+                )
+            )
+        for msg in self.headers.values():
+            sub.write(_encode_for_play(msg, sid))
+        if sid == RELAY_STREAM_ID:
+            for packet in self.gop:
+                sub.outbox.push(packet)
+        else:
+            sub.outbox.skipping = True  # The cached GOP is encoded for stream 1
+        self.subscribers.add(sub)
+
+    def _clear_gop(self):
+        for packet in self.gop:
+            packet.block.release()
+        self.gop.clear()
+        self.gop_bytes = 0
+
+
+def _encode_for_play(msg: Message, stream_id: int) -> bytes:
+    csid = {AUDIO: CSID_AUDIO, VIDEO: CSID_VIDEO}.get(msg.type_id, CSID_DATA)
+    return encode_message(
+        csid, msg.type_id, stream_id, msg.timestamp, msg.payload, SERVER_CHUNK_SIZE
+    )
+
+
+class RtmpSession(asyncio.BufferedProtocol):
+    """One client connection, driven by asyncio's callback protocol API.
+
+    Socket reads land directly in the chunk parser's receive buffer
+    (BufferedProtocol), and media payloads are handed to the relay as
+    borrowed views, so the only payload copy on the way through the server
+    is the one into the pool block every subscriber then shares.
+    """
+
+    def __init__(self, server: "RtmpServer"):
+        self.server = server
+        self.transport: Optional[asyncio.Transport] = None
+        self.peer = "?"
+        self.parser = ChunkParser()
+        self._stage = 0  # 0: waiting C0+C1, 1: waiting C2, 2: chunk stream
+        self.app = ""
+        self.next_stream_id = 1
+        self.ack_window = 0
+        self._acked = 0
+        self.publishing: Optional[StreamRelay] = None
+        self.publish_stream_id = 0
+        self.playing: Optional[StreamRelay] = None
+        self.play_stream_id = 1
+        self.outbox: Optional[Outbox] = None  # set while playing
+        self._writing_paused = False
+        self._draining: List[Block] = []  # from a closed outbox, see Outbox.close
+
+    # --- Transport callbacks ---
+    def connection_made(self, transport):
+        self.transport = transport
+        self.peer = "%s:%s" % transport.get_extra_info("peername")[:2]
+
+    def connection_lost(self, exc):
+        self._unpublish()
+        self._unplay()
+        self._release_drained()
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.parser.recv_buffer(RECV_SIZE)
+
+    def buffer_updated(self, nbytes: int):
+        self.parser.commit(nbytes)
+        try:
+            if self._stage < 2 and not self._handshake():
+                return
+            for msg in self.parser.parse():
+                self._dispatch(msg)
+            received = self.parser.bytes_received
+            if self.ack_window and received - self._acked >= self.ack_window:
+                self.write(control_message(ACK, received & 0xFFFFFFFF))
+                self._acked = received
+        except (RtmpError, ValueError, IndexError, struct.error) as e:
+            log.warning("%s: protocol error, closing: %s", self.peer, e)
+            self.transport.close()
+
+    def _handshake(self) -> bool:
+        """Consumes handshake bytes; True once the chunk stream has begun."""
+        if self._stage == 0:
+            c0c1 = self.parser.take(1 + HANDSHAKE_SIZE)
+            if c0c1 is None:
+                return False
+            if c0c1[0] != RTMP_VERSION:
+                raise RtmpError(f"unsupported RTMP version {c0c1[0]}")
+            self.write(server_handshake_reply(c0c1[1:]))
+            self._stage = 1
+        if self.parser.take(HANDSHAKE_SIZE) is None:
+            return False
+        self._stage = 2
+        return True
+
+    def pause_writing(self):
+        self._writing_paused = True
+        if self.outbox is not None:
+            self.outbox.pause()
+
+    def resume_writing(self):
+        self._writing_paused = False
+        self._release_drained()
+        if self.outbox is not None:
+            self.outbox.resume()
+
+    def _release_drained(self):
+        for block in self._draining:
+            block.release()
+        self._draining.clear()
+
+    def write(self, data: bytes):
+        if self.outbox is not None:
+            self.outbox.push(Packet(data))  # Stay in order with queued media
+        else:
+            self.transport.write(data)
+
+    def drop_slow(self):
+        log.warning(
+            "%s: subscriber too slow (%d GOPs skipped), dropping",
+            self.peer,
+            self.outbox.skipped_gops,
+        )
+        self._unplay()
+        self.transport.abort()
+
+    # --- Messages ---
+    def _dispatch(self, msg: Message):
+        t = msg.type_id
+        if t in (AUDIO, VIDEO):
+            if self.publishing and msg.stream_id == self.publish_stream_id:
+                self.publishing.on_media(msg)
+            return
+        payload = bytes(msg.payload)  # Borrowed from the parser
+        if t in (COMMAND_AMF0, COMMAND_AMF3):
+            values = amf0_decode(payload[1:] if t == COMMAND_AMF3 else payload)
+            if values and isinstance(values[0], str):
+                self._command(
+                    values[0], values[1] if len(values) > 1 else 0, values[2:]
+                )
+        elif t in (DATA_AMF0, DATA_AMF3):
+            self._data(payload[1:] if t == DATA_AMF3 else payload)
+        elif t == WINDOW_ACK_SIZE and len(payload) >= 4:
+            self.ack_window = struct.unpack(">I", payload[:4])[0]
+        # SET_CHUNK_SIZE/ABORT are applied by the parser; ACK, USER_CONTROL
+        # (ping replies, buffer length) and peer bandwidth need no action.
+
+    def _data(self, payload: bytes):
+        if not self.publishing:
+            return
+        values = amf0_decode(payload)
+        if values and values[0] == "@setDataFrame":
+            values = values[1:]
+        if values and values[0] == "onMetaData":
+            self.publishing.set_metadata(amf0_encode(*values))
+
+    def _reply(self, txn, *values, stream_id: int = 0, csid: int = CSID_COMMAND):
+        payload = amf0_encode(*values[:1], txn, *values[1:])
+        self.write(
+            encode_message(csid, COMMAND_AMF0, stream_id, 0, payload, SERVER_CHUNK_SIZE)
+        )
+
+    def send_status(self, stream_id: int, level: str, code: str, description: str = ""):
+        info = {"level": level, "code": code, "description": description or code}
+        self._reply(0, "onStatus", None, info, stream_id=stream_id, csid=CSID_DATA)
+
+    def _command(self, name: str, txn, args: list):
+        if name == "connect":
+            props = args[0] if args and isinstance(args[0], dict) else {}
+            self.app = str(props.get("app", "")).strip("/")
+            self.write(
+                control_message(WINDOW_ACK_SIZE, WINDOW_SIZE)
+                + encode_message(
+                    2, SET_PEER_BANDWIDTH, 0, 0, struct.pack(">IB", WINDOW_SIZE, 2)
+                )
+                + control_message(SET_CHUNK_SIZE, SERVER_CHUNK_SIZE)
+            )
+            self._reply(
+                txn,
+                "_result",
+                {"fmsVer": "FMS/3,0,1,123", "capabilities": 31},
+                {
+                    "level": "status",
+                    "code": "NetConnection.Connect.Success",
+                    "description": "Connection succeeded.",
+                    "objectEncoding": 0,
+                },
+            )
+        elif name == "createStream":
+            self._reply(txn, "_result", None, self.next_stream_id)
+            self.next_stream_id += 1
+        elif name == "publish":
+            self._publish(str(args[1]) if len(args) > 1 else "")
+        elif name == "play":
+            self._play(str(args[1]) if len(args) > 1 else "")
+        elif name in ("deleteStream", "closeStream", "FCUnpublish"):
+            self._unpublish()
+            self._unplay()
+            if name == "FCUnpublish":
+                self._reply(txn, "_result", None)
+        elif name in ("releaseStream", "FCPublish", "getStreamLength"):
+            self._reply(txn, "_result", None)
+
+    def _stream_key(self, name: str) -> str:
+        return f"{self.app}/{name.split('?', 1)[0]}"
+
+    def _publish(self, name: str):
+        relay = self.server.relay(self._stream_key(name))
+        sid = self.next_stream_id - 1 or 1
+        if relay.publisher is not None:
+            self.send_status(
+                sid,
+                "error",
+                "NetStream.Publish.BadName",
+                f"{relay.key} is already being published",
+            )
+            return
+        self._unpublish()
+        relay.publisher, self.publishing, self.publish_stream_id = self, relay, sid
+        relay.reset()
+        self.write(user_control(STREAM_BEGIN, sid))
+        self.send_status(
+            sid, "status", "NetStream.Publish.Start", f"{relay.key} is now published"
+        )
+        log.info("%s: publishing %s", self.peer, relay.key)
+
+    def _play(self, name: str):
+        self._unplay()
+        relay = self.server.relay(self._stream_key(name))
+        sid = self.play_stream_id = self.next_stream_id - 1 or 1
+        self.outbox = Outbox(self.transport)
+        self.outbox.paused = self._writing_paused  # Still draining a past play
+        self.write(user_control(STREAM_BEGIN, sid))
+        self.send_status(
+            sid, "status", "NetStream.Play.Reset", f"Resetting {relay.key}"
+        )
+        self.send_status(
+            sid, "status", "NetStream.Play.Start", f"Started playing {relay.key}"
+        )
+        self.write(
+            encode_message(
+                CSID_DATA,
+                DATA_AMF0,
+                sid,
+                0,
+                amf0_encode("|RtmpSampleAccess", True, True),
+                SERVER_CHUNK_SIZE,
+            )
+        )
+        self.playing = relay
+        relay.join(self)
+        log.info("%s: playing %s", self.peer, relay.key)
+
+    def _unpublish(self):
+        relay, self.publishing = self.publishing, None
+        if relay is None or relay.publisher is not self:
+            return
+        relay.publisher = None
+        relay.reset()
+        for sub in list(relay.subscribers):
+            sub.send_status(
+                sub.play_stream_id,
+                "status",
+                "NetStream.Play.UnpublishNotify",
+                f"{relay.key} is now unpublished",
+            )
+        self.server.release(relay)
+        log.info("%s: stopped publishing %s", self.peer, relay.key)
+
+    def _unplay(self):
+        relay, self.playing = self.playing, None
+        if relay is not None:
+            relay.subscribers.discard(self)
+            self.server.release(relay)
+        if self.outbox is not None:
+            self._draining += self.outbox.close()
+            self.outbox = None
+
+
+class RtmpServer:
+    """Accepts RTMP connections and keeps the table of live streams."""
+
+    def __init__(self, host: str = "", port: int = DEFAULT_PORT):
+        self.host, self.port = host, port
+        self.streams: Dict[str, StreamRelay] = {}
+        self.pool = BufferPool()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def relay(self, key: str) -> StreamRelay:
+        if key not in self.streams:
+            self.streams[key] = StreamRelay(key, self.pool)
+        return self.streams[key]
+
+    def release(self, relay: StreamRelay):
+        """Forgets a stream nobody publishes or plays any more."""
+        if relay.publisher is None and not relay.subscribers:
+            relay.reset()
+            self.streams.pop(relay.key, None)
+
+    async def start(self) -> "RtmpServer":
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(
+            lambda: RtmpSession(self), self.host or None, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        log.info("RTMP server listening on %s:%d", self.host or "*", self.port)
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="", help="interface to bind (default: all)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--quiet", action="store_true", help="log warnings only")
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.WARNING if args.quiet else logging.INFO,
+        format="%(asctime)s rtmp_server: %(message)s",
+        datefmt="%H:%M:%S",
+    )
+    try:
+        asyncio.run(RtmpServer(args.host, args.port).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
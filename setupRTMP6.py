@@ -1,69 +1,91 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-# pylint: disable=too-many-lines,invalid-name,line-too-long
+# pylint: disable=too-many-lines,invalid-name,line-too-long,import-outside-toplevel
 """RTMP Stream Setup Assistant (Enhanced V3 - Port Check)
 A visually appealing utility to configure RTMP streaming from Android devices.
 Reads configuration from config.ini. Checks for host port conflicts.
 """
 
 # Standard library imports
+import argparse
 import configparser
+import errno
+import importlib.util
+import json
 import os
 import platform
 import re
 import shutil
+import signal
+import socket
+import stat
 import subprocess
+import struct
 import sys
+import threading
 import time
-from dataclasses import dataclass, field
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-
-# For folder selection dialog
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from adb_client import AdbClient, AdbError, AdbServerUnavailable
+from metrics import Registry, serve
+from mona_ini import PROFILES as MONA_PROFILES
+from mona_ini import ini_rtmp_port, write_ini
+from rtmp import StreamStats, parse_rtmp_url, probe_stream
+from taskgraph import TaskGraph
+from tracing import TRACER, span
+
+# Heavy modules are loaded on first use to keep cold start fast: tkinter in
+# _get_tk_root(), rich widgets inside the functions that draw them, and
+# psutil/pyperclip through the _LazyModule stand-ins below.
 TK = None
 FILEDIALOG = None
-TKINTER_AVAILABLE = False
-try:
-    import tkinter
-    import tkinter.filedialog
+TKINTER_AVAILABLE = importlib.util.find_spec("tkinter") is not None
+
+
+class _LazyModule:
+    """Stands in for a module that is imported on first attribute access.
+
+    Unlike importlib's LazyLoader (before Python 3.12.3) this is safe when
+    several threads touch the module first at the same time.
+    """
+
+    def __init__(self, name: str):
+        self._name, self._module, self._lock = name, None, threading.Lock()
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def _lazy_import(name: str):
+    """`name` as a module whose body runs on first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named '{name}'")
+    return _LazyModule(name)
 
-    TK = tkinter
-    FILEDIALOG = tkinter.filedialog
-    TKINTER_AVAILABLE = True
-except ImportError:
-    pass
 
 # Third-party imports
 try:
-    import psutil
-    import pyperclip
-    from rich.box import ROUNDED
-    from rich.console import Console
-    from rich.panel import Panel
-    from rich.progress import Progress, SpinnerColumn, TextColumn
-    from rich.prompt import Confirm, Prompt
-    from rich.table import Table
-    from rich.text import Text
-    from rich.theme import Theme
+    psutil = _lazy_import("psutil")
+    pyperclip = _lazy_import("pyperclip")
+    if importlib.util.find_spec("rich") is None:
+        raise ImportError("No module named 'rich'")
 except ImportError:
-    missing_modules = []
-    try:
-        import importlib.util
-
-        if not importlib.util.find_spec("rich"):
-            missing_modules.append("rich")
-        if not importlib.util.find_spec("pyperclip"):
-            missing_modules.append("pyperclip")
-        if not importlib.util.find_spec("psutil"):
-            missing_modules.append("psutil")
-    except ImportError:
-        missing_modules.extend(["rich", "pyperclip", "psutil"])
-
+    missing_modules = [
+        m for m in ("rich", "pyperclip", "psutil") if not importlib.util.find_spec(m)
+    ]
     if missing_modules:
-        unique_missing = sorted(list(set(missing_modules)))
         print(
-            f"Error: Required libraries not found. Please install {' '.join(unique_missing)} using:\n"
-            f"pip install {' '.join(unique_missing)}"
+            f"Error: Required libraries not found. Please install {' '.join(missing_modules)} using:\n"
+            f"pip install {' '.join(missing_modules)}"
         )
     else:
         print(
@@ -74,17 +96,57 @@ except ImportError:
 # --- Configuration ---
 SCRIPT_DIR = Path(__file__).parent.resolve()
 CONFIG_FILE = SCRIPT_DIR / "config.ini"
+DEVICE_CACHE_FILE = SCRIPT_DIR / "device_cache.json"
+TOOLCHAIN_CACHE_FILE = SCRIPT_DIR / "toolchain_cache.json"
+MONA_STATE_FILE = SCRIPT_DIR / "monaserver_state.json"
+RTMP_LISTENERS_FILE = SCRIPT_DIR / "rtmp_listeners.json"
+RECORDERS_FILE = SCRIPT_DIR / "recorders.json"
+MONA_INSTANCES_DIR = SCRIPT_DIR / "mona_instances"
+# monaserver | builtin (rtmp_server.py); MonaServer only ships for Windows
+DEFAULT_RTMP_SERVER = "monaserver" if sys.platform == "win32" else "builtin"
 DEFAULT_CONFIG = {
     "Paths": {"AdbPath": "", "MonaServerPath": "", "ObsPath": ""},
     "Device": {"PackageName": "com.telegram.a1064/com.nvshen.chmp4.SplashActivity"},
-    "Network": {"RtmpPort": "1935"},
+    "Network": {"RtmpPort": "1935", "RtmpPortRange": "1935-1964"},
     "Options": {
         "AutoStartMonaServer": "true",
+        "RtmpServer": DEFAULT_RTMP_SERVER,
         "AutoSelectSingleDevice": "true",
-        "FetchDeviceModels": "true",
+        "SetupAllDevices": "false",
+        "FetchDeviceModels": "true",  # true | false | cached
         "ForceKillConflictingPortProcess": "true",
+        "ModelFetchWorkers": "8",
+        "DeviceScanTimeout": "6",
+        "NativeAdb": "true",
+        "DeviceCacheTtlDays": "30",
+        "DeviceCacheMaxEntries": "256",
+        "MonaReadyTimeout": "10",
+        # low-latency | high-bitrate | many-streams | default; empty keeps the ini
+        "MonaProfile": "",
+        "PortReleaseTimeout": "5",
+        "HealthProbeSeconds": "0",  # 0 disables the stream health probe
+        "HealthProbeStream": "",
+        "Record": "false",
+        "RecordDir": "recordings",
+        "MetricsPort": "0",  # 0 disables the /metrics endpoint
     },
 }
+# Fields reported after the state column by `adb devices -l`
+DEVICE_DETAIL_KEYS = ("product", "model", "device", "usb", "transport_id")
+# One device per line; the "List of devices attached" header never matches
+DEVICE_LINE_RE = re.compile(
+    r"^([\w.\-:]+)\s+(device|offline|unauthorized)(?:\s+(.*))?$"
+)
+# Process exit codes (reported as "exit_code" in --headless JSON output)
+EXIT_OK = 0
+EXIT_ERROR = 1  # Configuration or unexpected error
+EXIT_ADB = 3
+EXIT_NO_DEVICE = 4
+EXIT_PORT_FORWARD = 5
+EXIT_APP_LAUNCH = 6
+EXIT_MONASERVER = 7
+HEADLESS = False  # Set by --headless: never prompt, JSON on stdout
+_process_table_lock = threading.Lock()  # Guards RTMP_LISTENERS_FILE/RECORDERS_FILE
 DEFAULT_ADB_PATH_WIN = "C:\\platform-tools\\adb.exe"
 DEFAULT_OBS_PATH_WIN = "C:\\Program Files\\obs-studio\\bin\\64bit\\obs64.exe"
 
@@ -99,28 +161,300 @@ class Config:
     package_name: str = DEFAULT_CONFIG["Device"]["PackageName"]
     rtmp_port: str = DEFAULT_CONFIG["Network"]["RtmpPort"]
     auto_start_monaserver: bool = True
+    rtmp_server: str = DEFAULT_RTMP_SERVER
     auto_select_single_device: bool = True
+    setup_all_devices: bool = False
+    rtmp_port_range: Tuple[int, int] = (1935, 1964)
     fetch_device_models: bool = True
+    cache_device_models: bool = False
+    device_cache_ttl_days: float = 30.0
+    device_cache_max_entries: int = 256
+    mona_ready_timeout: float = 10.0
+    mona_profile: str = ""
+    port_release_timeout: float = 5.0
     force_kill_port_process: bool = True
+    model_fetch_workers: int = 8
+    device_scan_timeout: float = 6.0
+    native_adb: bool = True
+    health_probe_seconds: float = 0.0
+    health_probe_stream: str = ""
+    record: bool = False
+    record_dir: str = "recordings"
+    metrics_port: int = 0
     devices: List[Dict[str, str]] = field(default_factory=list)
 
 
-custom_theme = Theme(
-    {
-        "info": "dim cyan",
-        "warning": "yellow",
-        "danger": "bold red",
-        "success": "bold green",
-        "error": "red",
-        "rtmp": "bold magenta",
-        "highlight": "bold blue",
-        "header": "white on blue",
-        "command": "green on black",
-        "dimmed": "dim",
-        "process": "italic magenta",
-    }
+class JsonCache:
+    """Entries kept as one JSON object in `path`, each stamped "updated".
+
+    save() keeps the `max_entries` most recently updated ones and replaces
+    the file atomically. Subclasses validate entries in load(): one that
+    _entry_updated() rejects would break the sort and must be dropped.
+    """
+
+    label = "cache"
+    max_entries = 32
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+
+    def _read(self) -> Dict[str, Any]:
+        """The file's object; empty (and dirty, if the file was not) on error."""
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(raw, dict):
+            self.dirty = True
+            return {}
+        return raw
+
+    @staticmethod
+    def _entry_updated(entry: Any) -> Optional[float]:
+        if not isinstance(entry, dict):
+            return None
+        try:
+            return float(entry["updated"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def save(self):
+        if not self.dirty:
+            return
+        newest = sorted(
+            self.entries.items(), key=lambda kv: kv[1]["updated"], reverse=True
+        )
+        self.entries = dict(newest[: self.max_entries])
+        tmp = self.path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(self.entries, indent=1), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError as e:
+            console.print(f"[warning]Could not save {self.label}: {e}[/warning]")
+
+
+class DeviceCache(JsonCache):
+    """Per-serial device metadata persisted to DEVICE_CACHE_FILE.
+
+    Entries hold model, manufacturer and connection type plus the time they
+    were last refreshed. Expired entries are dropped on load, and the oldest
+    ones are evicted on save once `max_entries` is exceeded.
+    """
+
+    FIELDS = {"model", "manufacturer"}  # Required in every entry
+    label = "device cache"
+
+    def __init__(self, path: Path, ttl_days: float, max_entries: int):
+        super().__init__(path)
+        self.ttl = ttl_days * 86400
+        self.max_entries = max(1, max_entries)
+
+    def load(self) -> "DeviceCache":
+        raw = self._read()
+        now = time.time()
+        for serial, entry in raw.items():
+            # Corrupt entries are skipped, and so dropped on the next save
+            updated = self._entry_updated(entry)
+            if updated is None or not self.FIELDS.issubset(entry):
+                continue
+            if now - updated < self.ttl:
+                self.entries[serial] = {**entry, "updated": updated}
+        self.dirty = self.dirty or len(self.entries) != len(raw)
+        return self
+
+    def get(self, serial: str) -> Optional[Dict[str, str]]:
+        return self.entries.get(serial)
+
+    def put(self, serial: str, model: str, manufacturer: str, connection: str):
+        self.entries[serial] = {
+            "model": model,
+            "manufacturer": manufacturer,
+            "connection": connection,
+            "updated": time.time(),
+        }
+        self.dirty = True
+
+
+class ToolchainCache(JsonCache):
+    """Probe results for the configured binaries, in TOOLCHAIN_CACHE_FILE.
+
+    Entries are keyed by path and stamped with the binary's size and mtime
+    when probed. A stamp that no longer matches drops the entry, so updating
+    or replacing adb, MonaServer or OBS invalidates it without any expiry.
+    """
+
+    label = "toolchain cache"
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._current: Set[str] = set()  # Fingerprints checked this run
+
+    def load(self) -> "ToolchainCache":
+        raw = self._read()
+        for name, entry in raw.items():
+            # As in DeviceCache, corrupt entries are dropped on the next save
+            updated = self._entry_updated(entry)
+            fingerprint = entry.get("fingerprint") if updated is not None else None
+            if isinstance(fingerprint, list) and all(
+                isinstance(n, int) for n in fingerprint
+            ):
+                self.entries[name] = {**entry, "updated": updated}
+        self.dirty = self.dirty or len(self.entries) != len(raw)
+        return self
+
+    @staticmethod
+    def fingerprint(binary: Path) -> Optional[List[int]]:
+        try:
+            st = binary.stat()
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns] if stat.S_ISREG(st.st_mode) else None
+
+    def get(self, binary: Path, key: str) -> Optional[str]:
+        name = str(binary)
+        entry = self.entries.get(name)
+        if entry is None or key not in entry:
+            return None
+        if name not in self._current:
+            if entry.get("fingerprint") != self.fingerprint(binary):
+                del self.entries[name]
+                self.dirty = True
+                return None
+            self._current.add(name)
+        return entry[key]
+
+    def put(self, binary: Path, key: str, value: str):
+        fingerprint = self.fingerprint(binary)
+        if fingerprint is None:
+            return
+        name = str(binary)
+        entry = self.entries.get(name)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            entry = self.entries[name] = {"fingerprint": fingerprint}
+        entry[key] = value
+        entry["updated"] = time.time()
+        self._current.add(name)
+        self.dirty = True
+
+
+_toolchain_cache: Optional[ToolchainCache] = None
+
+
+def get_toolchain_cache() -> ToolchainCache:
+    global _toolchain_cache
+    if _toolchain_cache is None:
+        _toolchain_cache = ToolchainCache(TOOLCHAIN_CACHE_FILE).load()
+    return _toolchain_cache
+
+
+THEME_STYLES = {
+    "info": "dim cyan",
+    "warning": "yellow",
+    "danger": "bold red",
+    "success": "bold green",
+    "error": "red",
+    "rtmp": "bold magenta",
+    "highlight": "bold blue",
+    "header": "white on blue",
+    "command": "green on black",
+    "dimmed": "dim",
+    "process": "italic magenta",
+}
+
+
+_MARKUP_RE = re.compile(r"\[/?(?:[a-z#][\w #.-]*)?\]")
+
+
+class _LazyConsole:
+    """Stands in for the themed rich Console and builds it on first use.
+
+    In plain mode (--headless) rich is never loaded: markup is stripped and
+    messages go to stderr so stdout carries only the JSON result.
+    """
+
+    _console = None
+    plain = False
+
+    def _rich(self):
+        if _LazyConsole._console is None:
+            from rich.console import Console
+            from rich.theme import Theme
+
+            _LazyConsole._console = Console(theme=Theme(THEME_STYLES), highlight=True)
+        return _LazyConsole._console
+
+    def print(self, *objects, **kwargs):
+        if not self.plain:
+            self._rich().print(*objects, **kwargs)
+            return
+        text = " ".join(
+            _MARKUP_RE.sub("", o) if isinstance(o, str) else str(o) for o in objects
+        )
+        try:
+            sys.stderr.write(text + "\n")
+        except UnicodeEncodeError:
+            enc = sys.stderr.encoding or "ascii"
+            sys.stderr.write((text + "\n").encode(enc, "replace").decode(enc))
+
+    def __getattr__(self, name):
+        return getattr(self._rich(), name)
+
+
+console = _LazyConsole()
+
+# --- Metrics (served on MetricsPort by metrics.serve) ---
+METRICS = Registry()
+PHASE_SECONDS = METRICS.histogram(
+    "rtmp_setup_phase_duration_seconds",
+    "Duration of each setup step.",
+    ("phase",),
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+ADB_SECONDS = METRICS.histogram(
+    "rtmp_setup_adb_command_duration_seconds",
+    "Latency of adb commands by verb, over the native client or a spawned adb.",
+    ("verb", "via"),
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+ADB_FAILURES = METRICS.counter(
+    "rtmp_setup_adb_command_failures_total",
+    "adb commands that exited non-zero or timed out.",
+    ("verb", "reason"),
+)
+PORT_KILLS = METRICS.counter(
+    "rtmp_setup_port_conflict_kills_total",
+    "Processes killed to free the RTMP port.",
+)
+MONA_STARTS = METRICS.counter(
+    "rtmp_setup_monaserver_starts_total",
+    "RTMP server processes started by this tool.",
+)
+MONA_RESTARTS = METRICS.counter(
+    "rtmp_setup_monaserver_restarts_total",
+    "Times the RTMP server process was found replaced by a new one.",
+)
+MONA_UP = METRICS.gauge(
+    "rtmp_setup_monaserver_up",
+    "1 while the RTMP server process is running.",
+)
+APP_LAUNCH_SECONDS = METRICS.histogram(
+    "rtmp_setup_app_launch_seconds",
+    "App launch times reported by am start -W (this, total, wait).",
+    ("measure",),
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+APP_LAUNCH_SKIPS = METRICS.counter(
+    "rtmp_setup_app_launch_skipped_total",
+    "Launches skipped because the app was already in the foreground.",
+)
+DEVICE_STATE = METRICS.gauge(
+    "rtmp_setup_device_state",
+    "1 for each listed device's current connection state.",
+    ("serial", "state"),
 )
-console = Console(theme=custom_theme, highlight=True)
 
 # --- Original ASCII Logo ---
 LOGO = r"""
@@ -148,9 +482,16 @@ _tk_root = None
 
 
 def _get_tk_root():
-    global _tk_root
-    if not TKINTER_AVAILABLE or not TK:
+    global _tk_root, TK, FILEDIALOG
+    if not TKINTER_AVAILABLE:
         return None
+    if TK is None:
+        try:
+            import tkinter
+            import tkinter.filedialog
+        except ImportError:
+            return None
+        TK, FILEDIALOG = tkinter, tkinter.filedialog
     if _tk_root is None or not _tk_root.winfo_exists():
         _tk_root = TK.Tk()
         _tk_root.withdraw()
@@ -218,7 +559,13 @@ def validate_path(
         )
     elif type_hint in ["mona", "obs", "file"]:  # General file
         if path_to_check.is_file():
-            if type_hint == "mona" and "monaserver" not in path_to_check.name.lower():
+            if (
+                type_hint == "mona"
+                and "monaserver" not in path_to_check.name.lower()
+                and not HEADLESS
+            ):
+                from rich.prompt import Confirm
+
                 if not Confirm.ask(
                     f"'{path_to_check}' doesn't look like MonaServer. Use anyway?"
                 ):
@@ -228,6 +575,20 @@ def validate_path(
     return None
 
 
+def validate_path_cached(
+    path_to_check: Path, type_hint: str, is_windows: bool
+) -> Optional[Path]:
+    """validate_path, skipped while the file's cached fingerprint matches."""
+    cache = get_toolchain_cache()
+    key = f"path:{type_hint}"
+    if cached := cache.get(path_to_check, key):
+        return Path(cached)
+    resolved = validate_path(path_to_check, type_hint, is_windows)
+    if resolved:
+        cache.put(path_to_check, key, str(resolved))
+    return resolved
+
+
 def get_path_interactively(
     prompt_message: str,
     default_suggestion: Optional[str],
@@ -235,6 +596,8 @@ def get_path_interactively(
     dialog_title: str,
     dialog_filetypes: Optional[list] = None,
 ) -> Optional[Path]:
+    from rich.prompt import Confirm, Prompt
+
     is_windows = platform.system() == "Windows"
     while True:
         path_str_input: Optional[str] = None
@@ -291,7 +654,13 @@ def get_path_interactively(
             return validated_p
 
 
-def load_config() -> Config:
+def load_config(device_setup: bool = True) -> Config:
+    """Reads config.ini, asking for (or, headless, failing on) missing paths.
+
+    Without `device_setup` (--latency) no phone is set up, so neither
+    AdbPath nor MonaServerPath is required; a missing MonaServer only
+    matters if nothing answers on RtmpPort.
+    """
     app_config = Config()
     parser = configparser.ConfigParser()
     first_run = not CONFIG_FILE.exists()
@@ -311,7 +680,7 @@ def load_config() -> Config:
                 ("ADB Executable", "adb.exe" if is_windows else "adb"),
                 ("All files", "*.*"),
             ],
-            "critical": True,
+            "critical": device_setup,
         },
         "MonaServerPath": {
             "attr": "monaserver_path",
@@ -343,11 +712,24 @@ def load_config() -> Config:
         },
     }
 
+    def uses_builtin_server() -> bool:
+        kind = parser.get("Options", "RtmpServer", fallback=DEFAULT_RTMP_SERVER)
+        return kind.strip().lower() == "builtin"
+
+    if first_run and HEADLESS:
+        exit_with_error(
+            f"'{CONFIG_FILE.name}' not found. Run once interactively to create it."
+        )
     if first_run:
         console.print(
             f"[warning]'{CONFIG_FILE.name}' not found. Starting interactive setup.[/warning]"
         )
         parser.read_dict(DEFAULT_CONFIG)
+        path_definitions["MonaServerPath"]["critical"] = (
+            device_setup and not uses_builtin_server()
+        )
+        from rich.panel import Panel
+
         console.print(
             Panel(
                 "[bold yellow]First-Time Setup: Paths[/]",
@@ -373,6 +755,9 @@ def load_config() -> Config:
     else:
         parser.read(CONFIG_FILE, encoding="utf-8")
         console.print(f"[info]Loaded configuration from '{CONFIG_FILE.name}'[/info]")
+        path_definitions["MonaServerPath"]["critical"] = (
+            device_setup and not uses_builtin_server()
+        )
 
         for key, details in path_definitions.items():
             path_str_from_config = parser.get("Paths", key, fallback="")
@@ -382,7 +767,7 @@ def load_config() -> Config:
                 validation_type_hint = (
                     "adb_file" if key == "AdbPath" else details["type"]
                 )
-                path_obj = validate_path(
+                path_obj = validate_path_cached(
                     Path(path_str_from_config), validation_type_hint, is_windows
                 )
 
@@ -390,6 +775,10 @@ def load_config() -> Config:
                 setattr(app_config, details["attr"], path_obj)
             else:
                 setattr(app_config, details["attr"], None)
+                if details["critical"] and HEADLESS:
+                    exit_with_error(
+                        f"Configured {details['prompt']} ('{path_str_from_config or 'empty'}') is invalid or missing."
+                    )
                 if details["critical"]:
                     console.print(
                         f"[warning]Configured {details['prompt']} ('{path_str_from_config or 'empty'}') is invalid or missing. Please correct it.[/warning]"
@@ -416,23 +805,93 @@ def load_config() -> Config:
                     parser.set("Paths", key, "")
                     config_updated_in_session = True
 
+    get_toolchain_cache().save()
+
     app_config.package_name = parser.get(
         "Device", "PackageName", fallback=DEFAULT_CONFIG["Device"]["PackageName"]
     )
     app_config.rtmp_port = parser.get(
         "Network", "RtmpPort", fallback=DEFAULT_CONFIG["Network"]["RtmpPort"]
     )
+    app_config.auto_start_monaserver = parser.getboolean(
+        "Options", "AutoStartMonaServer", fallback=app_config.auto_start_monaserver
+    )
+    server_kind = parser.get("Options", "RtmpServer", fallback="").strip().lower()
+    if server_kind in ("monaserver", "builtin"):
+        app_config.rtmp_server = server_kind
+    elif server_kind:
+        console.print(
+            f"[warning]Unknown RtmpServer '{server_kind}'; using {server_label(app_config.rtmp_server)}.[/warning]"
+        )
+    app_config.setup_all_devices = parser.getboolean(
+        "Options", "SetupAllDevices", fallback=app_config.setup_all_devices
+    )
+    port_range = parser.get("Network", "RtmpPortRange", fallback="")
+    if m := re.fullmatch(r"\s*(\d+)\s*-\s*(\d+)\s*", port_range):
+        low, high = int(m.group(1)), int(m.group(2))
+        if 0 < low <= high <= 65535:
+            app_config.rtmp_port_range = (low, high)
     app_config.auto_select_single_device = parser.getboolean(
         "Options", "AutoSelectSingleDevice", fallback=True
     )
-    app_config.fetch_device_models = parser.getboolean(
-        "Options", "FetchDeviceModels", fallback=True
+    fetch_mode = parser.get("Options", "FetchDeviceModels", fallback="true")
+    app_config.cache_device_models = fetch_mode.strip().lower() == "cached"
+    app_config.fetch_device_models = app_config.cache_device_models or (
+        parser.getboolean("Options", "FetchDeviceModels", fallback=True)
+    )
+    app_config.device_cache_ttl_days = parser.getfloat(
+        "Options", "DeviceCacheTtlDays", fallback=app_config.device_cache_ttl_days
+    )
+    app_config.device_cache_max_entries = parser.getint(
+        "Options",
+        "DeviceCacheMaxEntries",
+        fallback=app_config.device_cache_max_entries,
     )
     app_config.force_kill_port_process = parser.getboolean(
         "Options",
         "ForceKillConflictingPortProcess",
         fallback=app_config.force_kill_port_process,
     )
+    app_config.model_fetch_workers = max(
+        1,
+        parser.getint(
+            "Options", "ModelFetchWorkers", fallback=app_config.model_fetch_workers
+        ),
+    )
+    app_config.device_scan_timeout = parser.getfloat(
+        "Options", "DeviceScanTimeout", fallback=app_config.device_scan_timeout
+    )
+    app_config.mona_ready_timeout = parser.getfloat(
+        "Options", "MonaReadyTimeout", fallback=app_config.mona_ready_timeout
+    )
+    mona_profile = parser.get("Options", "MonaProfile", fallback="").strip().lower()
+    if mona_profile in MONA_PROFILES:
+        app_config.mona_profile = mona_profile
+    elif mona_profile:
+        console.print(
+            f"[warning]Unknown MonaProfile '{mona_profile}'; leaving MonaServer.ini as it is.[/warning]"
+        )
+    app_config.port_release_timeout = parser.getfloat(
+        "Options", "PortReleaseTimeout", fallback=app_config.port_release_timeout
+    )
+    app_config.native_adb = parser.getboolean(
+        "Options", "NativeAdb", fallback=app_config.native_adb
+    )
+    app_config.health_probe_seconds = parser.getfloat(
+        "Options", "HealthProbeSeconds", fallback=app_config.health_probe_seconds
+    )
+    app_config.health_probe_stream = parser.get(
+        "Options", "HealthProbeStream", fallback=app_config.health_probe_stream
+    ).strip("/ ")
+    app_config.record = parser.getboolean(
+        "Options", "Record", fallback=app_config.record
+    )
+    app_config.record_dir = parser.get(
+        "Options", "RecordDir", fallback=app_config.record_dir
+    ).strip()
+    app_config.metrics_port = parser.getint(
+        "Options", "MetricsPort", fallback=app_config.metrics_port
+    )
 
     if config_updated_in_session:
         try:
@@ -463,58 +922,153 @@ def find_adb(config_path_str: Optional[str]) -> Optional[str]:
     return None
 
 
+_adb_client: Optional[AdbClient] = None
+
+
+def get_adb_client(current_config: Config) -> Optional[AdbClient]:
+    """Returns the shared native ADB client, or None when NativeAdb is off."""
+    global _adb_client
+    if not current_config.native_adb:
+        return None
+    if _adb_client is None:
+        _adb_client = AdbClient()
+    return _adb_client
+
+
+def _run_adb_native(
+    client: AdbClient, args: List[str], serial: Optional[str], timeout: float
+) -> Optional[str]:
+    """Maps an adb argv onto the native client; None if it isn't covered."""
+    if args == ["devices", "-l"]:
+        return client.devices()
+    if serial and args[0] == "shell":
+        return client.shell(serial, " ".join(args[1:]), timeout)
+    if serial and args[:2] == ["reverse", "--list"]:
+        return client.reverse_list(serial)
+    if serial and args[:2] == ["reverse", "--remove"] and len(args) == 3:
+        client.reverse_remove(serial, args[2])
+        return ""
+    if serial and args[0] == "reverse" and len(args) == 3:
+        client.reverse(serial, args[1], args[2])
+        return ""
+    return None
+
+
+def run_adb(
+    run_config: Config, args: List[str], timeout: float, serial: Optional[str] = None
+) -> subprocess.CompletedProcess:
+    """Runs an adb command over the ADB server socket, or by spawning adb.
+
+    The adb executable is only spawned when NativeAdb is off, the command has
+    no native equivalent, or no adb server is listening yet. Native results
+    are wrapped in CompletedProcess so callers treat both paths the same.
+    """
+    verb, start = adb_verb(args), time.perf_counter()
+    with span(f"adb {verb}", "adb", device=serial, command=" ".join(args)) as s:
+        try:
+            result, via = _run_adb(run_config, args, timeout, serial)
+        except subprocess.TimeoutExpired:
+            ADB_FAILURES.inc(verb=verb, reason="timeout")
+            raise
+        ADB_SECONDS.observe(time.perf_counter() - start, verb=verb, via=via)
+        if result.returncode:
+            ADB_FAILURES.inc(verb=verb, reason="exit")
+        s.set(via=via, returncode=result.returncode)
+        return result
+
+
+def _run_adb(
+    run_config: Config, args: List[str], timeout: float, serial: Optional[str]
+) -> Tuple[subprocess.CompletedProcess, str]:
+    """run_adb's result plus how it ran: "native" or "spawn"."""
+    cmd = [str(run_config.adb_path)] + (["-s", serial] if serial else []) + args
+    if client := get_adb_client(run_config):
+        try:
+            out = _run_adb_native(client, args, serial, timeout)
+            if out is not None:
+                return subprocess.CompletedProcess(cmd, 0, out, ""), "native"
+        except AdbServerUnavailable:
+            pass  # adb executable below starts the server on demand
+        except TimeoutError as e:
+            raise subprocess.TimeoutExpired(cmd, timeout) from e
+        except AdbError as e:
+            return subprocess.CompletedProcess(cmd, 1, "", str(e)), "native"
+    result = subprocess.run(
+        cmd, capture_output=True, text=True, timeout=timeout, check=False
+    )
+    return result, "spawn"
+
+
+def adb_verb(args: List[str]) -> str:
+    """Short label for an adb argv: "devices", "reverse --list", "shell am start"."""
+    words = " ".join(args).split()
+    if words[0] == "reverse" and len(words) > 1 and words[1].startswith("--"):
+        return " ".join(words[:2])
+    if words[0] != "shell" or len(words) < 2:
+        return words[0]
+    return " ".join(words[:3] if words[1] == "am" else words[:2])
+
+
 def check_adb_version(current_config: Config) -> Tuple[bool, str]:
+    """(ok, version). A version cached for this exact adb binary is reused."""
     if not current_config.adb_path:
         return False, "ADB path not set"
+    cache = get_toolchain_cache()
+    if version := cache.get(current_config.adb_path, "adb_version"):
+        return True, version
+    if client := get_adb_client(current_config):
+        try:
+            with span("adb version", "adb", via="native"):
+                return True, f"1.0.{client.version()}"
+        except AdbServerUnavailable:
+            pass  # Not started yet; `adb version` works without a server
+        except (AdbError, OSError, ValueError) as e:
+            return False, f"ADB server error: {e}"
     try:
-        result = subprocess.run(
-            [str(current_config.adb_path), "version"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-            check=False,
-        )
+        with span("adb version", "adb", via="spawn") as s:
+            result = subprocess.run(
+                [str(current_config.adb_path), "version"],
+                capture_output=True,
+                text=True,
+                timeout=5,
+                check=False,
+            )
+            s.set(returncode=result.returncode)
         if (
             result.returncode == 0
             and result.stdout
             and (match := re.search(r"Version\s+(\d+\.\d+\.\d+)", result.stdout))
         ):
+            cache.put(current_config.adb_path, "adb_version", match.group(1))
+            cache.save()
             return True, match.group(1)
         return False, result.stderr.strip() or "No version output"
     except Exception as e:
         return False, f"Execution error: {e}"
 
 
+def get_device_props(model_config: Config, device_id: str) -> Tuple[str, str]:
+    """Returns (model, manufacturer); either may be empty. Errors propagate."""
+    # One shell round trip for both props; output is "<model>\n<manufacturer>".
+    cmd = ["shell", "getprop ro.product.model; getprop ro.product.manufacturer"]
+    res = run_adb(model_config, cmd, timeout=2, serial=device_id)
+    lines = res.stdout.splitlines() if res.returncode == 0 else []
+    model = lines[0].strip() if lines else ""
+    mfg = lines[1].strip() if len(lines) > 1 else ""
+    return model, mfg
+
+
+def format_device_name(model: str, mfg: str) -> str:
+    if model:
+        return model
+    return f"{mfg} (Model N/A)" if mfg else "Unknown"
+
+
 def get_device_model(model_config: Config, device_id: str) -> str:
     if not model_config.fetch_device_models or not model_config.adb_path:
         return "Unknown"
-    adb, cmds = (
-        str(model_config.adb_path),
-        {
-            "model": ["shell", "getprop", "ro.product.model"],
-            "mfg": ["shell", "getprop", "ro.product.manufacturer"],
-        },
-    )
     try:
-        res_model = subprocess.run(
-            [adb, "-s", device_id] + cmds["model"],
-            capture_output=True,
-            text=True,
-            timeout=2,
-            check=False,
-        )
-        model = res_model.stdout.strip() if res_model.returncode == 0 else ""
-        if model:
-            return model
-        res_mfg = subprocess.run(
-            [adb, "-s", device_id] + cmds["mfg"],
-            capture_output=True,
-            text=True,
-            timeout=2,
-            check=False,
-        )
-        mfg = res_mfg.stdout.strip() if res_mfg.returncode == 0 else ""
-        return f"{mfg} (Model N/A)" if mfg else "Unknown"
+        return format_device_name(*get_device_props(model_config, device_id))
     except subprocess.TimeoutExpired:
         return "Unknown (Timeout)"
     except Exception:
@@ -526,59 +1080,120 @@ def find_connected_devices(current_config: Config) -> List[Dict[str, str]]:
         return []
     console.print("[info]Scanning for connected devices...")
     try:
-        result = subprocess.run(
-            [str(current_config.adb_path), "devices", "-l"],
-            capture_output=True,
-            text=True,
-            timeout=5,
-            check=True,
-        )
+        result = run_adb(current_config, ["devices", "-l"], timeout=5)
     except Exception as e:
         console.print(f"[danger]'adb devices' error: {e}[/danger]")
         return []
-
-    devices_found: List[Dict[str, str]] = []
-    pattern = re.compile(r"^([\w.\-:]+)\s+(device|offline|unauthorized)(?:\s+(.*))?$")
-    lines = result.stdout.strip().splitlines()
-    if len(lines) <= 1:
+    if result.returncode != 0:
+        console.print(
+            f"[danger]'adb devices' error: {result.stderr.strip() or result.returncode}[/danger]"
+        )
         return []
 
-    active_matches = [
-        m
-        for line in lines[1:]
-        if (m := pattern.match(line.strip())) and m.group(2) == "device"
+    devices_found = parse_device_listing(result.stdout)
+    # `adb devices -l` already carries model:; only shell out for devices without it
+    unnamed = [
+        d for d in devices_found if d["status"] == "device" and not d.get("model")
     ]
-
-    if current_config.fetch_device_models and active_matches:
-        with Progress(
-            SpinnerColumn(style="highlight"),
-            TextColumn("Fetching models... {task.completed}/{task.total}"),
-            transient=True,
-        ) as p:
-            task = p.add_task("Models", total=len(active_matches))
-            for line in lines[1:]:
-                if match := pattern.match(line.strip()):
-                    is_active = match.group(2) == "device"
-                    devices_found.append(
-                        parse_device_line(
-                            current_config,
-                            match,
-                            p if is_active else None,
-                            task if is_active else None,
-                        )
-                    )
-    else:
-        for line in lines[1:]:
-            if match := pattern.match(line.strip()):
-                devices_found.append(parse_device_line(current_config, match))
+    if not current_config.fetch_device_models or not unnamed:
+        return devices_found
+
+    cache = None
+    if current_config.cache_device_models:
+        cache = DeviceCache(
+            DEVICE_CACHE_FILE,
+            current_config.device_cache_ttl_days,
+            current_config.device_cache_max_entries,
+        ).load()
+        for d in unnamed:
+            if entry := cache.get(d["id"]):
+                d["manufacturer"] = entry["manufacturer"]
+                d["name"] = format_device_name(entry["model"], entry["manufacturer"])
+        unnamed = [d for d in unnamed if not cache.get(d["id"])]
+    if unnamed:
+        fetch_device_models(current_config, unnamed)
+    if cache is not None:
+        for d in unnamed:
+            if "manufacturer" in d:  # Only successful lookups are cached
+                cache.put(
+                    d["id"], d.get("model", ""), d["manufacturer"], d["connection"]
+                )
+        cache.save()
     return devices_found
 
 
-def parse_device_line(
-    p_config: Config, match: re.Match, progress=None, task_id=None
-) -> Dict[str, str]:
+def fetch_device_models(current_config: Config, devices: List[Dict[str, str]]):
+    """Resolves device names in parallel, bounded by ModelFetchWorkers.
+
+    Devices still pending when DeviceScanTimeout expires keep a timeout
+    placeholder so the table can be shown with whatever has resolved.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+
+    workers = min(current_config.model_fetch_workers, len(devices))
+    deadline = current_config.device_scan_timeout
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="getprop")
+    with Progress(
+        SpinnerColumn(style="highlight"),
+        TextColumn("Fetching models... {task.completed}/{task.total}"),
+        transient=True,
+    ) as p:
+        task = p.add_task("Models", total=len(devices))
+        futures = {
+            executor.submit(get_device_props, current_config, d["id"]): d
+            for d in devices
+        }
+        try:
+            for fut in as_completed(futures, timeout=deadline):
+                d = futures[fut]
+                try:
+                    model, mfg = fut.result()
+                    d["name"] = format_device_name(model, mfg)
+                    if model or mfg:
+                        d.update({"model": model, "manufacturer": mfg})
+                except subprocess.TimeoutExpired:
+                    d["name"] = "Unknown (Timeout)"
+                except Exception:
+                    d["name"] = "Unknown (Error)"
+                p.update(task, advance=1)
+        except FuturesTimeoutError:
+            pending = [d for f, d in futures.items() if not f.done()]
+            for f in futures:
+                f.cancel()
+            for d in pending:
+                d["name"] = "Unknown (Timeout)"
+            console.print(
+                f"[warning]Model lookup deadline ({deadline:g}s) hit; {len(pending)} device(s) unresolved.[/warning]"
+            )
+        finally:
+            executor.shutdown(wait=False)
+
+
+def parse_device_details(details: str) -> Dict[str, str]:
+    """Splits the `key:value` tail of an `adb devices -l` line into a dict."""
+    fields: Dict[str, str] = {}
+    for token in details.split():
+        key, sep, value = token.partition(":")
+        if sep and key in DEVICE_DETAIL_KEYS and value:
+            fields[key] = value
+    return fields
+
+
+def parse_device_listing(listing: str) -> List[Dict[str, str]]:
+    return [
+        parse_device_line(m)
+        for line in listing.strip().splitlines()
+        if (m := DEVICE_LINE_RE.match(line.strip()))
+    ]
+
+
+def parse_device_line(match: re.Match) -> Dict[str, str]:
     did, stat, det = match.groups()
     info = {"id": did, "status": stat, "details": det or ""}
+    info.update(parse_device_details(det or ""))
     if "_adb-tls-connect" in did:
         conn, icon = ("Wi-Fi", "📶")
     else:
@@ -588,20 +1203,21 @@ def parse_device_line(
             else (("Emulator", "💻") if "emulator" in did else ("USB", "🔌"))
         )
     info.update({"connection": conn, "icon": icon})
-    if stat == "device":
-        info["name"] = (
-            get_device_model(p_config, did)
-            if p_config.fetch_device_models
-            else "Unknown"
-        )
-        if progress and task_id:
-            progress.update(task_id, advance=1)
-    else:
+    if stat != "device":
         info["name"] = f"({stat.capitalize()})"
+    elif info.get("model"):
+        info["name"] = info["model"].replace("_", " ")
+    else:
+        info["name"] = "Unknown"
     return info
 
 
 def select_device_from_list(current_config: Config) -> Optional[Dict[str, str]]:
+    from rich.box import ROUNDED
+    from rich.panel import Panel
+    from rich.prompt import Prompt
+    from rich.table import Table
+
     devices, sel = (
         current_config.devices,
         [d for d in current_config.devices if d["status"] == "device"],
@@ -690,9 +1306,143 @@ def select_device_from_list(current_config: Config) -> Optional[Dict[str, str]]:
     return None
 
 
+def port_is_free(port: int) -> bool:
+    """Cheap probe: True when nothing holds TCP `port` on IPv4 or IPv6.
+
+    A wildcard bind alone is not conclusive: on Windows, and with
+    SO_REUSEADDR on BSD/macOS, it succeeds next to a listener on 127.0.0.1,
+    which is where MonaServer.ini puts RTMP. Windows binds exclusively;
+    elsewhere loopback is also probed with a connect.
+    """
+    windows = platform.system() == "Windows"
+    families = [(socket.AF_INET, "0.0.0.0")]
+    if socket.has_ipv6:
+        families.append((socket.AF_INET6, "::"))
+    for family, host in families:
+        try:
+            s = socket.socket(family, socket.SOCK_STREAM)
+        except OSError:  # Family not supported on this host
+            continue
+        with s:
+            if windows:
+                # Fails next to any socket on the port, 127.0.0.1 included
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+            else:
+                # Don't let TIME_WAIT leftovers count as "in use"
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if family == socket.AF_INET6:
+                s.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            try:
+                s.bind((host, port))
+            except OSError as e:
+                if e.errno == errno.EADDRNOTAVAIL:
+                    continue
+                if windows:
+                    # An exclusive bind also fails while closed connections
+                    # linger in TIME_WAIT; only a listener that answers counts
+                    return not _loopback_accepts(port)
+                return False
+    return windows or not _loopback_accepts(port)
+
+
+def _loopback_accepts(port: int, timeout: float = 0.2) -> bool:
+    """True when something accepts TCP connections on 127.0.0.1/::1 `port`."""
+    for family, host in ((socket.AF_INET, "127.0.0.1"), (socket.AF_INET6, "::1")):
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as s:
+                s.settimeout(timeout)
+                s.connect((host, port))
+                return True
+        except OSError:
+            continue
+    return False
+
+
+def _linux_listen_inodes(port: int) -> List[str]:
+    """Socket inodes in LISTEN state on `port`, from /proc/net/tcp{,6}."""
+    hex_port, inodes = f"{port:04X}", []
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table, encoding="ascii") as f:
+                next(f, None)  # header
+                for line in f:
+                    fields = line.split()
+                    # fields: sl local_address rem_address st ... uid timeout inode
+                    if fields[3] == "0A" and fields[1].endswith(f":{hex_port}"):
+                        inodes.append(fields[9])
+        except OSError:
+            continue
+    return inodes
+
+
+def _linux_pid_for_inodes(
+    inodes: List[str], first: Sequence[int] = ()
+) -> Optional[int]:
+    """Finds the process holding one of the socket inodes via /proc/<pid>/fd.
+
+    PIDs in `first` are checked before the rest, and the walk ends at the
+    first process found holding the socket.
+    """
+    targets = {f"socket:[{inode}]" for inode in inodes}
+
+    def holds(pid: str) -> bool:
+        try:
+            with os.scandir(f"/proc/{pid}/fd") as fds:
+                for fd in fds:
+                    try:
+                        if os.readlink(fd.path) in targets:
+                            return True
+                    except OSError:
+                        continue
+        except OSError:  # Process gone or not ours
+            pass
+        return False
+
+    for pid in first:
+        if holds(str(pid)):
+            return pid
+    with os.scandir("/proc") as entries:
+        for entry in entries:
+            if entry.name.isdigit() and holds(entry.name):
+                return int(entry.name)
+    return None
+
+
 def find_process_using_port(port: int) -> Optional[Tuple[int, str]]:
+    """Returns (pid, name) of the process listening on TCP `port`, if any.
+
+    A bind probe short-circuits the common "port is free" case. On Linux the
+    owner is then looked up from /proc for just this port; elsewhere (or when
+    /proc doesn't reveal the PID) psutil's full socket walk is used.
+    """
     if not 0 < port <= 65535:
         return None
+    if port_is_free(port):
+        return None
+    with span("port owner lookup", "psutil", port=port) as s:
+        owner = _port_owner(port)
+        s.set(pid=owner[0] if owner else None)
+    return owner
+
+
+def _port_owner(port: int) -> Optional[Tuple[int, str]]:
+    if platform.system() == "Linux" and os.path.exists("/proc/net/tcp"):
+        inodes = _linux_listen_inodes(port)
+        if not inodes:
+            return None
+        # The usual owner is the RTMP server this script started
+        state = _read_mona_state()
+        pid = _linux_pid_for_inodes(inodes, [state["pid"]] if state else [])
+        if pid is not None:
+            try:
+                return pid, psutil.Process(pid).name()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+    return _scan_net_connections(port)
+
+
+def _scan_net_connections(port: int) -> Optional[Tuple[int, str]]:
+    """Slow path: walks every inet socket on the machine via psutil."""
     try:
         for c in psutil.net_connections(kind="inet"):
             if c.laddr.port == port and c.status == psutil.CONN_LISTEN:
@@ -706,6 +1456,57 @@ def find_process_using_port(port: int) -> Optional[Tuple[int, str]]:
     return None
 
 
+def wait_until(
+    condition: Callable[[], bool],
+    timeout: float,
+    abort: Optional[Callable[[], bool]] = None,
+    first_delay: float = 0.01,
+    max_delay: float = 0.5,
+) -> Tuple[bool, float]:
+    """Polls `condition` with exponential backoff until it holds or `timeout`.
+
+    Returns (satisfied, seconds waited). `abort` ends the wait early, e.g.
+    when the process being waited on has already exited.
+    """
+    start = time.monotonic()
+    deadline, delay = start + timeout, first_delay
+    while True:
+        if condition():
+            return True, time.monotonic() - start
+        now = time.monotonic()
+        if now >= deadline or (abort and abort()):
+            return False, now - start
+        time.sleep(min(delay, deadline - now))
+        delay = min(delay * 2, max_delay)
+
+
+def rtmp_handshake_ok(port: int, timeout: float = 1.0) -> bool:
+    """True when 127.0.0.1:`port` answers an RTMP C0/C1 with S0/S1."""
+    c1 = struct.pack(">II", 0, 0) + os.urandom(1528)
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout) as s:
+            s.sendall(b"\x03" + c1)
+            reply = b""
+            while len(reply) < 1537:
+                chunk = s.recv(1537 - len(reply))
+                if not chunk:
+                    return False
+                reply += chunk
+            return reply[0] == 3
+    except OSError:
+        return False
+
+
+def wait_for_rtmp_ready(
+    port: int, timeout: float, abort: Optional[Callable[[], bool]] = None
+) -> Tuple[bool, float]:
+    return wait_until(lambda: rtmp_handshake_ok(port), timeout, abort=abort)
+
+
+def wait_for_port_release(port: int, timeout: float) -> Tuple[bool, float]:
+    return wait_until(lambda: port_is_free(port), timeout)
+
+
 def kill_process_by_pid(pid: int, name: str = "process") -> bool:
     if (
         pid == 0 and platform.system() == "Windows"
@@ -715,11 +1516,12 @@ def kill_process_by_pid(pid: int, name: str = "process") -> bool:
     try:
         p = psutil.Process(pid)
         console.print(f"[info]Killing {name} (PID:{pid})...[/info]")
-        p.kill()
-        try:
-            p.wait(timeout=1)
-        except psutil.TimeoutExpired:
-            console.print(f"[warning]{name} (PID:{pid}) linger.[/warning]")
+        with span("kill", "psutil", pid=pid, process=name):
+            p.kill()
+            try:
+                p.wait(timeout=1)
+            except psutil.TimeoutExpired:
+                console.print(f"[warning]{name} (PID:{pid}) linger.[/warning]")
         console.print(f"[success]Kill signal sent to {name} (PID:{pid}).[/success]")
         return True
     except psutil.NoSuchProcess:
@@ -730,7 +1532,11 @@ def kill_process_by_pid(pid: int, name: str = "process") -> bool:
         return False
 
 
-def handle_port_conflict(port_str: str, p_config: Config) -> Tuple[bool, Optional[int]]:
+def handle_port_conflict(
+    port_str: str, p_config: Config, prompt: bool = True
+) -> Tuple[bool, Optional[int]]:
+    """(port clear, conflicting PID). Without `prompt` (or headless), a
+    conflict is only killed with ForceKillConflictingPortProcess."""
     try:
         port = int(port_str)
         assert 0 < port <= 65535
@@ -744,14 +1550,30 @@ def handle_port_conflict(port_str: str, p_config: Config) -> Tuple[bool, Optiona
         console.print(
             f"[warning]\u26a0 Port TCP:{port} in use by {name} (PID:{pid}).[/warning]"
         )
+        if (HEADLESS or not prompt) and not p_config.force_kill_port_process:
+            reason = "headless" if HEADLESS else "no prompt during server start"
+            console.print(f"[warning]Not killing ({reason}, auto-kill off).[/warning]")
+            return False, pid
+        if not HEADLESS:  # Prompts below are only reached interactively
+            from rich.prompt import Confirm
+
         if p_config.force_kill_port_process or Confirm.ask(
             f"Kill {name} (PID:{pid})?", choices=["y", "n"], default="y"
         ):
             killed = kill_process_by_pid(pid, name)
             if killed:
-                console.print(f"[success]\u2713 Port {port} freed.[/success]")
-                # Short delay to allow OS to fully release the port
-                time.sleep(0.5)
+                PORT_KILLS.inc()
+                released, waited = wait_for_port_release(
+                    port, p_config.port_release_timeout
+                )
+                if released:
+                    console.print(
+                        f"[success]\u2713 Port {port} freed ({waited:.2f}s).[/success]"
+                    )
+                else:
+                    console.print(
+                        f"[warning]Port {port} still bound {waited:.1f}s after kill.[/warning]"
+                    )
             return killed, None if killed else pid
         elif Confirm.ask("Skip port conflict?", choices=["y", "n"], default="n"):
             console.print("[warning]Skipping. Streaming may fail.[/warning]")
@@ -761,58 +1583,251 @@ def handle_port_conflict(port_str: str, p_config: Config) -> Tuple[bool, Optiona
     return True, None
 
 
-def setup_port_forwarding(f_config: Config, d_info: Dict[str, str]) -> bool:
-    if not f_config.adb_path:
-        return False
-    did, port = d_info["id"], f_config.rtmp_port
-    console.print(f"[info]Port forwarding (Dev:{port} \u2194 Host:{port})...[/info]")
-    cmd = [str(f_config.adb_path), "-s", did, "reverse", f"tcp:{port}", f"tcp:{port}"]
+def setup_port_forwarding(
+    f_config: Config, d_info: Dict[str, str], host_port: Optional[int] = None
+) -> bool:
+    """Reverse-forwards the device's RtmpPort to `host_port` (default: same)."""
+    serial = d_info["id"]
+    host = host_port or int(f_config.rtmp_port)
+    return reconcile_reverse_forwards(f_config, {serial: host})[serial]
+
+
+def parse_reverse_list(listing: str) -> Dict[str, str]:
+    """`adb reverse --list` output ("<transport> <remote> <local>") as remote -> local."""
+    mappings = {}
+    for line in listing.splitlines():
+        parts = line.split()
+        if len(parts) == 3:
+            mappings[parts[1]] = parts[2]
+    return mappings
+
+
+def managed_reverse_ports(r_config: Config) -> Set[int]:
+    """Device ports whose reverse mappings this tool owns and may remove."""
+    low, high = r_config.rtmp_port_range
+    default = int(DEFAULT_CONFIG["Network"]["RtmpPort"])
+    return {int(r_config.rtmp_port), default, *range(low, high + 1)}
+
+
+def plan_reverse_changes(
+    current: Dict[str, str], desired: Dict[str, str], managed: Set[int]
+) -> Tuple[Dict[str, str], List[str]]:
+    """The mappings to (re)apply and the stale remotes to remove.
+
+    A mapping is stale when its remote is a tcp port in `managed` that is
+    not wanted any more, e.g. left by a run with another RtmpPort; mappings
+    on other ports belong to other tools and are kept.
+    """
+    apply = {r: l for r, l in desired.items() if current.get(r) != l}
+    stale = []
+    for remote in current:
+        proto, _, port = remote.partition(":")
+        if remote not in desired and proto == "tcp" and port.isdigit():
+            if int(port) in managed:
+                stale.append(remote)
+    return apply, stale
+
+
+def list_reverse_forwards(f_config: Config, serial: str) -> Optional[Dict[str, str]]:
+    """The device's current reverse mappings, or None if they can't be listed."""
     try:
-        res = subprocess.run(
-            cmd, capture_output=True, text=True, timeout=5, check=False
-        )
-    except Exception as e:
-        console.print(f"[danger]ADB reverse error: {e}[/danger]")
-        return False
-    if res.returncode == 0:
-        console.print(
-            Text.assemble(
-                ("✓ Port Fwd: ", "success"),
-                (f"Dev TCP:{port} \u2194 Host TCP:{port}", "cyan"),
+        res = run_adb(f_config, ["reverse", "--list"], timeout=5, serial=serial)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    return parse_reverse_list(res.stdout) if res.returncode == 0 else None
+
+
+def apply_reverse_changes(
+    f_config: Config, serial: str, apply: Dict[str, str], stale: List[str]
+) -> bool:
+    """Removes `stale` remotes and sets `apply`; False if a mapping failed."""
+    for remote in stale:
+        try:
+            res = run_adb(
+                f_config, ["reverse", "--remove", remote], timeout=5, serial=serial
+            )
+            removed = res.returncode == 0
+        except Exception:  # pylint: disable=broad-except
+            removed = False
+        if removed:
+            console.print(f"[info]Removed stale reverse {remote} on {serial}.[/info]")
+        else:
+            console.print(
+                f"[warning]Could not remove stale reverse {remote} on {serial}.[/warning]"
+            )
+    ok = True
+    for remote, local in apply.items():
+        dev, host = remote.upper(), local.upper()
+        console.print(f"[info]Port forwarding (Dev {dev} \u2194 Host {host})...[/info]")
+        try:
+            res = run_adb(
+                f_config, ["reverse", remote, local], timeout=5, serial=serial
+            )
+        except Exception as e:
+            console.print(f"[danger]ADB reverse error: {e}[/danger]")
+            ok = False
+            continue
+        if res.returncode == 0:
+            console.print(
+                f"[success]✓ Port Fwd: [/success][cyan]Dev {dev} \u2194 Host {host}[/cyan]"
+            )
+        else:
+            console.print(
+                f"[danger]Port fwd failed. ADB: {res.stderr.strip() or res.stdout.strip()}[/danger]"
             )
+            ok = False
+    return ok
+
+
+def reconcile_reverse_forwards(
+    f_config: Config, host_ports: Dict[str, int]
+) -> Dict[str, bool]:
+    """Maps RtmpPort on each device to its host port, changing only what differs.
+
+    Every device's mappings are listed in one parallel pass, then only the
+    missing or wrong mapping is set and stale ones (see plan_reverse_changes)
+    removed, again in parallel. A re-run with nothing to change costs one
+    `reverse --list` per device. Devices that can't be listed get `adb
+    reverse` unconditionally, as before. Returns serial -> mapping in place.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not f_config.adb_path or not host_ports:
+        return {serial: False for serial in host_ports}
+    remote, managed = f"tcp:{f_config.rtmp_port}", managed_reverse_ports(f_config)
+    serials = list(host_ports)
+    with ThreadPoolExecutor(
+        max_workers=min(len(serials), 32), thread_name_prefix="reverse"
+    ) as pool:
+        listed = list(pool.map(lambda s: list_reverse_forwards(f_config, s), serials))
+        plans = {}
+        for serial, current in zip(serials, listed):
+            desired = {remote: f"tcp:{host_ports[serial]}"}
+            if current is None:
+                plans[serial] = (desired, [])
+                continue
+            plans[serial] = plan_reverse_changes(current, desired, managed)
+            if not plans[serial][0]:
+                console.print(
+                    f"[success]✓ Port Fwd: [/success][cyan]Dev {remote.upper()} \u2194 Host {desired[remote].upper()}[/cyan] [dim](already set)[/dim]"
+                )
+        applied = pool.map(
+            lambda s: apply_reverse_changes(f_config, s, *plans[s]), serials
         )
-        return True
-    console.print(
-        f"[danger]Port fwd failed. ADB: {res.stderr.strip() or res.stdout.strip()}[/danger]"
-    )
-    return False
+        return dict(zip(serials, applied))
+
+
+@dataclass
+class LaunchResult:
+    """What launch_app did; times are `am start -W`'s, in milliseconds."""
+
+    ok: bool
+    skipped: bool = False  # Already the resumed activity, so not relaunched
+    status: Optional[str] = None  # am start -W's Status: ok, timeout, ...
+    launch_state: Optional[str] = None  # COLD, WARM or HOT (Android 10+)
+    this_time_ms: Optional[int] = None  # Not reported since Android 10
+    total_time_ms: Optional[int] = None
+    wait_time_ms: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def describe(self) -> str:
+        if self.skipped:
+            return "already in foreground"
+        if self.total_time_ms is None:
+            return ""
+        state = f" {self.launch_state.lower()}" if self.launch_state else ""
+        return f"{self.total_time_ms} ms{state}"
+
+
+_RESUMED_ACTIVITY_RE = re.compile(
+    r"(?:mResumedActivity|topResumedActivity)[:=]\s*ActivityRecord\{\S+ \S+ (\S+/\S+)"
+)
+_AM_START_FIELD_RE = re.compile(
+    r"^(Status|LaunchState|ThisTime|TotalTime|WaitTime): (\S+)", re.M
+)
+
+
+def full_component(component: str) -> str:
+    """Expands "pkg/.Main" to "pkg/pkg.Main" so both spellings compare equal."""
+    pkg, _, cls = component.partition("/")
+    return f"{pkg}/{pkg}{cls}" if cls.startswith(".") else component
+
+
+def resumed_activity(a_config: Config, device_id: str) -> Optional[str]:
+    """The component in the device's foreground, or None if unknown."""
+    cmd = [
+        "shell",
+        "dumpsys activity activities | grep -E 'mResumedActivity|topResumedActivity'",
+    ]
+    try:
+        res = run_adb(a_config, cmd, timeout=5, serial=device_id)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    match = _RESUMED_ACTIVITY_RE.search(res.stdout)
+    return full_component(match.group(1)) if match else None
+
 
+def parse_am_start(output: str) -> Dict[str, str]:
+    """The Status/LaunchState/...Time fields `am start -W` prints."""
+    return dict(_AM_START_FIELD_RE.findall(output))
 
-def launch_app(a_config: Config, d_info: Dict[str, str]) -> bool:
+
+def launch_app(a_config: Config, d_info: Dict[str, str]) -> LaunchResult:
+    """Starts PackageName with `am start -W` unless it is already resumed.
+
+    -W returns once the activity has launched, with its timings, so no
+    fixed wait follows; they are recorded in APP_LAUNCH_SECONDS.
+    """
     if not a_config.adb_path:
-        return False
+        return LaunchResult(False)
     did, pkg = d_info["id"], a_config.package_name
     if not pkg or "/" not in pkg:
         console.print(f"[danger]Invalid PkgName: {pkg}[/danger]")
-        return False
+        return LaunchResult(False)
     app_s = pkg.split("/")[0]
+    if resumed_activity(a_config, did) == full_component(pkg):
+        console.print(f"✓ App Launch: {app_s} already in foreground on {did}.")
+        APP_LAUNCH_SKIPS.inc()
+        return LaunchResult(True, skipped=True)
     console.print(f"[info]Launching app [highlight]{app_s}[/highlight]...")
-    cmd = [str(a_config.adb_path), "-s", did, "shell", "am", "start", "-n", pkg]
+    cmd = ["shell", "am", "start", "-W", "-n", pkg]
     try:
-        res = subprocess.run(
-            cmd, capture_output=True, text=True, timeout=10, check=False
-        )
+        res = run_adb(a_config, cmd, timeout=20, serial=did)
     except Exception as e:
         console.print(f"[danger]App launch error: {e}[/danger]")
-        return False
+        return LaunchResult(False)
+    # -W prints "Status: ok" once the activity is up; errors print no Status
+    fields = parse_am_start(res.stdout)
+    status = fields.get("Status")
+    if res.returncode == 0 and status == "ok":
+        times = {
+            name: int(fields[name])
+            for name in ("ThisTime", "TotalTime", "WaitTime")
+            if fields.get(name, "").isdigit()
+        }
+        for name, ms in times.items():
+            APP_LAUNCH_SECONDS.observe(ms / 1000, measure=name[:-4].lower())
+        result = LaunchResult(
+            True,
+            status=status,
+            launch_state=fields.get("LaunchState"),
+            this_time_ms=times.get("ThisTime"),
+            total_time_ms=times.get("TotalTime"),
+            wait_time_ms=times.get("WaitTime"),
+        )
+        took = f" in {result.describe()}" if result.total_time_ms is not None else ""
+        console.print(f"✓ App Launch: Started {app_s}{took}.")
+        return result
     out = (res.stdout + res.stderr).lower()
-    if res.returncode == 0 and "error" not in out and "exception" not in out:
-        console.print(f"✓ App Launch: Sent cmd for {app_s}.")
-        time.sleep(0.5)
-        return True
-    if "permission denial" in out:
+    if status is not None:
+        console.print(
+            f"[warning]⚠ am start status: {status} (launch not confirmed).[/warning]"
+        )
+    elif "permission denial" in out:
         console.print("[warning]⚠ Permission denied launching app.[/warning]")
-    elif "not found" in out or "unable to resolve" in out:
+    elif "not found" in out or "unable to resolve" in out or "does not exist" in out:
         console.print(f"[warning]⚠ App {app_s} not found.[/warning]")
     else:
         console.print("[warning]⚠ Unknown error launching app.[/warning]")
@@ -820,42 +1835,473 @@ def launch_app(a_config: Config, d_info: Dict[str, str]) -> bool:
         console.print(f"[dim]Out: {res.stdout.strip()}[/dim]")
     if res.stderr.strip():
         console.print(f"[dim]Err: {res.stderr.strip()}[/dim]")
-    return False
+    return LaunchResult(False, status=status)
+
 
+def rtmp_url(u_config: Config, port: Optional[int] = None) -> str:
+    """The URL streaming apps publish to; `port` defaults to RtmpPort."""
+    return f"rtmp://127.0.0.1:{port or u_config.rtmp_port}/live"
 
-def copy_to_clipboard(c_config: Config):
-    url = f"rtmp://127.0.0.1:{c_config.rtmp_port}/live"
+
+def stream_url(s_config: Config, url: str) -> str:
+    """`url` plus the app's stream key (HealthProbeStream), for playing it."""
+    stream = s_config.health_probe_stream
+    return f"{url}/{stream}" if stream else url
+
+
+def copy_to_clipboard(c_config: Config, url: Optional[str] = None) -> bool:
+    url = url or rtmp_url(c_config)
     try:
-        pyperclip.copy(url)
+        with span("clipboard copy", "subprocess"):
+            pyperclip.copy(url)
+        from rich.text import Text
+
         console.print(
             Text.assemble(
                 ("✓ RTMP URL: ", "success"), (url, "rtmp"), (" (Copied)", "dimmed")
             )
         )
+        return True
     except Exception as e:
         console.print(f"[danger]Clipboard Error: {e}\n[info]URL: [rtmp]{url}[/rtmp]")
+        return False
+
+
+def next_host_port(p_config: Config, taken: Set[int]) -> Optional[int]:
+    """Returns the first host port not in `taken` from RtmpPortRange.
+
+    RtmpPort itself is handed out first, since the tool manages that port;
+    other ports are skipped when something already listens on them, unless
+    it is an RTMP listener this tool started (see start_rtmp_listener).
+    """
+    base = int(p_config.rtmp_port)
+    if base not in taken:
+        return base
+    ours = None
+    low, high = p_config.rtmp_port_range
+    for port in range(low, high + 1):
+        if port == base or port in taken:
+            continue
+        if port_is_free(port):
+            return port
+        if ours is None:
+            ours = tracked_listener_ports()
+        if port in ours:
+            return port
+    return None
+
+
+def allocate_device_ports(
+    p_config: Config, devices: List[Dict[str, str]]
+) -> Dict[str, int]:
+    """Gives each device its own host port (see next_host_port)."""
+    allocation: Dict[str, int] = {}
+    for d in devices:
+        port = next_host_port(p_config, set(allocation.values()))
+        if port is None:
+            low, high = p_config.rtmp_port_range
+            console.print(
+                f"[warning]RtmpPortRange {low}-{high} exhausted; {d['id']} skipped.[/warning]"
+            )
+            continue
+        allocation[d["id"]] = port
+    return allocation
+
+
+def setup_device(
+    s_config: Config,
+    d_info: Dict[str, str],
+    host_port: int,
+    forwarded: Optional[bool] = None,
+) -> Dict:
+    """Port forwarding, RTMP listener and app launch for one device, timed.
+
+    `forwarded` is the result of an earlier reconcile_reverse_forwards
+    covering this device; forwarding is done here when it is None. A host
+    port other than RtmpPort gets its own listener before the app starts;
+    RtmpPort's server is finish_setup's, and "listener" stays None until
+    check_listener has seen it answer.
+    """
+    start = time.perf_counter()
+    listening = None
+    with span("setup device", "device", device=d_info["id"], host_port=host_port):
+        if forwarded is None:
+            forwarded = setup_port_forwarding(s_config, d_info, host_port)
+        if host_port != int(s_config.rtmp_port):
+            listening = start_rtmp_listener(s_config, host_port)
+        launched = launch_app(s_config, d_info)
+    return {
+        "id": d_info["id"],
+        "name": d_info["name"],
+        "icon": d_info["icon"],
+        "host_port": host_port,
+        "rtmp_url": rtmp_url(s_config, host_port),
+        "port_forwarding": forwarded and listening is not False,
+        "listener": listening,
+        "app_launch": launched.ok,
+        "launch": launched.as_dict(),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def setup_all_devices(s_config: Config, devices: List[Dict[str, str]]) -> List[Dict]:
+    """Reconciles every device's forwarding at once, then launches in parallel."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    allocation = allocate_device_ports(s_config, devices)
+    targets = [d for d in devices if d["id"] in allocation]
+    if not targets:
+        return []
+    forwarded = reconcile_reverse_forwards(
+        s_config, {d["id"]: allocation[d["id"]] for d in targets}
+    )
+    with ThreadPoolExecutor(
+        max_workers=min(len(targets), 32), thread_name_prefix="device"
+    ) as pool:
+        return list(
+            pool.map(
+                lambda d: setup_device(
+                    s_config, d, allocation[d["id"]], forwarded[d["id"]]
+                ),
+                targets,
+            )
+        )
+
+
+def check_listener(result: Dict) -> bool:
+    """Fails a device's forwarding when nothing answers RTMP on its host port.
+
+    The reverse mapping alone is no use: the phone's stream would go to a
+    port with no server behind it.
+    """
+    port = result["host_port"]
+    if result["listener"] is None:
+        result["listener"] = rtmp_handshake_ok(port)
+        if not result["listener"]:
+            console.print(
+                f"[danger]✗ No RTMP server answers on host TCP:{port}; {result['id']} has nowhere to stream.[/danger]"
+            )
+    if not result["listener"]:
+        result["port_forwarding"] = False
+    return result["listener"]
+
+
+def probe_stream_health(h_config: Config, urls: List[str]) -> Dict[str, StreamStats]:
+    """Plays every URL for HealthProbeSeconds in parallel and measures it.
+
+    Only chunk and FLV tag headers are parsed (see rtmp.probe_stream), so
+    one thread per stream is cheap even for dozens of devices.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    window = h_config.health_probe_seconds
+    console.print(f"[info]Probing {len(urls)} stream(s) for {window:g}s...[/info]")
+    with ThreadPoolExecutor(
+        max_workers=min(len(urls), 64), thread_name_prefix="probe"
+    ) as pool:
+        stats = list(
+            pool.map(
+                lambda u: probe_stream(stream_url(h_config, u), window),
+                urls,
+            )
+        )
+    for st in stats:
+        style = "success" if st.ok else "warning"
+        console.print(f"[{style}]Stream {st.url}: {st.describe()}[/{style}]")
+    return dict(zip(urls, stats))
+
+
+def recording_path(r_config: Config, device_id: str, port: int) -> Path:
+    folder = Path(r_config.record_dir or "recordings").expanduser()
+    if not folder.is_absolute():
+        folder = SCRIPT_DIR / folder
+    safe_id = re.sub(r"[^\w.-]+", "_", device_id)
+    return folder / f"{safe_id}_{port}_{time.strftime('%Y%m%d-%H%M%S')}.flv"
+
+
+def start_recorder(r_config: Config, device_id: str, port: int) -> Dict:
+    """Starts flv_recorder.py on one device's stream; it outlives this script.
+
+    The recorder plays the stream like any player, so it works with either
+    RTMP server, and reconnects by itself until it is stopped. Its PID and
+    create-time go to RECORDERS_FILE by URL: a recorder still running on the
+    same stream is reused rather than doubled, and stop_recorders (run with
+    --stop-recording) ends them all.
+    """
+    url = stream_url(r_config, rtmp_url(r_config, port))
+    entry: Dict[str, Any] = {"id": device_id, "port": port, "url": url}
+    recorded = _read_process_table(RECORDERS_FILE).get(url)
+    if recorded and process_alive(recorded):
+        entry.update(path=recorded.get("path"), pid=recorded["pid"], reused=True)
+        console.print(
+            f"[success]● Already recording {device_id} to [dimmed]{entry['path']}[/dimmed][/success]"
+        )
+        return entry
+    path = recording_path(r_config, device_id, port)
+    stop_file = path.with_name(path.name + ".stop")  # See stop_recorders
+    entry.update(path=str(path), pid=None, reused=False)
+    argv = [sys.executable, str(SCRIPT_DIR / "flv_recorder.py"), url]
+    argv += ["--out", str(path), "--stop-file", str(stop_file), "--quiet"]
+    try:
+        with span("spawn recorder", "subprocess", device=device_id, port=port):
+            proc = subprocess.Popen(
+                argv,
+                cwd=str(SCRIPT_DIR),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL if HEADLESS else None,
+                stderr=subprocess.DEVNULL if HEADLESS else None,
+            )
+            create_time = psutil.Process(proc.pid).create_time()
+    except (OSError, psutil.Error) as e:
+        console.print(f"[danger]Recorder for {device_id} failed to start: {e}[/danger]")
+        entry["error"] = str(e)
+        return entry
+    entry["pid"] = proc.pid
+    _set_process_entry(
+        RECORDERS_FILE,
+        url,
+        {
+            "id": device_id,
+            "path": str(path),
+            "stop_file": str(stop_file),
+            "argv": argv,
+            "pid": proc.pid,
+            "create_time": create_time,
+        },
+    )
+    console.print(
+        f"[success]● Recording {device_id} to [dimmed]{path}[/dimmed][/success]"
+    )
+    return entry
+
+
+def stop_recorders() -> List[Dict[str, Any]]:
+    """Stops every recorder start_recorder left running (--stop-recording)."""
+    stopped = []
+    for url, entry in _stop_process_table(RECORDERS_FILE):
+        stopped.append({"url": url, "id": entry.get("id"), "path": entry.get("path")})
+        console.print(
+            f"[success]■ Stopped recording {entry.get('id')} ([dimmed]{entry.get('path')}[/dimmed])[/success]"
+        )
+    if not stopped:
+        console.print("[info]No recorder was running.[/info]")
+    return stopped
+
+
+def track_device_listings(t_config: Config) -> Iterator[str]:
+    """Yields a device listing at start and after every device-state change.
+
+    Uses the native client's track-devices socket, or `adb track-devices -l`
+    (same length-prefixed stream on stdout) when there is no server or
+    NativeAdb is off. Returns when the stream ends.
+    """
+    if client := get_adb_client(t_config):
+        try:
+            yield from client.track_devices()
+            return
+        except AdbServerUnavailable:
+            pass  # adb executable below starts the server on demand
+    proc = subprocess.Popen(
+        [str(t_config.adb_path), "track-devices", "-l"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while len(header := proc.stdout.read(4)) == 4:
+            yield proc.stdout.read(int(header, 16)).decode("utf-8", errors="replace")
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def watch_devices(run: "SetupRun", serial: Optional[str] = None):
+    """Keeps devices set up across unplug/replug until interrupted.
+
+    Follows the adb server's track-devices stream instead of polling. Every
+    device that turns operational (new, replugged or newly authorized) gets
+    its reverse mapping and app launch re-applied on a worker thread, so the
+    stream keeps being read meanwhile. A serial keeps its host port for the
+    whole session; `serial` limits watching to one device.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    config = run.config
+    ports: Dict[str, int] = {}
+    states: Dict[str, str] = {}
+    pool = ThreadPoolExecutor(thread_name_prefix="watch")
+
+    def restore(d_info: Dict[str, str], seen: float):
+        result = setup_device(config, d_info, ports[d_info["id"]])
+        check_listener(result)  # RtmpPort's server started before watching
+        result["recovery_seconds"] = round(time.perf_counter() - seen, 4)
+        run.device_runs.append(result)
+        report_watch_event("ready", result)
+
+    def on_listing(listing: str):
+        seen = time.perf_counter()
+        current = {
+            d["id"]: d
+            for d in parse_device_listing(listing)
+            if serial is None or d["id"] == serial
+        }
+        record_device_states(list(current.values()))
+        for did in [did for did in states if did not in current]:
+            report_watch_event("disconnected", {"id": did})
+            del states[did]
+        for did, d in current.items():
+            was, states[did] = states.get(did), d["status"]
+            if d["status"] != "device":
+                if was != d["status"]:
+                    report_watch_event(d["status"], {"id": did})
+                continue
+            if was == "device":
+                continue
+            if did not in ports:
+                port = next_host_port(config, set(ports.values()))
+                if port is None:
+                    console.print(
+                        f"[warning]No free host port for {did}; not set up.[/warning]"
+                    )
+                    continue
+                ports[did] = port
+                if config.record:  # One recorder per port, kept across replugs
+                    run.recordings.append(start_recorder(config, did, port))
+            pool.submit(restore, d, seen)
+
+    previous_sigterm = signal.signal(signal.SIGTERM, _raise_interrupt)
+    console.print("[info]Watching for devices (Ctrl+C to stop)...[/info]")
+    delay = 0.5
+    try:
+        while True:
+            try:
+                for listing in track_device_listings(config):
+                    on_listing(listing)
+                    delay = 0.5
+            except (AdbError, OSError, ValueError) as e:
+                console.print(f"[warning]Device tracking interrupted: {e}[/warning]")
+            # The stream ended (adb server restarted?); its reverse mappings
+            # went with it, so re-apply everything once tracking resumes.
+            states.clear()
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+    except KeyboardInterrupt:
+        console.print("\n[info]Stopped watching.[/info]")
+    finally:
+        signal.signal(signal.SIGTERM, previous_sigterm)
+        pool.shutdown(wait=True)
+
+
+def report_watch_event(event: str, data: Dict):
+    """One JSON line per event in --headless mode, a console line otherwise."""
+    if HEADLESS:
+        sys.stdout.write(json.dumps(dict(data, event=event)) + "\n")
+        sys.stdout.flush()
+    elif event == "ready":
+        ok = data["port_forwarding"] and data["app_launch"]
+        mark = "success" if ok else "warning"
+        console.print(
+            f"[{mark}]↻ {data['icon']} {data['name']} ({data['id']}) ready on "
+            f"[rtmp]{data['rtmp_url']}[/rtmp] in {data['recovery_seconds']:.2f}s[/{mark}]"
+        )
+    else:
+        console.print(f"[dimmed]⏏ {data['id']} {event}[/dimmed]")
+
+
+def _read_mona_state() -> Optional[Dict[str, Any]]:
+    try:
+        state = json.loads(MONA_STATE_FILE.read_text(encoding="utf-8"))
+        return {
+            "pid": int(state["pid"]),
+            "create_time": float(state["create_time"]),
+            # Files from before RtmpServer existed only ever held MonaServer
+            "kind": str(state.get("kind", "monaserver")),
+            "argv": state.get("argv"),
+        }
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
 
 
-def check_monaserver_process() -> bool:
-    mona_exe_name_base = "MonaServer"
-    mona_exe = f"{mona_exe_name_base}{'.exe' if platform.system() == 'Windows' else ''}".lower()
+def record_mona_process(
+    pid: int, kind: str = "monaserver", argv: Optional[List[str]] = None
+):
+    """Remembers the RTMP server's PID, create-time and kind (RtmpServer), so
+    later checks are O(1) and don't mistake one server for the other."""
     try:
-        for p in psutil.process_iter(["name", "exe", "cmdline"]):
+        create_time = psutil.Process(pid).create_time()
+        state = {"kind": kind, "argv": argv, "pid": pid, "create_time": create_time}
+        MONA_STATE_FILE.write_text(json.dumps(state), encoding="utf-8")
+    except (psutil.Error, OSError):
+        pass
+
+
+def _clear_mona_state():
+    try:
+        MONA_STATE_FILE.unlink()
+    except OSError:
+        pass
+
+
+def _recorded_mona_alive(kind: Optional[str] = None) -> Optional[bool]:
+    """Checks the recorded process; None when there is no usable record.
+
+    A record of another server kind than `kind` is not usable, but is kept:
+    that server may still hold the port and be replaced later.
+    """
+    state = _read_mona_state()
+    if not state or (kind and state["kind"] != kind):
+        return None
+    try:
+        with span("recorded pid check", "psutil", pid=state["pid"]):
+            p = psutil.Process(state["pid"])
+            # A matching create-time rules out the PID having been reused
+            alive = (
+                abs(p.create_time() - state["create_time"]) < 0.01
+                and p.status() != psutil.STATUS_ZOMBIE
+            )
+        if alive:
+            return True
+    except (psutil.NoSuchProcess, psutil.ZombieProcess):
+        pass
+    except psutil.AccessDenied:
+        return None
+    _clear_mona_state()
+    return False
+
+
+def check_monaserver_process(kind: Optional[str] = None) -> bool:
+    """True when the RTMP server of `kind` (RtmpServer; None for either) runs.
+
+    Only MonaServer can also be found by its executable name; the built-in
+    server is a python process like any other, so it counts only if recorded.
+    """
+    if _recorded_mona_alive(kind):
+        return True
+    if kind == "builtin":
+        return False
+    mona_exe = f"MonaServer{'.exe' if platform.system() == 'Windows' else ''}".lower()
+    with span("process scan", "psutil", target=mona_exe):
+        return _scan_for_monaserver(mona_exe)
+
+
+def _scan_for_monaserver(mona_exe: str) -> bool:
+    try:
+        # Fallback: match the executable name only. cmdline is not read, as
+        # that is slow, often denied, and matched unrelated processes whose
+        # arguments merely mentioned "monaserver".
+        for p in psutil.process_iter(["name", "exe"]):
             try:
                 p_name = (p.info.get("name") or "").lower()
                 p_exe = (
                     Path(p.info.get("exe") or "").name
                 ).lower()  # Get just filename from exe path
 
-                if mona_exe == p_name or mona_exe == p_exe:
+                if mona_exe in (p_name, p_exe):
+                    record_mona_process(p.pid)
                     return True
-                # Fallback to checking command line arguments if name/exe is not specific enough
-                if p.info.get("cmdline"):
-                    if any(
-                        mona_exe_name_base.lower() in arg.lower()
-                        for arg in p.info["cmdline"]
-                    ):
-                        return True
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                 continue  # Ignore processes that ended or we can't access
             except Exception:  # Catch other potential errors with process info
@@ -865,73 +2311,383 @@ def check_monaserver_process() -> bool:
     return False
 
 
+_mona_seen: Optional[Tuple[int, float]] = None
+
+
+@METRICS.collector
+def _collect_monaserver():
+    """Scrape-time MonaServer check; a changed PID/create-time is a restart."""
+    global _mona_seen
+    up = check_monaserver_process()
+    MONA_UP.set(1 if up else 0)
+    state = _read_mona_state() if up else None
+    if state:
+        seen = (state["pid"], state["create_time"])
+        if _mona_seen is not None and seen != _mona_seen:
+            MONA_RESTARTS.inc()
+        _mona_seen = seen
+
+
+_metric_serials: Set[str] = set()
+
+
+def record_device_states(devices: List[Dict[str, str]]):
+    """Publishes the latest device listing as DEVICE_STATE.
+
+    Serials seen earlier in the session stay listed as "disconnected".
+    """
+    states = {d["id"]: d["status"] for d in devices}
+    _metric_serials.update(states)
+    DEVICE_STATE.replace(
+        {(sn, states.get(sn, "disconnected")): 1 for sn in _metric_serials}
+    )
+
+
+def start_metrics_server(m_config: Config):
+    """Serves METRICS on 127.0.0.1:MetricsPort; returns without waiting."""
+    port = m_config.metrics_port
+
+    def report(error: Optional[OSError]):
+        if error:
+            console.print(
+                f"[warning]Metrics endpoint on port {port} unavailable: {error}[/warning]"
+            )
+        else:
+            console.print(f"[info]Metrics at http://127.0.0.1:{port}/metrics[/info]")
+
+    serve(METRICS, port, on_ready=report)
+
+
+def server_label(kind: str) -> str:
+    return "built-in RTMP server" if kind == "builtin" else "MonaServer"
+
+
+def rtmp_server_command(
+    m_config: Config, port: Optional[int] = None
+) -> Optional[Tuple[List[str], Path]]:
+    """(argv, cwd) that starts the configured RTMP server, or None if unset.
+
+    `port` other than RtmpPort is an extra listener. MonaServer then runs
+    from MONA_INSTANCES_DIR/<port> with an RTMP-only ini on that port
+    (MonaProfile, else "default"), so it doesn't compete for HTTP or SRT.
+    """
+    port = port or int(m_config.rtmp_port)
+    if m_config.rtmp_server == "builtin":
+        script = SCRIPT_DIR / "rtmp_server.py"
+        argv = [sys.executable, str(script), "--port", str(port)]
+        return argv, SCRIPT_DIR
+    mona = m_config.monaserver_path
+    if not mona or not mona.is_file():
+        return None
+    if port == int(m_config.rtmp_port):
+        return [str(mona)], mona.parent
+    folder = MONA_INSTANCES_DIR / str(port)
+    extra = {
+        "": {"wwwDir": f'"{mona.parent / "www"}"', "dataDir": f'"{folder / "data"}"'},
+        "logs": {"directory": str(folder / "logs")},
+    }
+    ini = folder / "MonaServer.ini"
+    folder.mkdir(parents=True, exist_ok=True)
+    write_ini(str(ini), m_config.mona_profile or "default", port, extra, rtmp_only=True)
+    return [str(mona), str(ini)], folder
+
+
+def spawn_rtmp_server(argv: List[str], cwd: Path) -> subprocess.Popen:
+    """Starts a server that outlives this script, away from our stdin."""
+    with span("spawn rtmp server", "subprocess", command=" ".join(argv)):
+        return subprocess.Popen(
+            argv,
+            cwd=str(cwd),
+            # MonaServer must not consume the Enter pressed to exit the script
+            stdin=subprocess.DEVNULL,
+            # Headless: keep stdout for the JSON report, and don't hold the
+            # caller's pipes open for as long as the server runs.
+            stdout=subprocess.DEVNULL if HEADLESS else None,
+            stderr=subprocess.DEVNULL if HEADLESS else None,
+        )
+
+
+def process_alive(entry: Dict[str, Any]) -> Optional["psutil.Process"]:
+    """The process a state entry recorded, if it runs; the create-time must
+    match, which rules out the PID having been reused."""
+    try:
+        p = psutil.Process(int(entry["pid"]))
+        if (
+            abs(p.create_time() - float(entry["create_time"])) < 0.01
+            and p.status() != psutil.STATUS_ZOMBIE
+        ):
+            return p
+    except (psutil.Error, KeyError, TypeError, ValueError):
+        pass
+    return None
+
+
+def _read_process_table(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Background processes this tool started, by key (see process_alive)."""
+    try:
+        table = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return table if isinstance(table, dict) else {}
+
+
+def _set_process_entry(path: Path, key: str, entry: Optional[Dict[str, Any]]):
+    """Records (or with None forgets) the process started for `key`."""
+    with _process_table_lock:
+        table = _read_process_table(path)
+        if entry is None:
+            table.pop(key, None)
+        else:
+            table[key] = entry
+        tmp = path.with_suffix(".tmp")
+        try:
+            tmp.write_text(json.dumps(table, indent=1), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+
+def _stop_process_table(path: Path) -> List[Tuple[str, Dict[str, Any]]]:
+    """Ends every process still running from a table and removes the table.
+
+    An entry with a "stop_file" (a recorder) is asked to exit by creating
+    that file, which works on Windows too, where terminate() cannot be
+    caught; it then flushes and closes its files. The others are terminated.
+    Whatever still runs after 5 s is killed.
+    Returns the (key, entry) pairs that were running.
+    """
+    stopped = []
+    with _process_table_lock:
+        running = [
+            (key, entry, proc)
+            for key, entry in _read_process_table(path).items()
+            if (proc := process_alive(entry))
+        ]
+        for _, entry, _ in running:
+            if entry.get("stop_file"):
+                try:
+                    Path(entry["stop_file"]).touch()
+                except OSError:
+                    pass
+        for key, entry, proc in running:
+            try:
+                if not entry.get("stop_file"):
+                    proc.terminate()
+                try:
+                    proc.wait(timeout=5)
+                except psutil.TimeoutExpired:
+                    proc.kill()
+            except psutil.Error:
+                continue
+            finally:
+                if entry.get("stop_file"):
+                    Path(entry["stop_file"]).unlink(missing_ok=True)
+            stopped.append((key, entry))
+        try:
+            path.unlink()
+        except OSError:
+            pass
+    return stopped
+
+
+def stop_rtmp_listeners() -> int:
+    """Stops every listener start_rtmp_listener recorded; returns how many."""
+    return len(_stop_process_table(RTMP_LISTENERS_FILE))
+
+
+def tracked_listener_ports() -> Set[int]:
+    """Host ports whose listener this tool started and that still runs."""
+    return {
+        int(port)
+        for port, entry in _read_process_table(RTMP_LISTENERS_FILE).items()
+        if port.isdigit() and process_alive(entry)
+    }
+
+
+def start_rtmp_listener(l_config: Config, port: int) -> bool:
+    """Makes sure an RTMP server answers on host `port`, besides RtmpPort's.
+
+    MonaServer and rtmp_server.py each serve one port, so every device on
+    its own host port needs a server of its own. One this tool started
+    earlier (RTMP_LISTENERS_FILE) is reused while it is of the RtmpServer
+    kind configured, and replaced otherwise. Any other server answering
+    RTMP on the port is used as is. With AutoStartMonaServer off nothing is
+    started. Returns True once the port answers an RTMP handshake.
+    """
+    kind, label = l_config.rtmp_server, server_label(l_config.rtmp_server)
+    entry = _read_process_table(RTMP_LISTENERS_FILE).get(str(port))
+    proc = process_alive(entry) if entry else None
+    if proc is not None and entry.get("kind") == kind:
+        ready, _ = wait_for_rtmp_ready(port, l_config.mona_ready_timeout)
+        if ready:
+            console.print(f"[success]✓ {label} already on TCP:{port}.[/success]")
+            return True
+    if proc is not None:  # Another kind, or hung: replace it
+        kill_process_by_pid(proc.pid, server_label(entry.get("kind", "")))
+        wait_for_port_release(port, l_config.port_release_timeout)
+    if entry:
+        _set_process_entry(RTMP_LISTENERS_FILE, str(port), None)
+    if rtmp_handshake_ok(port):
+        return True
+    if not l_config.auto_start_monaserver:
+        console.print(
+            f"[warning]Nothing answers RTMP on TCP:{port} and auto-start is off.[/warning]"
+        )
+        return False
+    if not port_is_free(port):
+        console.print(
+            f"[danger]TCP:{port} is held by something that doesn't speak RTMP.[/danger]"
+        )
+        return False
+    try:
+        command = rtmp_server_command(l_config, port)
+        if command is None:
+            console.print(f"[danger]No {label} to start on TCP:{port}.[/danger]")
+            return False
+        argv, cwd = command
+        server = spawn_rtmp_server(argv, cwd)
+        create_time = psutil.Process(server.pid).create_time()
+    except (OSError, ValueError, psutil.Error) as e:
+        console.print(f"[danger]{label} for TCP:{port} failed to start: {e}[/danger]")
+        return False
+    MONA_STARTS.inc()
+    _set_process_entry(
+        RTMP_LISTENERS_FILE,
+        str(port),
+        {"kind": kind, "argv": argv, "pid": server.pid, "create_time": create_time},
+    )
+    ready, waited = wait_for_rtmp_ready(
+        port, l_config.mona_ready_timeout, abort=lambda: server.poll() is not None
+    )
+    if ready:
+        console.print(
+            f"[success]✓ {label} answering RTMP on TCP:{port} ({waited:.2f}s).[/success]"
+        )
+    else:
+        console.print(
+            f"[danger]{label} on TCP:{port} gave no RTMP handshake within {waited:.1f}s.[/danger]"
+        )
+    return ready
+
+
+def sync_mona_ini(m_config: Config) -> bool:
+    """Keeps MonaServer.ini's RTMP port in line with RtmpPort.
+
+    With MonaProfile set the ini is generated from that profile (mona_ini.py)
+    on RtmpPort; otherwise a port that disagrees is only reported, since the
+    phones would be forwarded to a port MonaServer doesn't listen on.
+    Returns True if the ini was rewritten.
+    """
+    if m_config.rtmp_server == "builtin" or not m_config.monaserver_path:
+        return False
+    ini = m_config.monaserver_path.parent / "MonaServer.ini"
+    port = int(m_config.rtmp_port)
+    if m_config.mona_profile:
+        try:
+            changed = write_ini(str(ini), m_config.mona_profile, port)
+        except OSError as e:
+            console.print(f"[warning]Could not write {ini}: {e}[/warning]")
+            return False
+        if changed:
+            console.print(
+                f"[success]✓ Wrote {ini.name} from the '{m_config.mona_profile}' profile (RTMP on TCP:{port}).[/success]"
+            )
+        return changed
+    try:
+        text = ini.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        text = ""  # No ini: MonaServer falls back to its defaults
+    ini_port = ini_rtmp_port(text)
+    if ini_port != port:
+        where = "disables RTMP" if ini_port is None else f"listens on TCP:{ini_port}"
+        console.print(
+            f"[warning]{ini.name} {where}, but RtmpPort is {port}. Set MonaProfile in {CONFIG_FILE.name} to generate a matching ini.[/warning]"
+        )
+    return False
+
+
 def start_mona_server(m_config: Config) -> Optional[bool]:
-    if check_monaserver_process():
-        console.print("[success]✓ MonaServer already running.[/success]")
+    kind = m_config.rtmp_server
+    label = server_label(kind)
+    ini_changed = sync_mona_ini(m_config)
+    if check_monaserver_process(kind):
+        if ini_changed:
+            console.print(
+                "[warning]MonaServer is already running; restart it to apply the new MonaServer.ini.[/warning]"
+            )
+        console.print(f"[success]✓ {label} already running.[/success]")
         return True
-    if not m_config.monaserver_path or not m_config.monaserver_path.is_file():
+    command = rtmp_server_command(m_config)
+    if command is None:
         console.print(
             f"[danger]MonaServer path ('{m_config.monaserver_path}') is not set or invalid.[/danger]"
         )
         return False
+    argv, cwd = command
 
     # Port conflict for MonaServer's port should ideally be checked *before* trying to start it.
     # This is done in the main block. If it was resolved by killing,
-    # there's a small chance another app took it. Re-checking here is safer.
-    port_clear, conflicting_pid = handle_port_conflict(m_config.rtmp_port, m_config)
+    # there's a small chance another app took it. Re-checking here is safer,
+    # but without prompting: this runs alongside the ADB and device steps.
+    port_clear, conflicting_pid = handle_port_conflict(
+        m_config.rtmp_port, m_config, prompt=False
+    )
     if not port_clear:
         console.print(
-            f"[danger]MonaServer: Port TCP:{m_config.rtmp_port} conflict (PID {conflicting_pid}). Cannot start.[/danger]"
+            f"[danger]{label}: Port TCP:{m_config.rtmp_port} conflict (PID {conflicting_pid}). Cannot start.[/danger]"
         )
         return False
 
-    console.print(
-        f"[info]Starting MonaServer: [dimmed]{m_config.monaserver_path}[/dimmed]"
-    )
+    console.print(f"[info]Starting {label}: [dimmed]{' '.join(argv)}[/dimmed]")
     try:
-        # Remove creationflags to inherit console/run in background without new window
-        # FIX: Redirect stdin to DEVNULL to prevent MonaServer from consuming
-        # the "Enter" key pressed to exit the script.
-        # stdout and stderr are inherited by default, so its output will still appear.
-        subprocess.Popen(
-            [str(m_config.monaserver_path)],
-            cwd=str(m_config.monaserver_path.parent),
-            stdin=subprocess.DEVNULL,  # MODIFIED LINE
-        )
+        mona_proc = spawn_rtmp_server(argv, cwd)
+        record_mona_process(mona_proc.pid, kind, argv)
+        MONA_STARTS.inc()
         console.print(
-            "[success]✓ MonaServer start command issued. Output should appear below (if any).[/success]"
+            f"[success]✓ {label} start command issued. Output should appear below (if any).[/success]"
         )
-        time.sleep(
-            1.5
-        )  # Give MonaServer time to start and potentially print initial logs
+        port = int(m_config.rtmp_port)
+        with span("wait rtmp ready", "setup", port=port) as s:
+            ready, waited = wait_for_rtmp_ready(
+                port,
+                m_config.mona_ready_timeout,
+                abort=lambda: mona_proc.poll() is not None,
+            )
+            s.set(ready=ready)
+        if ready:
+            console.print(
+                f"[success]✓ {label} answering RTMP on TCP:{port} ({waited:.2f}s).[/success]"
+            )
+            return True
 
         # Verify if the process actually started and is running
-        if not check_monaserver_process():
-            # Check port again, as MonaServer might have failed to bind
-            _, still_conflicting_pid = handle_port_conflict(
-                m_config.rtmp_port, m_config
-            )  # Check if port is now taken by Mona
-            if still_conflicting_pid is None and not find_process_using_port(
-                int(m_config.rtmp_port)
-            ):  # Port is free
-                console.print(
-                    "[warning]MonaServer launched, but status check failed and port is not taken. Verify manually.[/warning]"
-                )
-            elif (
-                find_process_using_port(int(m_config.rtmp_port))
-                and not check_monaserver_process()
-            ):  # Port taken but not by Mona
-                console.print(
-                    f"[warning]MonaServer launched, but status check failed. Port TCP:{m_config.rtmp_port} might be taken by another process. Verify manually.[/warning]"
-                )
-            else:  # Port taken by Mona, but check_monaserver_process failed (should not happen if port is taken by Mona)
-                console.print(
-                    "[warning]MonaServer launched, but status check failed. Verify manually.[/warning]"
-                )
-            return None  # Unconfirmed status
-        return True  # Successfully started
+        if check_monaserver_process(kind):
+            console.print(
+                f"[warning]{label} is running but TCP:{port} gave no RTMP handshake within {waited:.1f}s. Verify manually.[/warning]"
+            )
+            return None
+        # Check port again, as MonaServer might have failed to bind
+        _, still_conflicting_pid = handle_port_conflict(
+            m_config.rtmp_port, m_config, prompt=False
+        )  # Check if port is now taken by Mona
+        if still_conflicting_pid is None and not find_process_using_port(
+            int(m_config.rtmp_port)
+        ):  # Port is free
+            console.print(
+                f"[warning]{label} launched, but status check failed and port is not taken. Verify manually.[/warning]"
+            )
+        elif find_process_using_port(port) and not check_monaserver_process(kind):
+            # Port taken, but not by the server just started
+            console.print(
+                f"[warning]{label} launched, but status check failed. Port TCP:{m_config.rtmp_port} might be taken by another process. Verify manually.[/warning]"
+            )
+        else:  # Port taken by Mona, but check_monaserver_process failed (should not happen if port is taken by Mona)
+            console.print(
+                f"[warning]{label} launched, but status check failed. Verify manually.[/warning]"
+            )
+        return None  # Unconfirmed status
     except Exception as e:
-        console.print(f"[danger]MonaServer start failed: {e}[/danger]")
+        console.print(f"[danger]{label} start failed: {e}[/danger]")
         return False
 
 
@@ -941,84 +2697,447 @@ def step_divider(emoji: str, title: str):
     )
 
 
-def exit_with_error(message: str):
-    console.print(
-        f"\n[danger]ERROR: {message}[/danger]\n[italic]Press Enter to exit...[/italic]"
+class SetupError(Exception):
+    """Fatal setup failure; main() reports it and exits with `exit_code`."""
+
+    def __init__(self, message: str, exit_code: int = EXIT_ERROR):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+def exit_with_error(message: str, exit_code: int = EXIT_ERROR):
+    """Aborts the setup. Steps may call this from a worker thread, so the
+    "Press Enter to exit" pause is left to main(), on the main thread."""
+    raise SetupError(message, exit_code)
+
+
+@dataclass
+class SetupRun:
+    """State of one pass through the setup steps, shared by both UIs."""
+
+    config: Optional[Config] = None
+    results: Dict[str, Optional[bool]] = field(
+        default_factory=lambda: {
+            "Port Conflict Resolved": None,  # True if resolved, False if user skipped, None if no conflict
+            "Port Forwarding": False,
+            "App Launch": False,
+            "RTMP URL Copied": False,
+            "MonaServer": None,  # True if started, False if failed, None if unconfirmed/already running
+        }
     )
-    input()
-    sys.exit(1)
+    adb_version: Optional[str] = None
+    device: Optional[Dict[str, str]] = None
+    launch: Optional[LaunchResult] = None  # Single-device runs; see device_runs
+    device_runs: List[Dict] = field(default_factory=list)  # --all-devices only
+    stream_health: Dict[str, StreamStats] = field(default_factory=dict)
+    recordings: List[Dict] = field(default_factory=list)
+    conflicting_pid_at_start: Optional[int] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    critical_path: Dict[str, Any] = field(default_factory=dict)
+    latency: Optional[Dict[str, Any]] = None  # --latency runs only
 
+    @contextmanager
+    def timed(self, step: str):
+        start = time.perf_counter()
+        try:
+            with span(step, "step"):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[step] = round(elapsed, 4)
+            PHASE_SECONDS.observe(elapsed, phase=step)
+
+    def exit_code(self) -> int:
+        if self.latency is not None:  # No device is set up in this mode
+            return EXIT_OK if self.latency["ok"] else EXIT_MONASERVER
+        if not self.results["Port Forwarding"]:
+            return EXIT_PORT_FORWARD
+        if not self.results["App Launch"]:
+            return EXIT_APP_LAUNCH
+        if self.results["MonaServer"] is False:
+            return EXIT_MONASERVER
+        return EXIT_OK
+
+
+def select_device_by_serial(
+    current_config: Config, serial: str
+) -> Optional[Dict[str, str]]:
+    for d in current_config.devices:
+        if d["id"] == serial:
+            if d["status"] == "device":
+                console.print(
+                    f"[success]✓ Using: [bold]{d['icon']} {d['name']}[/bold] ({serial})"
+                )
+                return d
+            console.print(f"[danger]Device {serial} is {d['status']}.[/danger]")
+            return None
+    console.print(f"[danger]Device {serial} not found.[/danger]")
+    return None
 
-# --- Main Execution ---
-if __name__ == "__main__":
-    console.print(LOGO)  # Use the original multi-line logo
+
+def select_device_headless(current_config: Config) -> Optional[Dict[str, str]]:
+    sel = [d for d in current_config.devices if d["status"] == "device"]
+    if len(sel) == 1:
+        return sel[0]
     console.print(
-        Panel(
-            "[white]RTMP Stream Setup Assistant[/]",
-            box=ROUNDED,
-            border_style="blue",
-            padding=(0, 1),
-            expand=False,
-        )
+        f"[danger]{len(sel)} operational devices; pass --serial to choose one.[/danger]"
     )
-    results = {
-        "Port Conflict Resolved": None,  # True if resolved, False if user skipped, None if no conflict
-        "Port Forwarding": False,
-        "App Launch": False,
-        "RTMP URL Copied": False,
-        "MonaServer": None,  # True if started, False if failed, None if unconfirmed/already running
-    }
-    conflicting_pid_at_start: Optional[int] = None
+    return None
 
-    step_divider("⚙️", "Configuration")
-    config = load_config()
 
-    # Initial port check for MonaServer's intended port before trying to start it
-    # This is now also handled inside start_mona_server for robustness,
-    # but doing it early helps inform the user.
-    results["Port Conflict Resolved"], conflicting_pid_at_start = handle_port_conflict(
-        config.rtmp_port, config
+def run_setup(run: SetupRun, args: argparse.Namespace):
+    """Executes the setup steps, filling `run` as it goes.
+
+    Everything needs the config, so load_config runs first; the remaining
+    steps run as the graph from setup_graph, overlapping where they can.
+    """
+    step_divider("⚙️", "Configuration")
+    with run.timed("load_config"):
+        config = run.config = load_config(device_setup=args.latency is None)
+    if args.port:
+        config.rtmp_port = str(args.port)
+    if args.package:
+        config.package_name = args.package
+    if args.probe is not None:
+        config.health_probe_seconds = args.probe
+    if args.record:
+        config.record = True
+    if args.metrics_port:
+        config.metrics_port = args.metrics_port
+    if config.metrics_port:
+        start_metrics_server(config)
+    if args.latency is not None:
+        measure_ingest_latency(run, args)
+        return
+
+    graph = setup_graph(run, args)
+    try:
+        graph.run()
+    finally:
+        steps, seconds = graph.critical_path()
+        run.critical_path = {"steps": steps, "seconds": round(seconds, 4)}
+
+    if args.watch:
+        results = run.results
+        step_divider("👀", "Watching Devices")
+        watch_devices(run, args.serial)
+        results["RTMP URL Copied"] = None  # One URL per device, in the events
+        results["Port Forwarding"] = all(r["port_forwarding"] for r in run.device_runs)
+        results["App Launch"] = all(r["app_launch"] for r in run.device_runs)
+
+
+def setup_graph(run: SetupRun, args: argparse.Namespace) -> TaskGraph:
+    """The setup steps after load_config and what each one waits for.
+
+    The ADB check, device scan, selection, reverse forward and app launch
+    form one chain; the port-conflict check and MonaServer start form
+    another that needs no device. Recorders and the health probe wait for
+    both. Steps that may prompt are exclusive when interactive: the port
+    check (unless ForceKillConflictingPortProcess), device selection and
+    forwarding, whose failure asks whether to go on. They run alone on the
+    main thread, so Ctrl+C reaches the prompt and no other step prints over it.
+    """
+    config, results = run.config, run.results
+    all_devices = args.all_devices or config.setup_all_devices
+    graph = TaskGraph()
+
+    def port_check():
+        # Also re-checked inside start_mona_server, but doing it early
+        # informs the user (and frees the port) before the server starts.
+        with run.timed("handle_port_conflict"):
+            results["Port Conflict Resolved"], run.conflicting_pid_at_start = (
+                handle_port_conflict(config.rtmp_port, config)
+            )
+        if (
+            not results["Port Conflict Resolved"]
+            and run.conflicting_pid_at_start is not None
+        ):
+            # This means user chose to skip resolving the conflict or kill failed
+            console.print(
+                f"[warning]Port TCP:{config.rtmp_port} conflict (PID {run.conflicting_pid_at_start}) was not resolved. The {server_label(config.rtmp_server)} might fail to start or bind.[/warning]"
+            )
+            # We allow proceeding as start_mona_server will re-check.
+
+    def adb_check():
+        step_divider("🔍", "ADB Verification")
+        with run.timed("check_adb_version"):
+            adb_ok, adb_version = check_adb_version(config)
+        if not adb_ok:
+            exit_with_error(f"ADB check failed: {adb_version}", EXIT_ADB)
+        run.adb_version = adb_version
+
+    graph.add(
+        "port_conflict",
+        port_check,
+        exclusive=not HEADLESS and not config.force_kill_port_process,
     )
-    if not results["Port Conflict Resolved"] and conflicting_pid_at_start is not None:
-        # This means user chose to skip resolving the conflict or kill failed
-        console.print(
-            f"[warning]Port TCP:{config.rtmp_port} conflict (PID {conflicting_pid_at_start}) was not resolved. MonaServer might fail to start or bind.[/warning]"
+    graph.add("adb", adb_check)
+    # In --watch mode the listener comes first, so replugged phones can
+    # stream at once; watch_devices itself runs after the graph.
+    graph.add("server", lambda: finish_setup(run), after=["port_conflict"])
+    if args.watch:
+        return graph
+
+    def scan():
+        step_divider("📱", "Device Selection")
+        with run.timed("find_connected_devices"):
+            config.devices = find_connected_devices(config)
+        record_device_states(config.devices)
+
+    graph.add("devices", scan, after=["adb"])
+    if all_devices:
+        graph.add("setup", lambda: run_all_devices(run), after=["devices"])
+        graph.add("listeners", lambda: check_listeners(run), after=["server", "setup"])
+        device_steps = ["setup"]
+    else:
+        graph.add(
+            "select",
+            lambda: select_device(run, args),
+            after=["devices"],
+            exclusive=not HEADLESS and not args.serial,
+        )
+        graph.add(
+            "forward",
+            lambda: forward_selected(run),
+            after=["select"],
+            exclusive=not HEADLESS,
         )
-        # We allow proceeding as start_mona_server will re-check.
+        graph.add("launch", lambda: launch_selected(run), after=["forward"])
+        device_steps = ["select"]
+
+    if HEADLESS:
+        results["RTMP URL Copied"] = None  # URL is in the JSON instead
+    else:
+        # One URL per device needs the port allocation; a single one does not
+        graph.add(
+            "clipboard",
+            lambda: copy_rtmp_urls(run),
+            after=["setup"] if all_devices else [],
+        )
+    if config.record:
+        graph.add(
+            "recorders", lambda: start_recorders(run), after=["server"] + device_steps
+        )
+    if config.health_probe_seconds > 0:
+        graph.add(
+            "probe",
+            lambda: probe_streams(run),
+            after=["server", "setup" if all_devices else "launch"],
+        )
+    return graph
 
-    step_divider("🔍", "ADB Verification")
-    adb_ok, adb_version = check_adb_version(config)
-    if not adb_ok:
-        exit_with_error(f"ADB check failed: {adb_version}")
 
-    step_divider("📱", "Device Selection")
-    config.devices = find_connected_devices(config)
-    selected_device = select_device_from_list(config)
+def select_device(run: SetupRun, args: argparse.Namespace):
+    config = run.config
+    if args.serial:
+        selected_device = select_device_by_serial(config, args.serial)
+    elif HEADLESS:
+        selected_device = select_device_headless(config)
+    else:
+        selected_device = select_device_from_list(config)
     if not selected_device:
-        exit_with_error("No device selected.")
+        exit_with_error("No device selected.", EXIT_NO_DEVICE)
+    run.device = selected_device
 
+
+def forward_selected(run: SetupRun):
+    config, results = run.config, run.results
     step_divider("🚀", "Setup Execution")
-    results["Port Forwarding"] = setup_port_forwarding(config, selected_device)
-    if not results["Port Forwarding"]:
+    with run.timed("setup_port_forwarding"):
+        results["Port Forwarding"] = setup_port_forwarding(config, run.device)
+    if not results["Port Forwarding"] and not HEADLESS:
+        from rich.prompt import Confirm
+
         if not Confirm.ask("Port forwarding failed. Continue anyway?", default=False):
-            exit_with_error("Aborted: port forwarding failure.")
-    results["App Launch"] = launch_app(config, selected_device)
-    copy_to_clipboard(config)
-    results["RTMP URL Copied"] = True
+            exit_with_error("Aborted: port forwarding failure.", EXIT_PORT_FORWARD)
 
-    if config.auto_start_monaserver:
-        results["MonaServer"] = start_mona_server(config)
+
+def launch_selected(run: SetupRun):
+    with run.timed("launch_app"):
+        run.launch = launch_app(run.config, run.device)
+    run.results["App Launch"] = run.launch.ok
+
+
+def run_all_devices(run: SetupRun):
+    """Sets up every operational device at once, each on its own host port."""
+    config, results = run.config, run.results
+    targets = [d for d in config.devices if d["status"] == "device"]
+    if not targets:
+        exit_with_error("No operational devices.", EXIT_NO_DEVICE)
+    console.print(f"[success]✓ Setting up all {len(targets)} operational device(s).")
+
+    step_divider("🚀", "Setup Execution")
+    with run.timed("setup_all_devices"):
+        run.device_runs = setup_all_devices(config, targets)
+    if not run.device_runs:
+        exit_with_error("No host ports left in RtmpPortRange.", EXIT_PORT_FORWARD)
+    run.device = targets[0]
+    results["Port Forwarding"] = all(r["port_forwarding"] for r in run.device_runs)
+    results["App Launch"] = all(r["app_launch"] for r in run.device_runs)
+
+
+def check_listeners(run: SetupRun):
+    """After the server step: every device's host port must answer RTMP."""
+    for r in run.device_runs:
+        check_listener(r)
+    run.results["Port Forwarding"] = all(r["port_forwarding"] for r in run.device_runs)
+
+
+def device_urls(run: SetupRun) -> List[str]:
+    """One RTMP URL per device set up, or RtmpPort's for a single device."""
+    if run.device_runs:
+        return [r["rtmp_url"] for r in run.device_runs]
+    return [rtmp_url(run.config)]
+
+
+def copy_rtmp_urls(run: SetupRun):
+    with run.timed("copy_to_clipboard"):
+        run.results["RTMP URL Copied"] = copy_to_clipboard(
+            run.config, "\n".join(device_urls(run))
+        )
+
+
+def start_recorders(run: SetupRun):
+    config = run.config
+    if run.device_runs:
+        targets = [(r["id"], r["host_port"]) for r in run.device_runs]
     else:
-        console.print("[info]Auto-start MonaServer is disabled in config.[/info]")
-        if check_monaserver_process():
-            console.print(
-                "[info]MonaServer is already running (checked manually).[/info]"
+        targets = [(run.device["id"], int(config.rtmp_port))]
+    with run.timed("start_recorders"):
+        run.recordings = [start_recorder(config, did, port) for did, port in targets]
+
+
+def probe_streams(run: SetupRun):
+    with run.timed("probe_stream_health"):
+        run.stream_health = probe_stream_health(run.config, device_urls(run))
+
+
+def measure_ingest_latency(run: SetupRun, args: argparse.Namespace):
+    """--latency: publish-to-play latency through the RTMP server on RtmpPort.
+
+    Sets up no device. The server is started like in a normal run if nothing
+    answers on the port; then one synthetic stream, stamped with the send
+    time of every video frame (see rtmp_load.py), is published to the RTMP
+    URL and played back through the same server for `args.latency` seconds.
+    """
+    import asyncio
+
+    import rtmp_load
+
+    config = run.config
+    port = int(config.rtmp_port)
+    step_divider("⏱️", "Ingest Latency")
+    if rtmp_handshake_ok(port):
+        console.print(f"[success]✓ RTMP server answering on TCP:{port}.[/success]")
+        run.results["MonaServer"] = None  # Already running, not ours
+    else:
+        finish_setup(run)
+        if not rtmp_handshake_ok(port):
+            exit_with_error(f"No RTMP server answering on TCP:{port}.", EXIT_MONASERVER)
+            return
+    host, port, app, _ = parse_rtmp_url(rtmp_url(config))
+    seconds = args.latency
+    window = args.latency_window or max(1.0, round(seconds / 10))
+    console.print(
+        f"[info]Publishing a {args.latency_kbps:g} kbps stamped stream to "
+        f"[rtmp]{rtmp_url(config)}[/rtmp] and playing it back for {seconds:g}s...[/info]"
+    )
+    with run.timed("measure_latency"):
+        stats = asyncio.run(
+            rtmp_load.run_load(
+                host,
+                port,
+                bitrate_kbps=args.latency_kbps,
+                duration=seconds,
+                app=app,
+                prefix=f"latency-{os.getpid()}-",
             )
-            results["MonaServer"] = True  # Treat as OK if running
+        )
+    summary = stats.as_dict()
+    run.latency = dict(
+        summary,
+        ok=bool(stats.frames) and not stats.errors,
+        window=window,
+        windows=stats.windows(window),
+    )
+
+
+def print_latency_report(run: SetupRun):
+    from rich.box import ROUNDED
+    from rich.table import Table
+
+    latency = run.latency
+    table = Table(
+        title="Ingest Latency (publish → play, ms)",
+        box=ROUNDED,
+        border_style="cyan",
+        padding=(0, 1),
+        expand=False,
+    )
+    for col in ("Window", "Frames", "p50", "p95", "p99", "Max"):
+        table.add_column(col, justify="right")
+    width = latency["window"]
+    for w in latency["windows"]:
+        table.add_row(
+            f"{w['start']:g}-{w['start'] + width:g}s",
+            str(w["frames"]),
+            f"{w['p50']:.1f}",
+            f"{w['p95']:.1f}",
+            f"{w['p99']:.1f}",
+            f"{w['max']:.1f}",
+        )
+    overall = latency["latency_ms"]
+    if latency["frames"]:
+        table.add_section()
+        table.add_row(
+            "[bold]All[/bold]",
+            str(latency["frames"]),
+            *(f"[bold]{overall[q]:.1f}[/bold]" for q in ("p50", "p95", "p99")),
+            f"{max(w['max'] for w in latency['windows']):.1f}",
+        )
+    console.print(table)
+    notes = [
+        f"Relayed {latency['relay_mbps']:.2f} of {latency['publish_mbps']:.2f} Mbps published"
+    ]
+    if latency["lost_frames"]:
+        notes.append(f"[warning]{latency['lost_frames']} frame(s) lost[/warning]")
+    for message, count in latency["error_messages"].items():
+        notes.append(f"[danger]{message} (x{count})[/danger]")
+    if not latency["frames"]:
+        notes.append(
+            "[danger]✗ No stamped frame came back through the server.[/danger]"
+        )
+    console.print("\n".join(notes))
+
+
+def finish_setup(run: SetupRun):
+    """MonaServer step shared by single- and all-device runs."""
+    config, results = run.config, run.results
+    with run.timed("start_mona_server"):
+        if config.auto_start_monaserver:
+            results["MonaServer"] = start_mona_server(config)
         else:
-            results["MonaServer"] = (
-                None  # Not started by script, status unknown unless user starts it
-            )
+            console.print("[info]Auto-start MonaServer is disabled in config.[/info]")
+            if check_monaserver_process(config.rtmp_server):
+                console.print(
+                    f"[info]{server_label(config.rtmp_server)} is already running (checked manually).[/info]"
+                )
+                results["MonaServer"] = True  # Treat as OK if running
+            else:
+                results["MonaServer"] = (
+                    None  # Not started by script, status unknown unless user starts it
+                )
+
+
+def print_summary(run: SetupRun):
+    from rich.box import ROUNDED
+    from rich.panel import Panel
+    from rich.table import Table
+
+    config, results = run.config, run.results
+    selected_device, adb_version = run.device, run.adb_version
+    conflicting_pid_at_start = run.conflicting_pid_at_start
+    adb_ok = True  # ADB check must succeed to reach here
 
     step_divider("📊", "Summary")
     summary = Table(
@@ -1049,12 +3168,15 @@ if __name__ == "__main__":
         summary.add_row(item, f"[{style}]{txt}[/]", det)
 
     add_s("ADB", adb_ok, f"v{adb_version} @ [dim]{config.adb_path}[/dim]")
-    add_s(
-        "Device",
-        True,  # Device selection must succeed to reach here
-        f"{selected_device['icon']} {selected_device['name']} ({selected_device['connection']})",
-        ok="Selected",
-    )
+    if run.device_runs:
+        add_s("Devices", True, f"{len(run.device_runs)} set up in parallel", ok="All")
+    else:
+        add_s(
+            "Device",
+            True,  # Device selection must succeed to reach here
+            f"{selected_device['icon']} {selected_device['name']} ({selected_device['connection']})",
+            ok="Selected",
+        )
 
     host_port_details = f"Host TCP:{config.rtmp_port}"
     if not results["Port Conflict Resolved"] and conflicting_pid_at_start is not None:
@@ -1075,24 +3197,30 @@ if __name__ == "__main__":
         warn="UNRESOLVED",  # If user chose not to resolve
         na="No Conflict",  # If None (no conflict initially)
     )
+    ports = [r["host_port"] for r in run.device_runs] or [config.rtmp_port]
     add_s(
         "Port Forward",
         results["Port Forwarding"],
-        f"Device:{config.rtmp_port} \u2194 Host:{config.rtmp_port}",
+        f"Device:{config.rtmp_port} \u2194 Host:{', '.join(map(str, ports))}",
     )
+    launch_details = f"[dim]{config.package_name.split('/', 1)[0]}[/dim]"
+    if run.launch and run.launch.describe():
+        launch_details += f" ({run.launch.describe()})"
     add_s(
         "App Launch",
         results["App Launch"],
-        f"[dim]{config.package_name.split('/', 1)[0]}[/dim]",
+        launch_details,
         fail="FAIL/Skip",
     )
-    rtmp_url = f"rtmp://127.0.0.1:{config.rtmp_port}/live"
+    url = rtmp_url(config)
     add_s(
         "RTMP URL",
         results["RTMP URL Copied"],
-        f"[rtmp]{rtmp_url}[/rtmp] (Copied)",
+        f"[rtmp]{url}[/rtmp]" + (" (Copied)" if results["RTMP URL Copied"] else ""),
         ok="Copied",
     )
+    if run.device_runs:
+        url = ", ".join(r["rtmp_url"] for r in run.device_runs)
 
     mona_status_text = "Not Started (auto-start off)"
     if config.auto_start_monaserver:
@@ -1106,40 +3234,77 @@ if __name__ == "__main__":
         mona_status_text = "Already Running"
 
     add_s(
-        "MonaServer",
+        "Built-in Server" if config.rtmp_server == "builtin" else "MonaServer",
         results["MonaServer"],
         mona_status_text,
         ok="OK/Started",
         fail="FAIL",
         na="Unknown/Not Started",  # For None or if auto_start_monaserver is false and not running
     )
+    if run.stream_health and not run.device_runs:
+        health = next(iter(run.stream_health.values()))
+        add_s(
+            "Stream Health", health.ok, health.describe(), ok="Flowing", fail="NO MEDIA"
+        )
+    elif run.stream_health:
+        flowing = sum(st.ok for st in run.stream_health.values())
+        add_s(
+            "Stream Health",
+            flowing == len(run.stream_health),
+            f"{flowing}/{len(run.stream_health)} streams flowing",
+            ok="Flowing",
+            fail="PARTIAL" if flowing else "NO MEDIA",
+        )
+    if run.recordings:
+        started = [r for r in run.recordings if r["pid"]]
+        folder = Path(run.recordings[0]["path"]).parent
+        details = (
+            started[0]["path"]
+            if len(run.recordings) == 1 and started
+            else f"{len(started)}/{len(run.recordings)} streams to {folder}"
+        )
+        add_s(
+            "Recording",
+            len(started) == len(run.recordings),
+            f"[dim]{details}[/dim]",
+            ok="Started",
+        )
     console.print(summary)
+    if run.device_runs:
+        print_device_runs(run.device_runs, run.stream_health)
+    if TRACER.enabled:
+        print_trace_digest()
 
-    final_instr = [
-        f"[success]✓ Setup Complete.[/success] RTMP URL: [rtmp]{rtmp_url}[/rtmp]"
-    ]
+    final_instr = [f"[success]✓ Setup Complete.[/success] RTMP URL: [rtmp]{url}[/rtmp]"]
     if not results["Port Conflict Resolved"] and conflicting_pid_at_start is not None:
         final_instr.append(
-            f"[warning]⚠ Port TCP:{config.rtmp_port} conflict (PID {conflicting_pid_at_start}) may affect MonaServer.[/warning]"
+            f"[warning]⚠ Port TCP:{config.rtmp_port} conflict (PID {conflicting_pid_at_start}) may affect the {server_label(config.rtmp_server)}.[/warning]"
         )
     if not results["App Launch"]:
         final_instr.append(
             f"[warning]⚠ App ({config.package_name.split('/', 1)[0]}) launch issue.[/warning]"
         )
 
+    label = server_label(config.rtmp_server)
     if results["MonaServer"] is True:
         final_instr.append(
-            "[success]✓ MonaServer should be running.[/success]\n[info]MonaServer output may appear in this console window.[/info]"
+            f"[success]✓ {label} should be running.[/success]\n[info]Its output may appear in this console window.[/info]"
         )
     elif results["MonaServer"] is False:
-        final_instr.append("[danger]✗ MonaServer failed to start.[/danger]")
+        final_instr.append(f"[danger]✗ {label} failed to start.[/danger]")
     elif results["MonaServer"] is None and config.auto_start_monaserver:
         final_instr.append(
-            "[warning]⚠ MonaServer start was attempted, status unconfirmed. Check console output and port.[/warning]"
+            f"[warning]⚠ {label} start was attempted, status unconfirmed. Check console output and port.[/warning]"
         )
     elif results["MonaServer"] is None and not config.auto_start_monaserver:
         final_instr.append(
-            "[info]MonaServer auto-start is off. Ensure it's running if needed.[/info]"
+            f"[info]{label} auto-start is off. Ensure it's running if needed.[/info]"
+        )
+
+    extra = {r["host_port"] for r in run.device_runs} - {int(config.rtmp_port)}
+    if extra:
+        final_instr.append(
+            f"[info]Host ports {', '.join(map(str, sorted(extra)))} have a {server_label(config.rtmp_server)} each ({RTMP_LISTENERS_FILE.name}).[/info]"
         )
 
     if config.obs_path and config.obs_path.exists():
@@ -1157,6 +3322,266 @@ if __name__ == "__main__":
         )
     )
 
+
+def print_device_runs(device_runs: List[Dict], stream_health: Dict[str, StreamStats]):
+    from rich.box import ROUNDED
+    from rich.table import Table
+
+    table = Table(box=ROUNDED, border_style="cyan", padding=(0, 1), expand=False)
+    for col, justify in (
+        ("#", "right"),
+        ("Device", "left"),
+        ("Host Port", "right"),
+        ("Fwd", "center"),
+        ("App", "center"),
+        ("Launch", "right"),
+        ("Time", "right"),
+        ("RTMP URL", "left"),
+    ):
+        table.add_column(col, justify=justify)
+    if stream_health:
+        table.add_column("Stream")
+    mark = {True: "[success]✓[/]", False: "[danger]✗[/]"}
+    for i, r in enumerate(device_runs, 1):
+        row = [
+            str(i),
+            f"{r['icon']} {r['name']}",
+            str(r["host_port"]),
+            mark[r["port_forwarding"]],
+            mark[r["app_launch"]],
+            launch_cell(r["launch"]),
+            f"{r['seconds']:.2f}s",
+            f"[rtmp]{r['rtmp_url']}[/rtmp]",
+        ]
+        if health := stream_health.get(r["rtmp_url"]):
+            style = "success" if health.ok else "danger"
+            row.append(f"[{style}]{health.describe()}[/]")
+        table.add_row(*row)
+    console.print(table)
+
+
+def launch_cell(launch: Dict[str, Any]) -> str:
+    if launch["skipped"]:
+        return "[dim]running[/dim]"
+    if launch["total_time_ms"] is None:
+        return "-"
+    return f"{launch['total_time_ms']} ms"
+
+
+def print_trace_digest(count: int = 8):
+    """The slowest traced spans, so a slow run shows where its time went."""
+    from rich.box import ROUNDED
+    from rich.table import Table
+
+    table = Table(
+        title="Slowest Spans",
+        box=ROUNDED,
+        border_style="magenta",
+        padding=(0, 1),
+        expand=False,
+    )
+    table.add_column("Span")
+    table.add_column("Time", justify="right")
+    table.add_column("At", justify="right")
+    table.add_column("Details", style="dim")
+    for sp in TRACER.slowest(count):
+        details = " ".join(f"{k}={v}" for k, v in sp["args"].items() if v is not None)
+        table.add_row(
+            f"{sp['name']} [dim]({sp['cat']})[/dim]",
+            f"{sp['seconds']:.3f}s",
+            f"+{sp['start']:.2f}s",
+            details,
+        )
+    console.print(table)
+
+
+def print_headless_report(
+    run: SetupRun,
+    exit_code: int,
+    error: Optional[str],
+    total: float,
+    compact: bool = False,
+):
+    """Writes the machine-readable result of a --headless run to stdout.
+
+    `compact` puts it on one line, after the JSON-lines events of --watch.
+    """
+    config = run.config
+    report: Dict[str, Any] = {
+        "ok": exit_code == EXIT_OK,
+        "exit_code": exit_code,
+        "error": error,
+        "results": run.results,
+        "adb_version": run.adb_version,
+        "device": run.device,
+        "launch": run.launch.as_dict() if run.launch else None,
+        "devices": run.device_runs,
+        "rtmp_url": rtmp_url(config) if config else None,
+        "stream_health": {u: st.as_dict() for u, st in run.stream_health.items()},
+        "recordings": run.recordings,
+        "timings": dict(run.timings, total=round(total, 4)),
+        "critical_path": run.critical_path,
+        "latency": run.latency,
+        "slowest_spans": TRACER.slowest() if TRACER.enabled else None,
+    }
+    sys.stdout.write(json.dumps(report, indent=None if compact else 2) + "\n")
+    sys.stdout.flush()
+
+
+def _port_arg(value: str) -> int:
+    port = int(value)
+    if not 0 < port <= 65535:
+        raise argparse.ArgumentTypeError(f"invalid port: {value}")
+    return port
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="RTMP Stream Setup Assistant",
+        epilog="Exit codes: 0 ok, 1 config/unexpected error, 2 usage, 3 ADB, "
+        "4 no device, 5 port forwarding, 6 app launch, 7 MonaServer.",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="never prompt; print results and per-step timings as JSON on stdout",
+    )
+    parser.add_argument("--serial", help="ADB serial of the device to set up")
+    parser.add_argument(
+        "--probe",
+        type=float,
+        metavar="SECONDS",
+        help="measure the stream for SECONDS after setup (overrides HealthProbeSeconds)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and re-apply setup whenever a device (re)connects",
+    )
+    parser.add_argument(
+        "--all-devices",
+        action="store_true",
+        help="set up every connected device in parallel, one host port each",
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="record each device's stream to FLV in RecordDir (sets Record)",
+    )
+    parser.add_argument(
+        "--stop-recording",
+        action="store_true",
+        help="stop the recorders earlier --record runs left running, then exit",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="FILE",
+        help="write a Chrome/Perfetto trace of every step, adb command and process to FILE",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=_port_arg,
+        metavar="PORT",
+        help="serve Prometheus metrics on 127.0.0.1:PORT/metrics (overrides MetricsPort)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        metavar="SECONDS",
+        help="skip device setup; measure publish-to-play latency through the RTMP server for SECONDS",
+    )
+    parser.add_argument(
+        "--latency-window",
+        type=float,
+        metavar="SECONDS",
+        help="report latency percentiles per SECONDS (default: a tenth of --latency)",
+    )
+    parser.add_argument(
+        "--latency-kbps",
+        type=float,
+        default=4000,
+        metavar="KBPS",
+        help="bitrate of the synthetic stream used by --latency (default 4000)",
+    )
+    parser.add_argument("--port", type=_port_arg, help="RTMP port (overrides RtmpPort)")
+    parser.add_argument(
+        "--package", help="Package/Activity to launch (overrides PackageName)"
+    )
+    return parser.parse_args(argv)
+
+
+def write_trace(path: Optional[Path]):
+    if not path:
+        return
+    try:
+        TRACER.write(path)
+        console.print(f"[info]Trace written to {path} (open in ui.perfetto.dev)[/info]")
+    except OSError as e:
+        console.print(f"[warning]Could not write trace {path}: {e}[/warning]")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    global HEADLESS
+    args = parse_args(argv)
+    HEADLESS = console.plain = args.headless
+    run = SetupRun()
+    if args.stop_recording:
+        stopped = stop_recorders()
+        if HEADLESS:
+            print(json.dumps({"ok": True, "exit_code": EXIT_OK, "stopped": stopped}))
+        return EXIT_OK
+    if args.trace:
+        TRACER.start()
+
+    if HEADLESS:
+        start = time.perf_counter()
+        try:
+            run_setup(run, args)
+            exit_code, error = run.exit_code(), None
+        except SetupError as e:
+            exit_code, error = e.exit_code, str(e)
+        except Exception as e:  # pylint: disable=broad-except
+            exit_code, error = EXIT_ERROR, f"{type(e).__name__}: {e}"
+        write_trace(args.trace)
+        print_headless_report(
+            run, exit_code, error, time.perf_counter() - start, compact=args.watch
+        )
+        return exit_code
+
+    from rich.box import ROUNDED
+    from rich.panel import Panel
+
+    console.print(LOGO)  # Use the original multi-line logo
+    console.print(
+        Panel(
+            "[white]RTMP Stream Setup Assistant[/]",
+            box=ROUNDED,
+            border_style="blue",
+            padding=(0, 1),
+            expand=False,
+        )
+    )
+    try:
+        run_setup(run, args)
+    except SetupError as e:
+        console.print(
+            f"\n[danger]ERROR: {e}[/danger]\n[italic]Press Enter to exit...[/italic]"
+        )
+        try:
+            input()
+        except (KeyboardInterrupt, EOFError):
+            pass
+        return e.exit_code
+    finally:
+        write_trace(args.trace)
+    if args.watch:
+        return EXIT_OK
+    if run.latency is not None:
+        print_latency_report(run)
+    else:
+        print_summary(run)
+
     console.print("\n[italic]Press Enter to exit...[/italic]")
     try:
         input()
@@ -1165,4 +3590,9 @@ if __name__ == "__main__":
     finally:
         if _tk_root and _tk_root.winfo_exists():
             _tk_root.destroy()
-    sys.exit(0)
+    return EXIT_OK
+
+
+# --- Main Execution ---
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Runs named steps on a thread pool as soon as the steps they need are done.
+
+setupRTMP6.py describes one setup pass as a small dependency graph:
+
+    graph = TaskGraph()
+    graph.add("adb", check_adb)
+    graph.add("devices", scan_devices, after=["adb"])
+    graph.add("server", start_server)  # needs no device, overlaps the scan
+    graph.run()
+
+so the wall time approaches the longest dependency chain (critical_path())
+rather than the sum of every step. A step may only depend on steps added
+before it, which keeps the graph acyclic. Steps marked `exclusive`, such as
+ones that prompt the user, wait for the steps in flight and then run alone
+on the thread that called run(), where Ctrl+C interrupts their prompts.
+The first step to raise stops new steps from starting; the running ones
+finish, and the exception (SystemExit included) is re-raised by run().
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class Task:
+    name: str
+    fn: Callable[[], Any]
+    after: Tuple[str, ...] = ()
+    exclusive: bool = False
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+
+class TaskGraph:
+    """Steps and their dependencies; ties go to the step added first."""
+
+    def __init__(self, max_workers: int = 4):
+        self.tasks: Dict[str, Task] = {}
+        self.max_workers = max_workers
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        after: Iterable[str] = (),
+        exclusive: bool = False,
+    ) -> Task:
+        after = tuple(after)
+        if name in self.tasks:
+            raise ValueError(f"duplicate step: {name}")
+        unknown = [a for a in after if a not in self.tasks]
+        if unknown:
+            raise ValueError(f"{name} depends on unknown step(s): {unknown}")
+        task = self.tasks[name] = Task(name, fn, after, exclusive)
+        return task
+
+    @staticmethod
+    def _call(task: Task):
+        task.start = time.perf_counter()
+        try:
+            return task.fn()
+        finally:
+            task.end = time.perf_counter()
+
+    def run(self):
+        """Runs every step, blocking until all are done or one has failed."""
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        pending = dict(self.tasks)
+        done = set()
+        running: Dict[Any, Task] = {}
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(self.max_workers, thread_name_prefix="step") as pool:
+            while True:
+                inline = None
+                if error is None:
+                    for task in list(pending.values()):
+                        if not all(a in done for a in task.after):
+                            continue
+                        if task.exclusive:
+                            if not running:  # Drained: run it here, alone
+                                inline = pending.pop(task.name)
+                            break  # Later steps wait behind it
+                        del pending[task.name]
+                        running[pool.submit(self._call, task)] = task
+                if inline is not None:
+                    try:
+                        self._call(inline)
+                    except BaseException as exc:  # KeyboardInterrupt included
+                        error = exc
+                    else:
+                        done.add(inline.name)
+                    continue
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    exc = future.exception()
+                    if exc is None:
+                        done.add(task.name)
+                    elif error is None:
+                        error = exc
+        if error is not None:
+            raise error
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """The chain of finished steps that ended last, and its busy time.
+
+        Walks back from the last step to finish through whichever of its
+        dependencies finished last; the sum of their durations is what the
+        whole run cannot beat, however much the rest overlaps.
+        """
+        finished = [t for t in self.tasks.values() if t.end is not None]
+        if not finished:
+            return [], 0.0
+        task = max(finished, key=lambda t: t.end)
+        path = [task]
+        while True:
+            deps = [self.tasks[a] for a in task.after if self.tasks[a].end is not None]
+            if not deps:
+                break
+            task = max(deps, key=lambda t: t.end)
+            path.append(task)
+        path.reverse()
+        return [t.name for t in path], sum(t.seconds for t in path)
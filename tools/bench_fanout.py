@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Fan-out benchmark for the built-in RTMP server's relay (rtmp_server.py).
+
+Drives one StreamRelay in-process with a 6 Mbps synthetic stream and 1 to 32
+subscribers on stand-in transports, and reports per relayed message:
+
+  allocs, KiB   memory blocks and bytes allocated for delivery, counted with
+                tracemalloc while the transports keep what they are given
+                (as a socket buffer would)
+  CPU           process time to relay one message to every subscriber
+  held MiB      memory pinned after 20 s with every subscriber stalled
+
+next to a naive relay that encodes a copy of each message per subscriber.
+Exits 1 unless the relay's allocations per message stay flat as subscribers
+are added and its stalled backlog stays bounded:
+
+    python tools/bench_fanout.py --consumers 1 2 4 8 16 32
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import rtmp  # noqa: E402  pylint: disable=wrong-import-position
+import rtmp_server  # noqa: E402  pylint: disable=wrong-import-position
+
+
+class SinkTransport:
+    """Accepts every write at once; optionally keeps what it was given."""
+
+    def __init__(self, keep: bool = False):
+        self.keep = keep
+        self.kept = []
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        if self.keep:
+            self.kept.append(data)
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        pass
+
+
+class StalledTransport(SinkTransport):
+    """A subscriber that stopped reading: buffers a copy, like asyncio does."""
+
+    def __init__(self):
+        super().__init__()
+        self.outbox = None
+
+    def write(self, data):
+        self.bytes += len(data)
+        self.kept.append(bytes(data))
+        if self.outbox is not None:
+            self.outbox.pause()
+
+
+class Subscriber:
+    """What StreamRelay needs from a player session."""
+
+    play_stream_id = rtmp_server.RELAY_STREAM_ID
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.outbox = rtmp_server.Outbox(transport)
+        self.dropped = False
+
+    def write(self, data: bytes):
+        self.outbox.push(rtmp_server.Packet(data))
+
+    def drop_slow(self):
+        self.dropped = True
+
+
+class CopyRelay:
+    """Baseline: a relay that encodes one copy per subscriber."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def on_media(self, msg: rtmp.Message):
+        csid = rtmp.CSID_VIDEO if msg.type_id == rtmp.VIDEO else rtmp.CSID_AUDIO
+        for sub in self.subscribers:
+            sub.transport.write(
+                rtmp.encode_message(
+                    csid,
+                    msg.type_id,
+                    sub.play_stream_id,
+                    msg.timestamp,
+                    msg.payload,
+                    rtmp_server.SERVER_CHUNK_SIZE,
+                )
+            )
+
+
+def stream(seconds: float, bitrate_kbps: float) -> list:
+    messages = []
+    for type_id, ts, payload in rtmp.synthetic_media(bitrate_kbps):
+        if ts >= seconds * 1000:
+            return messages
+        messages.append(rtmp.Message(type_id, 1, ts, payload, len(payload)))
+    return messages
+
+
+def make_relay(kind: str, transports: list):
+    if kind == "fanout":
+        relay = rtmp_server.StreamRelay("live/bench")
+        for t in transports:
+            sub = Subscriber(t)
+            if isinstance(t, StalledTransport):
+                t.outbox = sub.outbox
+            relay.join(sub)
+    else:
+        relay = CopyRelay()
+        relay.subscribers = [Subscriber(t) for t in transports]
+    return relay
+
+
+def measure_allocs(kind: str, consumers: int, messages: list) -> tuple:
+    warmup, sample = messages[:90], messages[90:]  # First GOP fills the caches
+    relay = make_relay(kind, [SinkTransport(keep=True) for _ in range(consumers)])
+    for msg in warmup:
+        relay.on_media(msg)
+    tracemalloc.start()
+    before_blocks = len(tracemalloc.take_snapshot().traces)
+    before_bytes = tracemalloc.get_traced_memory()[0]
+    for msg in sample:
+        relay.on_media(msg)
+    after_bytes = tracemalloc.get_traced_memory()[0]
+    after_blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+    return (
+        (after_blocks - before_blocks) / len(sample),
+        (after_bytes - before_bytes) / len(sample) / 1024,
+    )
+
+
+def measure_cpu(kind: str, consumers: int, messages: list, runs: int = 3) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        relay = make_relay(kind, [SinkTransport() for _ in range(consumers)])
+        start = time.process_time()
+        for msg in messages:
+            relay.on_media(msg)
+        best = min(best, time.process_time() - start)
+    return best / len(messages) * 1e6
+
+
+def measure_stalled(kind: str, consumers: int, messages: list) -> float:
+    transports = [StalledTransport() for _ in range(consumers)]
+    relay = make_relay(kind, transports)
+    tracemalloc.start()
+    for msg in messages:
+        relay.on_media(msg)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held / 2**20
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--consumers", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument("--bitrate-kbps", type=float, default=6000)
+    parser.add_argument("--seconds", type=float, default=20.0, help="of stream")
+    args = parser.parse_args()
+
+    messages = stream(args.seconds, args.bitrate_kbps)
+    print(
+        f"{len(messages)} messages ({args.seconds:g}s at "
+        f"{args.bitrate_kbps / 1000:g} Mbps), per relayed message:"
+    )
+    print(
+        f"{'subs':>4}  {'allocs':>7} {'KiB':>7} {'CPU us':>7} {'held MiB':>8}"
+        f"  | naive {'allocs':>7} {'KiB':>7} {'CPU us':>7} {'held MiB':>8}"
+    )
+    results = {}
+    for n in args.consumers:
+        row = []
+        for kind in ("fanout", "copy"):
+            allocs, kib = measure_allocs(kind, n, messages)
+            cpu = measure_cpu(kind, n, messages)
+            held = measure_stalled(kind, n, messages)
+            row.append((allocs, kib, cpu, held))
+        results[n] = row
+        (fa, fk, fc, fh), (ca, ck, cc, ch) = row
+        print(
+            f"{n:>4}  {fa:7.1f} {fk:7.1f} {fc:7.1f} {fh:8.1f}"
+            f"  |       {ca:7.1f} {ck:7.1f} {cc:7.1f} {ch:8.1f}"
+        )
+
+    lo, hi = min(results), max(results)
+    failures = []
+    if results[hi][0][0] > results[lo][0][0] + 1:
+        failures.append(f"allocations per message grow from {lo} to {hi} consumers")
+    if results[hi][0][1] > 1.5 * results[lo][0][1] + 1:
+        failures.append(f"bytes allocated per message grow from {lo} to {hi} consumers")
+    limit_mib = 2 * rtmp_server.MAX_QUEUE_BYTES / 2**20 + 1
+    if results[hi][0][3] > limit_mib:
+        failures.append(f"stalled subscribers pin more than {limit_mib:g} MiB")
+    for f in failures:
+        print(f"FAIL: {f}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Micro-benchmark: targeted port-owner lookup vs. psutil's full socket walk.
+
+Opens a few thousand loopback sockets to make the socket table busy, then
+times setupRTMP6.find_process_using_port (bind probe + /proc lookup) against
+the psutil.net_connections walk it replaced, for a busy and a free port.
+
+    python tools/bench_port_lookup.py --sockets 4000 --repeat 20
+"""
+
+import argparse
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import setupRTMP6  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def raise_fd_limit(wanted: int):
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < wanted:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def open_socket_load(count: int):
+    """Returns loopback connection pairs totalling about `count` sockets."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1024)
+    held = [listener]
+    for _ in range(count // 2):
+        try:
+            client = socket.create_connection(listener.getsockname())
+            server, _ = listener.accept()
+        except OSError:
+            break  # fd limit reached
+        held += [client, server]
+    return held
+
+
+def time_ms(fn, port: int, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(port)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sockets", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    raise_fd_limit(args.sockets + 256)
+    held = open_socket_load(args.sockets)
+    target = socket.socket()
+    target.bind(("127.0.0.1", 0))
+    target.listen()
+    busy_port = target.getsockname()[1]
+    free_port = busy_port + 1 if setupRTMP6.port_is_free(busy_port + 1) else 0
+
+    print(
+        f"{len(held)} background sockets, busy port {busy_port}, free port {free_port}"
+    )
+    rows = [
+        ("busy port, targeted", setupRTMP6.find_process_using_port, busy_port),
+        ("busy port, psutil walk", setupRTMP6._scan_net_connections, busy_port),
+    ]
+    if free_port:
+        rows += [
+            ("free port, targeted", setupRTMP6.find_process_using_port, free_port),
+            ("free port, psutil walk", setupRTMP6._scan_net_connections, free_port),
+        ]
+    for label, fn, port in rows:
+        print(f"{label:<24} {time_ms(fn, port, args.repeat):9.3f} ms (median)")
+
+    for s in held + [target]:
+        s.close()
+
+
+if __name__ == "__main__":
+    main()
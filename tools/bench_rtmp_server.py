@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Load benchmark for the built-in RTMP server (rtmp_server.py).
+
+Starts the server in its own process, then drives it from one asyncio loop
+with N synthetic publishers (real-time paced, H.264/AAC-shaped tags) and M
+subscribers per stream, through rtmp_load.py. Reports achieved
+publish/relay throughput, latency and the server's CPU use measured with
+psutil, and exits 1 unless the server keeps up on a single core:
+
+    python tools/bench_rtmp_server.py --publishers 20 --bitrate-kbps 6000
+"""
+
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import psutil
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import rtmp  # noqa: E402  pylint: disable=wrong-import-position
+import rtmp_load  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                rtmp.client_handshake(s)
+                return True
+        except (OSError, rtmp.RtmpError):
+            time.sleep(0.05)
+    return False
+
+
+def run_load(port: int, args, server: psutil.Process) -> dict:
+    cpu = {}
+
+    def sample(phase: str):
+        times = server.cpu_times()
+        cpu[phase] = (times.user + times.system, time.perf_counter())
+
+    stats = asyncio.run(
+        rtmp_load.run_load(
+            "127.0.0.1",
+            port,
+            publishers=args.publishers,
+            players=args.subscribers,
+            bitrate_kbps=args.bitrate_kbps,
+            duration=args.duration,
+            warmup=args.warmup,
+            prefix="bench",
+            on_phase=sample,
+        )
+    )
+    (cpu0, t0), (cpu1, t1) = cpu["measure"], cpu["done"]
+    return {
+        "stats": stats,
+        "cpu_percent": 100 * (cpu1 - cpu0) / (t1 - t0),
+        "rss_mb": server.memory_info().rss / 2**20,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--publishers", type=int, default=20)
+    parser.add_argument("--subscribers", type=int, default=1, help="per stream")
+    parser.add_argument("--bitrate-kbps", type=float, default=6000)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds")
+    parser.add_argument(
+        "--max-cpu", type=float, default=90.0, help="fail above this %% of one core"
+    )
+    args = parser.parse_args()
+
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, str(REPO_DIR / "rtmp_server.py"), "--host", "127.0.0.1"]
+        + ["--port", str(port), "--quiet"],
+        cwd=REPO_DIR,
+    )
+    try:
+        if not wait_ready(port):
+            print("FAIL: server did not answer the RTMP handshake")
+            return 1
+        result = run_load(port, args, psutil.Process(proc.pid))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    c = result["stats"]
+    target = args.publishers * args.bitrate_kbps / 1000
+    published = c.publish_mbps()
+    relayed = c.relay_mbps()
+    expected_relay = published * args.subscribers
+    print(
+        f"{args.publishers} publishers x {args.bitrate_kbps / 1000:g} Mbps, "
+        f"{args.subscribers} subscriber(s) each, {args.duration:g}s measured"
+    )
+    print(f"  published   {published:8.1f} Mbps (target {target:.1f})")
+    print(f"  relayed     {relayed:8.1f} Mbps (expected {expected_relay:.1f})")
+    print(f"  server CPU  {result['cpu_percent']:8.1f} % of one core")
+    print(f"  server RSS  {result['rss_mb']:8.1f} MiB")
+    print(
+        f"  latency p95 {c.latency_ms(0.95) or 0:8.1f} ms, frames lost {c.lost_frames}"
+    )
+    print(f"  max publisher lag {c.max_lag * 1000:.1f} ms, errors {c.errors}")
+
+    failures = []
+    if c.errors:
+        failures.append(f"{c.errors} connection error(s)")
+    if published < 0.95 * target:
+        failures.append("publishers could not reach the target bitrate")
+    if args.subscribers and relayed < 0.95 * expected_relay:
+        failures.append("subscribers received less than was published")
+    if result["cpu_percent"] > args.max_cpu:
+        failures.append(f"server CPU above {args.max_cpu:g}% of one core")
+    for f in failures:
+        print(f"FAIL: {f}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of the setupRTMP6.py pipeline against simulated devices.
+
+For each device count, starts tools/fake_adb_server.py with that many
+devices and puts a temporary `adb` (wrapping tools/fake_adb.py) in a
+throwaway config.ini. Then it runs every setup phase, and the whole
+`--headless --all-devices` flow, in-process and repeatedly, once with
+NativeAdb on and once with it off (every adb command spawned). Reports
+p50/p95 wall time, processes spawned per run and failed runs, and can
+write the results as JSON to compare against a later version. The fake
+server's latency/fault options are passed through, so slow, flaky or
+hanging devices can be benchmarked too:
+
+    python tools/bench_setup.py --devices 1 10 50 --out before.json
+    python tools/bench_setup.py --out after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(REPO_DIR / "tools"))
+
+import setupRTMP6 as setup  # noqa: E402  pylint: disable=wrong-import-position
+from fake_adb_server import (  # noqa: E402  pylint: disable=wrong-import-position
+    add_fault_arguments,
+)
+
+MODES = ("native", "spawn")  # NativeAdb = true / false
+SERVER_READY_TIMEOUT = 10.0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; stable for the small samples used here."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class SpawnCounter:
+    """Counts subprocess.Popen calls from any thread while active."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._original = subprocess.Popen.__init__
+
+    def __enter__(self) -> "SpawnCounter":
+        counter, original = self, self._original
+
+        def counting_init(popen, *args, **kwargs):
+            with counter._lock:
+                counter.count += 1
+            original(popen, *args, **kwargs)
+
+        subprocess.Popen.__init__ = counting_init
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.Popen.__init__ = self._original
+
+    def take(self) -> int:
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+
+def write_fake_adb(directory: Path) -> Path:
+    """An `adb` launcher for tools/fake_adb.py that setupRTMP6.py accepts."""
+    script = REPO_DIR / "tools" / "fake_adb.py"
+    if platform.system() == "Windows":
+        path = directory / "adb.bat"
+        path.write_text(f'@"{sys.executable}" "{script}" %*\r\n', encoding="utf-8")
+    else:
+        path = directory / "adb"
+        path.write_text(
+            f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n', encoding="utf-8"
+        )
+        path.chmod(0o755)
+    return path
+
+
+def start_fake_server(devices: int, port: int, args) -> subprocess.Popen:
+    argv = [
+        sys.executable,
+        str(REPO_DIR / "tools" / "fake_adb_server.py"),
+        "--port",
+        str(port),
+        "--devices",
+        str(devices),
+        "--latency",
+        str(args.latency),
+        "--hang-seconds",
+        str(args.hang_seconds),
+    ]
+    for flag, values in (
+        ("--command-latency", args.command_latency),
+        ("--fail", args.fail),
+        ("--hang", args.hang),
+    ):
+        if values:
+            argv += [flag, ",".join(f"{k}={v}" for k, v in values.items())]
+    if args.seed is not None:
+        argv += ["--seed", str(args.seed)]
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()  # "Fake adb server on ..." once it listens
+    return proc
+
+
+def write_config(path: Path, adb: Path, rtmp_port: int, native: bool):
+    path.write_text(
+        "[Paths]\n"
+        f"adbpath = {adb}\n"
+        "monaserverpath = \nobspath = \n\n"
+        "[Device]\n"
+        "packagename = com.example.app/.MainActivity\n\n"
+        "[Network]\n"
+        f"rtmpport = {rtmp_port}\n"
+        f"rtmpportrange = {rtmp_port}-{rtmp_port + 99}\n\n"
+        "[Options]\n"
+        "autostartmonaserver = true\n"
+        "rtmpserver = builtin\n"
+        "forcekillconflictingportprocess = false\n"
+        f"nativeadb = {str(native).lower()}\n"
+        f"monareadytimeout = {SERVER_READY_TIMEOUT}\n",
+        encoding="utf-8",
+    )
+
+
+def stop_rtmp_server(port: int):
+    """Kills the RTMP server a phase started and waits for its port."""
+    state = setup._read_mona_state()  # pylint: disable=protected-access
+    if state:
+        try:
+            os.kill(state["pid"], 9)
+        except OSError:
+            pass
+        setup._clear_mona_state()  # pylint: disable=protected-access
+        setup.wait_for_port_release(port, 5.0)
+
+
+class Bench:
+    """Runs the phases for one (mode, device count) against a fake server."""
+
+    def __init__(self, workdir: Path, adb: Path, adb_port: int, native: bool):
+        self.rtmp_port = free_port()
+        self.native = native
+        setup.CONFIG_FILE = workdir / "config.ini"
+        setup.DEVICE_CACHE_FILE = workdir / "device_cache.json"
+        setup.MONA_STATE_FILE = workdir / "monaserver_state.json"
+        setup.RTMP_LISTENERS_FILE = workdir / "rtmp_listeners.json"
+        setup.MONA_INSTANCES_DIR = workdir / "mona_instances"
+        setup.TOOLCHAIN_CACHE_FILE = workdir / "toolchain_cache.json"
+        setup._adb_client = None  # pylint: disable=protected-access
+        setup._toolchain_cache = None  # pylint: disable=protected-access
+        os.environ["ANDROID_ADB_SERVER_PORT"] = str(adb_port)
+        write_config(setup.CONFIG_FILE, adb, self.rtmp_port, native)
+        self.config = setup.load_config()
+        self.config.devices = setup.find_connected_devices(self.config)
+        self.device = next(
+            (d for d in self.config.devices if d["status"] == "device"), None
+        )
+
+    def phases(self) -> Dict[str, Callable[[], bool]]:
+        """Phase name -> callable returning whether it succeeded."""
+        c = self.config
+        targets = [d for d in c.devices if d["status"] == "device"]
+        args = setup.parse_args(["--headless", "--all-devices"])
+
+        def full_flow() -> bool:
+            run = setup.SetupRun()
+            try:
+                setup.run_setup(run, args)
+            except setup.SetupError:
+                return False
+            return run.exit_code() == setup.EXIT_OK
+
+        def port_check() -> bool:
+            return setup.handle_port_conflict(c.rtmp_port, c)[0]
+
+        def setup_all() -> bool:
+            runs = setup.setup_all_devices(c, targets)
+            return all(r["port_forwarding"] and r["app_launch"] for r in runs)
+
+        return {
+            "load_config": lambda: setup.load_config() is not None,
+            "handle_port_conflict": port_check,
+            "check_adb_version": lambda: setup.check_adb_version(c)[0],
+            "find_connected_devices": lambda: bool(setup.find_connected_devices(c)),
+            "setup_port_forwarding": lambda: setup.setup_port_forwarding(
+                c, self.device
+            ),
+            "launch_app": lambda: setup.launch_app(c, self.device).ok,
+            "setup_all_devices": setup_all,
+            "start_mona_server": lambda: setup.start_mona_server(c) is True,
+            "full_flow": full_flow,
+        }
+
+    def teardown(self):
+        """Undoes a run outside the timed section: stops RtmpPort's server.
+
+        The other devices' listeners are kept, as a re-run would find them;
+        close() stops them once this bench's phases are done.
+        """
+        stop_rtmp_server(self.rtmp_port)
+
+    def close(self):
+        setup.stop_rtmp_listeners()
+
+
+def measure(
+    fn: Callable[[], bool],
+    runs: int,
+    spawns: SpawnCounter,
+    teardown: Callable[[], None],
+) -> Dict:
+    times, counts, failures = [], [], 0
+    for _ in range(runs):
+        spawns.take()
+        start = time.perf_counter()
+        try:
+            ok = fn()
+        except Exception:  # pylint: disable=broad-except
+            ok = False
+        times.append(time.perf_counter() - start)
+        counts.append(spawns.take())
+        failures += not ok
+        teardown()
+    return {
+        "runs": runs,
+        "p50_ms": round(percentile(times, 50) * 1000, 3),
+        "p95_ms": round(percentile(times, 95) * 1000, 3),
+        "spawns": round(sum(counts) / runs, 2),
+        "failures": failures,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=False,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def result_key(r: Dict) -> tuple:
+    return r["mode"], r["devices"], r["phase"]
+
+
+def compare(old: Dict, new: Dict, threshold: float, floor_ms: float) -> List[str]:
+    """Prints p50/p95/spawn changes; returns the p95 regressions."""
+    before = {result_key(r): r for r in old["results"]}
+    print(f"\nCompared with {old['meta'].get('revision') or 'previous run'}:")
+    print(
+        f"{'mode':<6} {'devs':>4} {'phase':<22} {'p50 ms':>17} "
+        f"{'p95 ms':>17} {'spawns':>13}"
+    )
+    regressions = []
+    for r in new["results"]:
+        o = before.get(result_key(r))
+        if o is None:
+            continue
+        change = (r["p95_ms"] - o["p95_ms"]) / o["p95_ms"] * 100 if o["p95_ms"] else 0
+        print(
+            f"{r['mode']:<6} {r['devices']:>4} {r['phase']:<22} "
+            f"{o['p50_ms']:8.1f}>{r['p50_ms']:8.1f} "
+            f"{o['p95_ms']:8.1f}>{r['p95_ms']:8.1f} "
+            f"{o['spawns']:6.1f}>{r['spawns']:6.1f}"
+        )
+        if change > threshold and r["p95_ms"] - o["p95_ms"] > floor_ms:
+            regressions.append(
+                f"{r['mode']} {r['devices']} devices {r['phase']}: "
+                f"p95 {o['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms (+{change:.0f}%)"
+            )
+        if r["spawns"] > o["spawns"]:
+            regressions.append(
+                f"{r['mode']} {r['devices']} devices {r['phase']}: "
+                f"spawns {o['spawns']:g} -> {r['spawns']:g}"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--runs", type=int, default=10, help="per phase")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--phases", nargs="+", help="only these (default: all)")
+    parser.add_argument("--out", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON from an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=25.0,
+        help="with --compare, fail when a p95 grows by more than this %%",
+    )
+    parser.add_argument(
+        "--floor-ms",
+        type=float,
+        default=5.0,
+        help="with --compare, ignore p95 growth smaller than this",
+    )
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    setup.HEADLESS = setup.console.plain = True
+    results = []
+    print(
+        f"{'mode':<6} {'devs':>4} {'phase':<22} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'spawns':>7} {'failed':>6}"
+    )
+    with tempfile.TemporaryDirectory(
+        prefix="bench_setup_"
+    ) as tmp, SpawnCounter() as spawns:
+        workdir = Path(tmp)
+        adb = write_fake_adb(workdir)
+        for count in args.devices:
+            adb_port = free_port()
+            server = start_fake_server(count, adb_port, args)
+            try:
+                for mode in args.modes:
+                    with contextlib.redirect_stderr(io.StringIO()):
+                        bench = Bench(workdir, adb, adb_port, mode == "native")
+                    try:
+                        for phase, fn in bench.phases().items():
+                            if args.phases and phase not in args.phases:
+                                continue
+                            with contextlib.redirect_stderr(io.StringIO()):
+                                r = measure(fn, args.runs, spawns, bench.teardown)
+                            r.update(mode=mode, devices=count, phase=phase)
+                            results.append(r)
+                            print(
+                                f"{mode:<6} {count:>4} {phase:<22} {r['p50_ms']:9.1f} "
+                                f"{r['p95_ms']:9.1f} {r['spawns']:7.1f} {r['failures']:6}",
+                                flush=True,
+                            )
+                    finally:
+                        bench.close()
+            finally:
+                server.terminate()
+                server.wait()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "latency": args.latency,
+            "command_latency": args.command_latency,
+            "fail": args.fail,
+            "hang": args.hang,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=1) + "\n", encoding="utf-8")
+        print(f"Results written to {args.out}")
+    if args.compare:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(old, report, args.threshold, args.floor_ms)
+        for r in regressions:
+            print(f"FAIL: {r}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Import-time budget check for setupRTMP6.py.
+
+Imports the script in fresh interpreters with `-X importtime` (bytecode cache
+warmed first, as on a normal install) and fails with exit code 1 when the
+median cumulative import time exceeds the budget, or when a module that is
+meant to load lazily (tkinter, rich, concurrent.futures) is imported eagerly.
+
+    python tools/check_import_time.py --budget-ms 60 --runs 7
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+MODULE = "setupRTMP6"
+LAZY_MODULES = ("tkinter", "rich", "concurrent.futures")
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def run_importtime(env: dict) -> list:
+    """Returns [(cumulative_us, self_us, depth, module)] for one cold import."""
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in res.stderr.splitlines():
+        if m := LINE_RE.match(line):
+            rows.append(
+                (int(m.group(2)), int(m.group(1)), len(m.group(3)) // 2, m.group(4))
+            )
+    return rows
+
+
+def eager_lazy_modules(env: dict) -> list:
+    probe = (
+        f"import sys, {MODULE}\n"
+        f"print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    res = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return res.stdout.split()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=60.0)
+    parser.add_argument("--runs", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=cache_dir)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        run_importtime(env)  # Warm the bytecode cache
+
+        samples = [run_importtime(env) for _ in range(args.runs)]
+        totals = [
+            next(cum for cum, _, depth, mod in rows if mod == MODULE and depth == 0)
+            for rows in samples
+        ]
+        median_ms = statistics.median(totals) / 1000
+        eager = eager_lazy_modules(env)
+
+    print(
+        f"{MODULE} import: {median_ms:.1f} ms median of {args.runs} (budget {args.budget_ms:g} ms)"
+    )
+    failed = False
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print("FAIL: over budget. Slowest direct imports:")
+        direct = [row for row in samples[-1] if row[2] == 1]
+        for cum, _, _, mod in sorted(direct, reverse=True)[:10]:
+            print(f"  {cum / 1000:8.1f} ms  {mod}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Stand-in `adb` executable that forwards to an adb server over its socket.
+
+Pointed at tools/fake_adb_server.py (through ANDROID_ADB_SERVER_PORT) it
+lets the subprocess path of setupRTMP6.py (NativeAdb = false, or commands
+without a native equivalent) run against simulated devices. Only the
+command lines setupRTMP6.py spawns are understood: `version`, `devices
+[-l]`, `track-devices [-l]`, `-s SERIAL shell CMD...` and `-s SERIAL
+reverse REMOTE LOCAL | --list | --remove REMOTE`. Output and exit codes follow the real adb closely
+enough for setupRTMP6.py's parsing:
+
+    ANDROID_ADB_SERVER_PORT=5038 python tools/fake_adb.py -s FAKE0000 shell getprop
+"""
+
+import sys
+from pathlib import Path
+from typing import List
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import adb_client  # noqa: E402  pylint: disable=wrong-import-position
+
+CLIENT_TIMEOUT = 300.0  # The caller's subprocess timeout is the one that counts
+
+
+def adb(argv: List[str]) -> int:
+    serial = None
+    if argv[:1] == ["-s"] and len(argv) > 1:
+        serial, argv = argv[1], argv[2:]
+    if not argv:
+        sys.stderr.write("adb: usage: adb [-s SERIAL] COMMAND...\n")
+        return 1
+    client = adb_client.AdbClient(timeout=CLIENT_TIMEOUT)
+    command, args = argv[0], argv[1:]
+    if command == "version":  # Like adb, answered without the server
+        sys.stdout.write(
+            "Android Debug Bridge version 1.0.41\nVersion 35.0.2-fake\n"
+            f"Installed as {Path(__file__).resolve()}\n"
+        )
+    elif command == "devices":  # Always the long (-l) listing
+        sys.stdout.write("List of devices attached\n" + client.devices() + "\n")
+    elif command == "track-devices":
+        for listing in client.track_devices():
+            sys.stdout.write(f"{len(listing.encode('utf-8')):04x}{listing}")
+            sys.stdout.flush()
+    elif command == "shell" and serial:
+        sys.stdout.write(client.shell(serial, " ".join(args)))
+    elif command == "reverse" and serial and args == ["--list"]:
+        sys.stdout.write(client.reverse_list(serial))
+    elif command == "reverse" and serial and len(args) == 2 and args[0] == "--remove":
+        client.reverse_remove(serial, args[1])
+    elif command == "reverse" and serial and len(args) == 2:
+        client.reverse(serial, args[0], args[1])
+    else:
+        sys.stderr.write(f"adb: unsupported command: {' '.join(argv)}\n")
+        return 1
+    return 0
+
+
+def main() -> int:
+    try:
+        return adb(sys.argv[1:])
+    except adb_client.AdbError as e:
+        sys.stderr.write(f"adb: error: {e}\n")
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
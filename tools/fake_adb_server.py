@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Scriptable fake ADB server speaking the host protocol on a local port.
+
+Lets adb_client.py (and setupRTMP6.py with NativeAdb on) be exercised
+without phones or a real adb server:
+
+    python tools/fake_adb_server.py --port 5038 --devices 3
+    set ANDROID_ADB_SERVER_PORT=5038   (export on Linux/macOS)
+
+Supported services: host:version, host:devices-l, host:track-devices[-l],
+host:transport:<serial> followed by shell:<cmd>,
+reverse:forward:<remote>;<local>, reverse:list-forward or
+reverse:killforward:<remote>. Shell understands the getprop model and
+manufacturer queries, `am start [-W] -n` (which makes the app the resumed
+activity, reporting launch times per FakeDevice.launch_ms) and the dumpsys
+resumed-activity query. `plug`, `unplug` and `set_state` push
+device-state transitions to track-devices subscribers; --flap does that on
+a timer to exercise `setupRTMP6.py --watch`.
+
+Each request is classified as version, devices, track, shell or reverse,
+and can be given its own latency, failure rate (answers FAIL) and hang
+rate (never answers), drawn from a seeded RNG so runs are repeatable:
+
+    python tools/fake_adb_server.py --devices 50 --command-latency shell=0.05 \
+        --fail reverse=0.1 --hang shell=0.02 --seed 1
+"""
+
+import argparse
+import queue
+import random
+import socketserver
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+ADB_SERVER_VERSION = 41
+COMMAND_KINDS = ("version", "devices", "track", "shell", "reverse")
+
+
+def command_kind(service: str) -> str:
+    """The COMMAND_KINDS entry faults are keyed on for a host or device service."""
+    if service == "host:version":
+        return "version"
+    if service.startswith("host:track-devices"):
+        return "track"
+    if service.startswith("host:"):
+        return "devices"
+    return service.partition(":")[0]
+
+
+@dataclass
+class FakeDevice:
+    """One simulated device as listed by `adb devices -l`."""
+
+    serial: str
+    state: str = "device"
+    model: str = "Pixel_7"
+    manufacturer: str = "Google"
+    product: str = "panther"
+    transport_id: int = 1
+    reverses: Dict[str, str] = field(default_factory=dict)
+    foreground: Optional[str] = None  # Component of the resumed activity
+    launch_ms: int = 420  # TotalTime `am start -W` reports for a cold start
+
+    def devices_line(self) -> str:
+        if self.state != "device":
+            return f"{self.serial}\t{self.state} transport_id:{self.transport_id}"
+        return (
+            f"{self.serial}\t{self.state} usb:1-{self.transport_id} product:{self.product}"
+            f" model:{self.model} device:{self.product} transport_id:{self.transport_id}"
+        )
+
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    """Threaded fake adb server; `latency` delays every reply (seconds).
+
+    `command_latency`, `failures` and `hangs` are keyed by command_kind():
+    extra seconds before answering, and the probability that a request
+    answers FAIL or hangs for `hang_seconds` and is then dropped unanswered.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128  # Parallel setups connect dozens of sockets at once
+
+    def __init__(
+        self,
+        devices: List[FakeDevice],
+        port: int = 0,
+        latency: float = 0.0,
+        command_latency: Optional[Dict[str, float]] = None,
+        failures: Optional[Dict[str, float]] = None,
+        hangs: Optional[Dict[str, float]] = None,
+        hang_seconds: float = 30.0,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(("127.0.0.1", port), _AdbRequestHandler)
+        self.devices = {d.serial: d for d in devices}
+        self.latency = latency
+        self.command_latency = command_latency or {}
+        self.failures = failures or {}
+        self.hangs = hangs or {}
+        self.hang_seconds = hang_seconds
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests: List[str] = []
+        self.trackers: List[queue.Queue] = []
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "FakeAdbServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def server_close(self):
+        with self.lock:
+            for q in self.trackers:
+                q.put(None)
+        super().server_close()
+
+    def listing(self, long: bool = True) -> str:
+        with self.lock:
+            if long:
+                return "".join(d.devices_line() + "\n" for d in self.devices.values())
+            return "".join(f"{d.serial}\t{d.state}\n" for d in self.devices.values())
+
+    def fault(self, kind: str) -> Optional[str]:
+        """ "fail", "hang" or None for the next request of `kind`."""
+        hang, fail = self.hangs.get(kind, 0.0), self.failures.get(kind, 0.0)
+        if not hang and not fail:
+            return None
+        with self.lock:
+            draw = self.rng.random()
+        if draw < hang:
+            return "hang"
+        return "fail" if draw < hang + fail else None
+
+    def _notify(self):
+        with self.lock:
+            for q in self.trackers:
+                q.put(True)
+
+    # --- Device-state transitions ---
+    def plug(self, device: FakeDevice):
+        """Connects `device` (or reconnects it after `unplug`)."""
+        with self.lock:
+            self.devices[device.serial] = device
+        self._notify()
+
+    def unplug(self, serial: str) -> Optional[FakeDevice]:
+        """Disconnects a device; like a real unplug, its reverse mappings go."""
+        with self.lock:
+            device = self.devices.pop(serial, None)
+            if device:
+                device.reverses.clear()
+        self._notify()
+        return device
+
+    def set_state(self, serial: str, state: str):
+        """Moves a device to "device", "offline" or "unauthorized"."""
+        with self.lock:
+            device = self.devices[serial]
+            device.state = state
+            if state != "device":
+                device.reverses.clear()
+        self._notify()
+
+    def shell(self, device: FakeDevice, command: str) -> str:
+        """Returns canned output for the shell commands setupRTMP6.py issues."""
+        out = []
+        for part in command.split(";"):
+            part = part.strip()
+            if part == "getprop ro.product.model":
+                out.append(device.model.replace("_", " "))
+            elif part == "getprop ro.product.manufacturer":
+                out.append(device.manufacturer)
+            elif part.startswith("am start"):
+                out.extend(self._am_start(device, part.split()))
+            elif part.startswith("dumpsys activity activities") and device.foreground:
+                out.append(
+                    f"  topResumedActivity=ActivityRecord{{5e1c0d u0 {device.foreground} t12}}"
+                )
+        return "".join(line + "\n" for line in out)
+
+    @staticmethod
+    def _am_start(device: FakeDevice, argv: List[str]) -> List[str]:
+        """`am start [-W] -n COMPONENT`; the app is then in the foreground.
+
+        With -W the reply takes as long as the launch it reports, as on a device.
+        """
+        component = argv[-1]
+        out = [f"Starting: Intent {{ cmp={component} }}"]
+        already = device.foreground == component
+        device.foreground = component
+        if "-W" not in argv:
+            return out
+        if already:
+            out.append(
+                "Warning: Activity not started, its current task has been brought to the front"
+            )
+        total = device.launch_ms // 10 if already else device.launch_ms
+        time.sleep(total / 1000)  # -W returns once the launch has completed
+        return out + [
+            "Status: ok",
+            f"LaunchState: {'HOT' if already else 'COLD'}",
+            f"Activity: {component}",
+            f"ThisTime: {total}",
+            f"TotalTime: {total}",
+            f"WaitTime: {total + 6}",
+            "Complete",
+        ]
+
+
+class _AdbRequestHandler(socketserver.BaseRequestHandler):
+    server: FakeAdbServer
+
+    def _read_exact(self, n: int) -> Optional[bytes]:
+        buf = b""
+        while len(buf) < n:
+            chunk = self.request.recv(n - len(buf))
+            if not chunk:
+                return None
+            buf += chunk
+        return buf
+
+    def _read_request(self) -> Optional[str]:
+        header = self._read_exact(4)
+        if not header:
+            return None
+        payload = self._read_exact(int(header, 16))
+        return payload.decode("utf-8") if payload is not None else None
+
+    def _okay(self, payload: Optional[str] = None):
+        data = b"OKAY"
+        if payload is not None:
+            raw = payload.encode("utf-8")
+            data += f"{len(raw):04x}".encode("ascii") + raw
+        self.request.sendall(data)
+
+    def _fail(self, message: str):
+        raw = message.encode("utf-8")
+        self.request.sendall(b"FAIL" + f"{len(raw):04x}".encode("ascii") + raw)
+
+    def _simulate(self, service: str) -> bool:
+        """Applies the configured delay and fault; False if already answered."""
+        srv = self.server
+        kind = command_kind(service)
+        if srv.command_latency.get(kind):
+            time.sleep(srv.command_latency[kind])
+        fault = srv.fault(kind)
+        if fault == "hang":
+            time.sleep(srv.hang_seconds)  # The client gives up first
+            return False
+        if fault == "fail":
+            self._fail(f"simulated {kind} failure")
+            return False
+        return True
+
+    def handle(self):
+        srv = self.server
+        service = self._read_request()
+        if service is None:
+            return
+        with srv.lock:
+            srv.requests.append(service)
+        if srv.latency:
+            time.sleep(srv.latency)
+        if not service.startswith("host:transport:") and not self._simulate(service):
+            return
+
+        if service == "host:version":
+            self._okay(f"{ADB_SERVER_VERSION:04x}")
+        elif service == "host:devices-l":
+            self._okay(srv.listing())
+        elif service in ("host:track-devices", "host:track-devices-l"):
+            self._okay()
+            self._track(long=service.endswith("-l"))
+        elif service.startswith("host:transport:"):
+            device = srv.devices.get(service[len("host:transport:") :])
+            if device is None:
+                self._fail(f"device '{service[len('host:transport:'):]}' not found")
+            elif device.state != "device":
+                self._fail(f"device {device.state}")
+            else:
+                self._okay()
+                self._handle_device_service(device)
+        else:
+            self._fail(f"unknown host service '{service}'")
+
+    def _track(self, long: bool):
+        """Streams a listing now and after every transition until closed."""
+        srv = self.server
+        q: queue.Queue = queue.Queue()
+        with srv.lock:
+            srv.trackers.append(q)
+        try:
+            while True:
+                raw = srv.listing(long).encode("utf-8")
+                self.request.sendall(f"{len(raw):04x}".encode("ascii") + raw)
+                if q.get() is None:
+                    return
+        except OSError:
+            pass  # Subscriber went away
+        finally:
+            with srv.lock:
+                srv.trackers.remove(q)
+
+    def _handle_device_service(self, device: FakeDevice):
+        service = self._read_request()
+        if service is None:
+            return
+        with self.server.lock:
+            self.server.requests.append(f"{device.serial}:{service}")
+        if not self._simulate(service):
+            return
+        if service.startswith("shell:"):
+            self._okay()
+            self.request.sendall(
+                self.server.shell(device, service[len("shell:") :]).encode("utf-8")
+            )
+        elif service.startswith("reverse:forward:"):
+            remote, _, local = service[len("reverse:forward:") :].partition(";")
+            with self.server.lock:
+                device.reverses[remote] = local
+            self._okay()
+            self._okay()
+        elif service == "reverse:list-forward":
+            with self.server.lock:
+                listing = "".join(
+                    f"UsbFfs {remote} {local}\n"
+                    for remote, local in device.reverses.items()
+                )
+            self._okay(listing)
+        elif service.startswith("reverse:killforward:"):
+            remote = service[len("reverse:killforward:") :]
+            with self.server.lock:
+                removed = device.reverses.pop(remote, None)
+            self._okay()
+            if removed is None:
+                self._fail(f"listener '{remote}' not found")
+            else:
+                self._okay()
+        else:
+            self._fail(f"unknown device service '{service}'")
+
+
+def make_devices(count: int) -> List[FakeDevice]:
+    return [
+        FakeDevice(serial=f"FAKE{i:04d}", model=f"Fake_Phone_{i}", transport_id=i + 1)
+        for i in range(count)
+    ]
+
+
+def kind_values(value: str) -> Dict[str, float]:
+    """Parses "KIND=NUMBER[,KIND=NUMBER...]" as used by --command-latency etc."""
+    values = {}
+    for item in filter(None, value.split(",")):
+        kind, sep, number = item.partition("=")
+        if not sep or kind not in COMMAND_KINDS:
+            raise argparse.ArgumentTypeError(
+                f"expected KIND=NUMBER with KIND one of {', '.join(COMMAND_KINDS)}"
+            )
+        values[kind] = float(number)
+    return values
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    """The latency/fault options, shared with tools/bench_setup.py."""
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per reply")
+    parser.add_argument(
+        "--command-latency",
+        type=kind_values,
+        default={},
+        metavar="KIND=SECONDS",
+        help="extra delay per command kind, e.g. shell=0.05,reverse=0.02",
+    )
+    parser.add_argument(
+        "--fail",
+        type=kind_values,
+        default={},
+        metavar="KIND=P",
+        help="probability a command answers FAIL",
+    )
+    parser.add_argument(
+        "--hang",
+        type=kind_values,
+        default={},
+        metavar="KIND=P",
+        help="probability a command never answers",
+    )
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, help="for repeatable faults")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5038)
+    parser.add_argument("--devices", type=int, default=1)
+    add_fault_arguments(parser)
+    parser.add_argument(
+        "--flap",
+        type=float,
+        default=0.0,
+        help="unplug and replug the last device every N seconds",
+    )
+    args = parser.parse_args()
+    devices = make_devices(args.devices)
+    server = FakeAdbServer(
+        devices,
+        args.port,
+        args.latency,
+        args.command_latency,
+        args.fail,
+        args.hang,
+        args.hang_seconds,
+        args.seed,
+    ).start()
+    print(f"Fake adb server on 127.0.0.1:{server.port} with {args.devices} device(s)")
+    try:
+        while True:
+            time.sleep(args.flap or 3600)
+            if args.flap and devices:
+                server.unplug(devices[-1].serial)
+                print(f"unplugged {devices[-1].serial}")
+                time.sleep(args.flap)
+                server.plug(devices[-1])
+                print(f"plugged {devices[-1].serial}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Synthetic RTMP load against the server on config.ini's RtmpPort.
+
+Before adding phones to a host, find out how many concurrent streams its
+RTMP server (MonaServer or rtmp_server.py) takes. Each step runs N
+publishers, synthetic H.264/AAC-shaped tags at --bitrate-kbps or a small
+FLV looped with --flv, plus M players per stream, all from one asyncio
+loop (rtmp_load.py). It reports accepted connections, publish and relay
+throughput, data the players never got, publish-to-play latency and the
+server's CPU and memory, sampled through psutil:
+
+    python tools/rtmp_loadgen.py --publishers 10 50 100 200 --bitrate-kbps 2500
+    python tools/rtmp_loadgen.py --publishers 20 --players 2 --flv clip.flv --json load.json
+
+Steps stop at the first one the server cannot keep up with. The server's
+PID is that of the process listening on the port, else the one in
+monaserver_state.json (written when setupRTMP6.py starts the server);
+--pid overrides both.
+"""
+
+import argparse
+import asyncio
+import configparser
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import rtmp_load  # noqa: E402  pylint: disable=wrong-import-position
+
+# A step keeps up when players get nearly everything and nobody fell behind
+MAX_DROPPED = 0.01
+MAX_LAG = 0.5  # seconds a publisher may fall behind real time
+
+
+def configured_port() -> int:
+    parser = configparser.ConfigParser()
+    parser.read(REPO_DIR / "config.ini", encoding="utf-8")
+    return parser.getint("Network", "RtmpPort", fallback=1935)
+
+
+def server_process(port: int, pid: Optional[int] = None) -> Optional[psutil.Process]:
+    """The RTMP server's process: `pid`, the listener on `port`, or the
+    server setupRTMP6.py last started (when listeners can't be listed)."""
+    try:
+        if pid:
+            return psutil.Process(pid)
+        for conn in psutil.net_connections("tcp"):
+            if conn.laddr.port == port and conn.status == psutil.CONN_LISTEN:
+                if conn.pid:
+                    return psutil.Process(conn.pid)
+    except psutil.Error:
+        pass
+    try:
+        state = json.loads((REPO_DIR / "monaserver_state.json").read_text("utf-8"))
+        proc = psutil.Process(int(state["pid"]))
+        if abs(proc.create_time() - float(state["create_time"])) < 1:
+            return proc
+    except (psutil.Error, OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+class ServerSampler:
+    """CPU time and peak RSS of the server over the measured window."""
+
+    def __init__(self, proc: Optional[psutil.Process]):
+        self.proc = proc
+        self.marks: Dict[str, tuple] = {}
+        self.peak_rss = 0
+
+    def __call__(self, phase: str):
+        if self.proc is None:
+            return
+        try:
+            times = self.proc.cpu_times()
+            self.peak_rss = max(self.peak_rss, self.proc.memory_info().rss)
+        except psutil.Error:
+            self.proc = None
+            return
+        self.marks[phase] = (times.user + times.system, time.perf_counter())
+
+    def cpu_percent(self) -> Optional[float]:
+        if "measure" not in self.marks or "done" not in self.marks:
+            return None
+        (cpu0, t0), (cpu1, t1) = self.marks["measure"], self.marks["done"]
+        return 100 * (cpu1 - cpu0) / (t1 - t0)
+
+
+def run_step(args, publishers: int, source) -> Dict[str, Any]:
+    sampler = ServerSampler(server_process(args.port, args.pid))
+    stats = asyncio.run(
+        rtmp_load.run_load(
+            args.host,
+            args.port,
+            publishers=publishers,
+            players=args.players,
+            bitrate_kbps=args.bitrate_kbps,
+            duration=args.duration,
+            warmup=args.warmup,
+            app=args.app,
+            prefix=f"loadgen{publishers}-",
+            on_phase=sampler,
+            source=source,
+        )
+    )
+    result = stats.as_dict()
+    result["server_cpu_percent"] = sampler.cpu_percent()
+    result["server_rss_mb"] = sampler.peak_rss / 2**20 if sampler.peak_rss else None
+    expected = stats.published * args.players
+    result["dropped_ratio"] = stats.dropped_bytes() / expected if expected else 0.0
+    problems = []
+    refused = publishers * (1 + args.players) - (
+        stats.publishers_connected + stats.players_connected
+    )
+    if refused:
+        problems.append(f"{refused} connection(s) refused or failed")
+    if stats.errors - refused > 0:
+        problems.append(f"{stats.errors - refused} stream error(s)")
+    if result["dropped_ratio"] > MAX_DROPPED:
+        problems.append(f"players missed {result['dropped_ratio']:.1%} of the data")
+    if stats.max_lag > MAX_LAG:
+        problems.append(f"publishers fell {stats.max_lag:.1f}s behind")
+    if stats.loop_lag > MAX_LAG:
+        problems.append("the generator itself ran out of CPU")
+    result["problems"] = problems
+    return result
+
+
+def cell(value, fmt: str) -> str:
+    return "-" if value is None else fmt.format(value)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--publishers",
+        type=int,
+        nargs="+",
+        default=[10],
+        help="streams per step, e.g. 10 50 100",
+    )
+    parser.add_argument("--players", type=int, default=1, help="per stream")
+    parser.add_argument("--bitrate-kbps", type=float, default=2500)
+    parser.add_argument("--flv", type=Path, help="replay this FLV instead")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument(
+        "--port", type=int, help="RTMP port (default: config.ini's RtmpPort)"
+    )
+    parser.add_argument("--app", default="live")
+    parser.add_argument("--pid", type=int, help="server PID to sample")
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args()
+    args.port = args.port or configured_port()
+
+    source = rtmp_load.flv_source(args.flv) if args.flv else None
+    media = str(args.flv) if args.flv else f"{args.bitrate_kbps / 1000:g} Mbps"
+    server = server_process(args.port, args.pid)
+    print(
+        f"rtmp://{args.host}:{args.port}/{args.app}: {media} per stream, "
+        f"{args.players} player(s) each, {args.duration:g}s per step; server "
+        + (f"PID {server.pid} ({server.name()})" if server else "PID unknown")
+    )
+    print(
+        f"{'streams':>7}{'accepted':>11}{'pub Mbps':>10}{'relay':>9}{'dropped':>9}"
+        f"{'lost':>6}{'p95 ms':>9}{'lag ms':>8}{'CPU %':>7}{'RSS MiB':>9}"
+    )
+    results: List[Dict[str, Any]] = []
+    for publishers in args.publishers:
+        result = run_step(args, publishers, source)
+        results.append(result)
+        accepted = "{}/{}".format(
+            result["publishers_connected"] + result["players_connected"],
+            publishers * (1 + args.players),
+        )
+        print(
+            f"{publishers:>7}{accepted:>11}"
+            f"{result['publish_mbps']:>10.1f}{result['relay_mbps']:>9.1f}"
+            f"{result['dropped_ratio']:>9.1%}{result['lost_frames']:>6}"
+            f"{cell(result['latency_ms']['p95'], '{:.1f}'):>9}"
+            f"{result['max_lag_ms']:>8.0f}"
+            f"{cell(result['server_cpu_percent'], '{:.0f}'):>7}"
+            f"{cell(result['server_rss_mb'], '{:.0f}'):>9}"
+        )
+        for problem in result["problems"]:
+            print(f"        ! {problem}")
+        if result["problems"]:
+            break
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    healthy = [r for r in results if not r["problems"]]
+    if healthy:
+        best = healthy[-1]
+        print(
+            f"Kept up with {best['publishers']} stream(s) "
+            f"({best['relay_mbps']:.0f} Mbps relayed)"
+            + ("" if len(healthy) == len(results) else "; the next step did not")
+        )
+    return 0 if len(healthy) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
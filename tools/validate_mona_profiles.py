@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Runs the same synthetic RTMP load against each MonaServer.ini profile.
+
+For every profile in mona_ini.PROFILES the ini is written to a scratch
+folder (RTMP on a free port, wwwDir pointing at the real MonaServer www),
+`MonaServer <ini>` is started on it and driven by rtmp_load: stamped
+publishers plus players, with the server's CPU sampled through psutil.
+One row per profile shows publish/relay throughput, publish-to-play
+latency percentiles and frames lost, so a profile is picked from data:
+
+    python tools/validate_mona_profiles.py --publishers 8 --bitrate-kbps 6000
+    python tools/validate_mona_profiles.py --set RTMP.BufferLength=20 --json out.json
+
+`--builtin` runs the built-in server for every profile instead, as a
+baseline for the harness itself; the ini does not affect it.
+"""
+
+import argparse
+import asyncio
+import configparser
+import json
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import psutil
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+import mona_ini  # noqa: E402  pylint: disable=wrong-import-position
+import rtmp  # noqa: E402  pylint: disable=wrong-import-position
+import rtmp_load  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, proc: subprocess.Popen, timeout: float = 15.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and proc.poll() is None:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                rtmp.client_handshake(s)
+                return True
+        except (OSError, rtmp.RtmpError):
+            time.sleep(0.1)
+    return False
+
+
+def configured_mona() -> Optional[Path]:
+    """MonaServerPath from config.ini, else the bundled executable."""
+    parser = configparser.ConfigParser()
+    parser.read(REPO_DIR / "config.ini", encoding="utf-8")
+    path = parser.get("Paths", "MonaServerPath", fallback="").strip()
+    if path:
+        path = Path(path)
+        return path if path.is_absolute() else REPO_DIR / path
+    bundled = REPO_DIR / "MonaServer_Win64" / "MonaServer.exe"
+    return bundled if bundled.is_file() else None
+
+
+def parse_overrides(items: List[str]) -> Dict[str, Dict[str, str]]:
+    extra: Dict[str, Dict[str, str]] = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        section, dot, name = key.rpartition(".")
+        if not sep or not dot:
+            raise SystemExit(f"--set expects SECTION.KEY=VALUE, got '{item}'")
+        extra.setdefault(section, {})[name] = value
+    return extra
+
+
+def server_command(args, profile: str, port: int, scratch: Path) -> List[str]:
+    if args.builtin:
+        script = str(REPO_DIR / "rtmp_server.py")
+        return [
+            sys.executable,
+            script,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--quiet",
+        ]
+    www = args.mona.parent / "www"
+    extra = {
+        "": {"wwwDir": f'"{www}"', "dataDir": f'"{scratch / "data"}"'},
+        "logs": {"directory": str(scratch / "logs")},
+    }
+    for section, keys in args.extra.items():
+        extra.setdefault(section, {}).update(keys)
+    ini = scratch / "MonaServer.ini"
+    mona_ini.write_ini(str(ini), profile, port, extra)
+    return [str(args.mona), str(ini)]
+
+
+def run_profile(args, profile: str) -> dict:
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix=f"mona-{profile}-") as scratch:
+        argv = server_command(args, profile, port, Path(scratch))
+        proc = subprocess.Popen(
+            argv,
+            cwd=str(REPO_DIR if args.builtin else args.mona.parent),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not wait_ready(port, proc):
+                return {"profile": profile, "error": "server did not start"}
+            server = psutil.Process(proc.pid)
+            cpu: Dict[str, float] = {}
+
+            def sample(phase: str):
+                times = server.cpu_times()
+                cpu[phase] = times.user + times.system
+                cpu[phase + "_at"] = time.perf_counter()
+
+            stats = asyncio.run(
+                rtmp_load.run_load(
+                    "127.0.0.1",
+                    port,
+                    publishers=args.publishers,
+                    players=args.players,
+                    bitrate_kbps=args.bitrate_kbps,
+                    duration=args.duration,
+                    warmup=args.warmup,
+                    on_phase=sample,
+                )
+            )
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+    result = {"profile": profile, **stats.as_dict()}
+    if "done" in cpu:
+        busy = cpu["done"] - cpu["measure"]
+        result["cpu_percent"] = round(
+            100 * busy / (cpu["done_at"] - cpu["measure_at"]), 1
+        )
+    return result
+
+
+def cell(value, fmt: str = "{:.1f}") -> str:
+    return "-" if value is None else fmt.format(value)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--profiles",
+        nargs="+",
+        choices=list(mona_ini.PROFILES),
+        default=list(mona_ini.PROFILES),
+    )
+    parser.add_argument(
+        "--mona", type=Path, help="MonaServer executable (default: config.ini's)"
+    )
+    parser.add_argument(
+        "--builtin", action="store_true", help="run rtmp_server.py instead"
+    )
+    parser.add_argument("--publishers", type=int, default=4)
+    parser.add_argument("--players", type=int, default=1, help="per stream")
+    parser.add_argument("--bitrate-kbps", type=float, default=6000)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds")
+    parser.add_argument(
+        "--set",
+        dest="overrides",
+        action="append",
+        default=[],
+        metavar="SECTION.KEY=VALUE",
+        help="extra ini value applied on top of every profile",
+    )
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args()
+    args.extra = parse_overrides(args.overrides)
+    if not args.builtin:
+        args.mona = args.mona or configured_mona()
+        if not args.mona or not args.mona.is_file():
+            print("FAIL: no MonaServer executable (set --mona or use --builtin)")
+            return 1
+
+    server = "built-in server" if args.builtin else str(args.mona)
+    print(
+        f"{args.publishers} publishers x {args.bitrate_kbps / 1000:g} Mbps, "
+        f"{args.players} player(s) each, {args.duration:g}s measured, {server}"
+    )
+    header = (
+        f"{'profile':<14}{'pub Mbps':>9}{'relay':>9}{'p50 ms':>9}"
+        f"{'p95 ms':>9}{'p99 ms':>9}{'lost':>7}{'errors':>8}{'CPU %':>8}"
+    )
+    print(header)
+    results = []
+    for profile in args.profiles:
+        result = run_profile(args, profile)
+        results.append(result)
+        if "error" in result:
+            print(f"{profile:<14}FAIL: {result['error']}")
+            continue
+        latency = result["latency_ms"]
+        print(
+            f"{profile:<14}{result['publish_mbps']:>9.1f}{result['relay_mbps']:>9.1f}"
+            f"{cell(latency['p50']):>9}{cell(latency['p95']):>9}"
+            f"{cell(latency['p99']):>9}{result['lost_frames']:>7}"
+            f"{result['errors']:>8}{cell(result.get('cpu_percent')):>8}"
+        )
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    ok = [r for r in results if "error" not in r and not r["errors"]]
+    measured = [r for r in ok if r["latency_ms"]["p95"] is not None]
+    if measured:
+        best = min(measured, key=lambda r: r["latency_ms"]["p95"])
+        print(f"Lowest p95 latency: {best['profile']}")
+    return 0 if len(ok) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
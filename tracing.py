@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Opt-in span tracing for the setup steps, written as Chrome trace events.
+
+setupRTMP6.py wraps each setup step, adb command, spawned process and
+psutil lookup in a span:
+
+    with span("adb reverse", "adb", device=serial) as s:
+        ...
+        s.set(returncode=0)
+
+Tracing is off unless `TRACER.start()` is called (`--trace FILE`). While it
+is off, span() returns one shared no-op object, so an instrumented call
+costs an attribute check and nothing is recorded or allocated per span.
+When on, finished spans become complete ("X") events; nesting follows from
+their times on each thread. The file opens in https://ui.perfetto.dev or
+chrome://tracing.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+class Span:
+    """One timed region; `set` adds arguments such as a return code."""
+
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0.0
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self, end)
+
+
+class _NullSpan:
+    """What span() hands out while tracing is off."""
+
+    __slots__ = ()
+
+    def set(self, **args):
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects finished spans from every thread."""
+
+    def __init__(self):
+        self.enabled = False
+        self.origin = time.perf_counter()
+        # (name, cat, start, duration, thread id, args), in finishing order
+        self.spans: List[Tuple[str, str, float, float, int, Dict[str, Any]]] = []
+        self.threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.enabled = True
+        self.origin = time.perf_counter()
+
+    def span(self, name: str, cat: str = "setup", **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, cat, args)
+
+    def record(self, s: Span, end: float):
+        thread = threading.current_thread()
+        with self._lock:
+            self.threads.setdefault(thread.ident, thread.name)
+            self.spans.append(
+                (s.name, s.cat, s.start, end - s.start, thread.ident, s.args)
+            )
+
+    def events(self) -> List[Dict[str, Any]]:
+        """The spans as Chrome trace events (microseconds since start())."""
+        pid = os.getpid()
+        with self._lock:
+            spans, threads = list(self.spans), dict(self.threads)
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "setup"}}
+        ]
+        for tid, name in threads.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+            )
+        for name, cat, start, duration, tid, args in sorted(spans, key=lambda s: s[2]):
+            events.append(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": round((start - self.origin) * 1e6, 1),
+                    "dur": round(duration * 1e6, 1),
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {k: _json_value(v) for k, v in args.items()},
+                }
+            )
+        return events
+
+    def write(self, path: Path):
+        data = {"traceEvents": self.events(), "displayTimeUnit": "ms"}
+        Path(path).write_text(json.dumps(data), encoding="utf-8")
+
+    def slowest(self, count: int = 10) -> List[Dict[str, Any]]:
+        """The `count` longest spans, longest first, for the digest."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s[3], reverse=True)[:count]
+        return [
+            {
+                "name": name,
+                "cat": cat,
+                "seconds": round(duration, 4),
+                "start": round(start - self.origin, 4),
+                "args": {k: _json_value(v) for k, v in args.items()},
+            }
+            for name, cat, start, duration, _, args in spans
+        ]
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+TRACER = Tracer()
+span = TRACER.span